@@ -0,0 +1,155 @@
+# activity.py
+from datetime import date, datetime, timedelta
+from enum import Enum
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.orm import Session
+
+import config
+import models
+import pagination
+
+STATUS_CHANGED = "status_changed"
+FIELD_CHANGED = "field_changed"
+MERGED = "merged"
+# A merged duplicate's status_changed row, kept in the primary's history; it
+# never dates the primary's own status (close_dates, status_since)
+MERGED_STATUS_CHANGED = "merged_status_changed"
+
+_COLUMNS = [column.name for column in models.LeadActivity.__table__.columns]
+
+
+def _text(value) -> Optional[str]:
+    if value is None:
+        return None
+    if isinstance(value, Enum):
+        value = value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def change_rows(lead_id: int, changes: dict, changed_by: Optional[int] = None,
+                at: Optional[datetime] = None) -> List[dict]:
+    """lead_activity rows for ``changes`` ({field: [old, new]}), one per field."""
+    at = at or datetime.utcnow()
+    return [
+        {
+            "lead_id": lead_id,
+            "event": STATUS_CHANGED if field == "status" else FIELD_CHANGED,
+            "field": field,
+            "old_value": _text(old),
+            "new_value": _text(new),
+            "changed_by": changed_by,
+            "created_at": at,
+        }
+        for field, (old, new) in sorted(changes.items())
+    ]
+
+
+def merge_rows(lead_id: int, merged_ids: List[int], changed_by: Optional[int] = None,
+               at: Optional[datetime] = None) -> List[dict]:
+    """lead_activity rows recording ``merged_ids`` folded into ``lead_id``, one per merged lead."""
+    at = at or datetime.utcnow()
+    return [
+        {
+            "lead_id": lead_id,
+            "event": MERGED,
+            "field": "id",
+            "old_value": str(merged_id),
+            "new_value": str(lead_id),
+            "changed_by": changed_by,
+            "created_at": at,
+        }
+        for merged_id in merged_ids
+    ]
+
+
+def record(db: Session, rows: List[dict]):
+    """Insert ``rows`` with one executemany, in the caller's transaction."""
+    if rows:
+        db.execute(insert(models.LeadActivity.__table__), rows)
+
+
+def _page(db: Session, model, lead_id: int, after: Optional[tuple], limit: int) -> list:
+    query = db.query(model).filter(model.lead_id == lead_id)
+    if after is not None:
+        query = query.filter(pagination.keyset_condition(model.created_at, model.id, *after, descending=True))
+    return query.order_by(model.created_at.desc(), model.id.desc()).limit(limit).all()
+
+
+def lead_activity(db: Session, lead_id: int, limit: int = 50, cursor: Optional[str] = None,
+                  include_archived: bool = True) -> Tuple[list, Optional[str]]:
+    """One newest-first page of a lead's activity and the next page's cursor.
+
+    Archived rows are all older than the hot ones, so the archive is only
+    read once the hot table runs out, with the same keyset.
+    """
+    after = pagination.decode_cursor(cursor) if cursor else None
+    rows = _page(db, models.LeadActivity, lead_id, after, limit)
+    if include_archived and len(rows) < limit:
+        rows += _page(db, models.LeadActivityArchive, lead_id, after, limit - len(rows))
+    next_cursor = None
+    if limit and len(rows) == limit:
+        next_cursor = pagination.encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def close_dates(db: Session, statuses: Dict[int, str]) -> Dict[int, datetime]:
+    """When each lead entered the status given for it ({lead id: status}):
+    the latest status_changed row that set it, else the lead's created_at
+    (it was created with that status). Rows carried over from merged
+    duplicates do not count."""
+    if not statuses:
+        return {}
+    ids = sorted(statuses)
+    dates = dict(db.execute(select(models.Lead.id, models.Lead.created_at).where(models.Lead.id.in_(ids))).all())
+    # Archive first: hot rows are newer and win
+    for model in (models.LeadActivityArchive, models.LeadActivity):
+        rows = db.execute(
+            select(model.lead_id, model.new_value, func.max(model.created_at))
+            .where(model.lead_id.in_(ids), model.event == STATUS_CHANGED)
+            .group_by(model.lead_id, model.new_value)
+        )
+        for lead_id, new_value, at in rows:
+            if new_value == _text(statuses[lead_id]):
+                dates[lead_id] = at
+    return dates
+
+
+def status_since(lead=models.Lead):
+    """SQL expression for when ``lead`` entered its current status, as
+    close_dates computes it; for closed leads this is the close date."""
+    def latest(model):
+        # STATUS_CHANGED only: MERGED_STATUS_CHANGED rows date another lead's status
+        return select(func.max(model.created_at)).where(
+            model.lead_id == lead.id, model.event == STATUS_CHANGED, model.new_value == lead.status,
+        ).scalar_subquery()
+    return func.coalesce(latest(models.LeadActivity), latest(models.LeadActivityArchive), lead.created_at)
+
+
+def archive(db: Session, before: Optional[datetime] = None, batch_size: int = 5000) -> int:
+    """Move lead_activity rows older than ``before`` (default: the last
+    CRM_ACTIVITY_HOT_DAYS days stay) to lead_activity_archive.
+
+    Each batch is copied and deleted in one short transaction, oldest first,
+    so the move can run while the API is writing. Returns rows moved.
+    """
+    if before is None:
+        before = datetime.utcnow() - timedelta(days=config.ACTIVITY_HOT_DAYS)
+    hot = models.LeadActivity.__table__
+    archived = models.LeadActivityArchive.__table__
+    moved = 0
+    while True:
+        ids = db.execute(
+            select(hot.c.id).where(hot.c.created_at < before).order_by(hot.c.created_at, hot.c.id).limit(batch_size)
+        ).scalars().all()
+        # End the read before writing: SQLite cannot upgrade a stale WAL snapshot
+        db.commit()
+        if not ids:
+            return moved
+        db.execute(insert(archived).from_select(_COLUMNS, select(*hot.c).where(hot.c.id.in_(ids))))
+        db.execute(delete(hot).where(hot.c.id.in_(ids)))
+        db.commit()
+        moved += len(ids)
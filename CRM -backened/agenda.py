@@ -0,0 +1,152 @@
+# agenda.py
+import heapq
+from datetime import datetime, timezone
+from itertools import islice
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import false, select
+from sqlalchemy.orm import Session
+
+import models
+import pagination
+import schemas
+import stats
+
+FOLLOWUP = "followup"
+TASK = "task"
+# Followups sort before tasks due at the same instant
+_KIND_ORDER = {FOLLOWUP: 0, TASK: 1}
+
+
+def _sort_key(item: schemas.AgendaItem) -> tuple:
+    return item.due_at, _KIND_ORDER[item.kind], item.id
+
+
+def _naive_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Stored datetimes are naive UTC
+    if value is not None and value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def encode_cursor(item: schemas.AgendaItem) -> str:
+    return pagination.encode_cursor([item.due_at.isoformat(), item.kind], item.id)
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """``(due_at, kind order, id)`` of the last item on the previous page."""
+    sort_value, item_id = pagination.unpack_cursor(cursor)
+    try:
+        due_at, kind = sort_value
+        return datetime.fromisoformat(due_at), _KIND_ORDER[kind], item_id
+    except (TypeError, ValueError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(date_column, id_column, kind: str, position: tuple):
+    """Rows of ``kind`` that come after ``position`` in agenda order."""
+    due_at, cursor_kind, cursor_id = position
+    if _KIND_ORDER[kind] == cursor_kind:
+        return pagination.keyset_condition(date_column, id_column, due_at, cursor_id)
+    if _KIND_ORDER[kind] < cursor_kind:
+        # This kind's rows at the cursor's instant were already on earlier pages
+        return date_column > due_at
+    return date_column >= due_at
+
+
+def followup_query(user_id: int, role: str, start: Optional[datetime], end: Optional[datetime],
+                   position: Optional[tuple], limit: int):
+    """Open followups on leads the user owns (``role`` "owner") or works as
+    sales agent ("sales_agent"), by date.
+
+    Each role is a range over its own partial index on open followups
+    (ix_lead_followups_open_owner_date / _agent_date) in the ORDER BY's
+    order, so a page is a seek plus ``limit`` rows whatever the history.
+    """
+    followup, lead = models.LeadFollowup, models.Lead
+    if role == "owner":
+        match = followup.owner_id == user_id
+    else:
+        agent_id = select(models.SalesAgent.id).where(models.SalesAgent.user_id == user_id).scalar_subquery()
+        match = followup.sales_agent_id == agent_id
+    query = (
+        select(followup.id, followup.followup_date, followup.notes, followup.status, followup.lead_id,
+               lead.first_name, lead.last_name, lead.company)
+        .join(lead, lead.id == followup.lead_id)
+        # Literal 0 (not a bound False) so SQLite can match the partial index
+        .where(followup.completed == false(), match)
+    )
+    if start is not None:
+        query = query.where(followup.followup_date >= start)
+    if end is not None:
+        query = query.where(followup.followup_date < end)
+    if position is not None:
+        query = query.where(_after(followup.followup_date, followup.id, FOLLOWUP, position))
+    return query.order_by(followup.followup_date, followup.id).limit(limit)
+
+
+def task_query(user_id: int, start: Optional[datetime], end: Optional[datetime], position: Optional[tuple], limit: int):
+    """Active tasks assigned to the user, by due date (ix_tasks_assignee_due_date)."""
+    task = models.Task
+    query = select(
+        task.id, task.due_date, task.title, task.description, task.status, task.priority, task.related_lead_id
+    ).where(task.assigned_to_id == user_id, task.due_date.isnot(None))
+    if start is not None:
+        query = query.where(task.due_date >= start)
+    if end is not None:
+        query = query.where(task.due_date < end)
+    if position is not None:
+        query = query.where(_after(task.due_date, task.id, TASK, position))
+    # Filtered after the index range scan; the status index would need a sort
+    query = query.where(task.status.in_(stats.ACTIVE_TASK_STATUSES))
+    return query.order_by(task.due_date, task.id).limit(limit)
+
+
+def _followup_item(row) -> schemas.AgendaItem:
+    name = f"{row.first_name} {row.last_name}"
+    return schemas.AgendaItem(
+        kind=FOLLOWUP, id=row.id, due_at=row.followup_date,
+        title=f"Follow up with {name}" + (f" ({row.company})" if row.company else ""),
+        status=row.status, notes=row.notes, lead_id=row.lead_id,
+    )
+
+
+def _task_item(row) -> schemas.AgendaItem:
+    return schemas.AgendaItem(
+        kind=TASK, id=row.id, due_at=row.due_date, title=row.title, status=row.status,
+        priority=row.priority, notes=row.description, lead_id=row.related_lead_id,
+    )
+
+
+def _unique(items):
+    # A followup on a lead the user both owns and works comes from both
+    # followup queries; equal keys are adjacent after the merge
+    last = None
+    for item in items:
+        key = _sort_key(item)
+        if key != last:
+            yield item
+        last = key
+
+
+def agenda(db: Session, user_id: int, start: Optional[datetime] = None, end: Optional[datetime] = None,
+           limit: int = 100, cursor: Optional[str] = None) -> Tuple[List[schemas.AgendaItem], Optional[str]]:
+    """One page of the user's agenda from ``start`` to ``end``.
+
+    Without ``start`` the agenda includes everything still open, overdue
+    items first. Each source comes back ordered from SQL, at most ``limit``
+    rows, and they are merged lazily, so nothing is sorted in Python or SQL.
+    Returns ``(items, next_cursor)``.
+    """
+    start, end = _naive_utc(start), _naive_utc(end)
+    position = decode_cursor(cursor) if cursor else None
+
+    sources = [
+        (_followup_item(row) for row in db.execute(followup_query(user_id, role, start, end, position, limit)))
+        for role in ("owner", "sales_agent")
+    ]
+    sources.append(_task_item(row) for row in db.execute(task_query(user_id, start, end, position, limit)))
+    items = list(islice(_unique(heapq.merge(*sources, key=_sort_key)), limit))
+    next_cursor = encode_cursor(items[-1]) if limit and len(items) == limit else None
+    return items, next_cursor
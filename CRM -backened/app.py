@@ -1,14 +1,41 @@
 # app.py
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from datetime import datetime
+from datetime import date, datetime
 import models
 import schemas
+import config
+import pagination
+import stats
+import bulk
+import export
+import replicas
+import response_cache
+import routing
+import expansions
+import metrics
+import fast_json
+import search
+import agenda
+import jobs
+import activity
+import performance
+import analytics
+import auth
+import dedup
+from filters import LEAD_SORT_COLUMNS, lead_filters, task_filters
 
 # Create FastAPI app
-app = FastAPI(title="CRM Backend API", version="1.0.0")
+# Every route resolves the bearer token; see config.AUTH_REQUIRED / AUTH_PUBLIC_ROUTES / AUTH_STAFF_ROLES
+app = FastAPI(title="CRM Backend API", version="1.0.0", dependencies=[Depends(auth.authenticate)])
+
+# Registered before CORS so that cached and 304 responses still get CORS headers
+if config.RESPONSE_CACHE_TTLS:
+    app.middleware("http")(response_cache.response_cache_middleware)
 
 # Add CORS middleware
 app.add_middleware(
@@ -17,8 +44,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[pagination.NEXT_CURSOR_HEADER, "ETag", "Last-Modified"],
 )
 
+if models.ReplicaSessionLocals:
+    app.middleware("http")(replicas.read_your_writes_middleware)
+
+# Outermost, so latency covers every other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Dependency to get DB session
 def get_db():
     db = models.SessionLocal()
@@ -27,19 +61,51 @@ def get_db():
     finally:
         db.close()
 
+# Dependency for GET handlers: a read replica when the route is configured
+# for one (config.REPLICA_ROUTES), the primary otherwise
+def get_read_db(request: Request):
+    db = replicas.session_factory(request)()
+    try:
+        yield db
+    finally:
+        db.close()
+
 # Root endpoint
 @app.get("/")
 def read_root():
     return {"message": "Welcome to CRM Backend API", "status": "running"}
 
+# Prometheus metrics
+@app.get("/metrics", include_in_schema=False)
+def read_metrics(db: Session = Depends(get_db)):
+    jobs.update_metrics(db)
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # Health check
 @app.get("/health")
 def health_check():
     return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
 
+# Auth endpoints
+@app.post("/auth/login", response_model=schemas.Token)
+async def login(credentials: schemas.LoginRequest, db: Session = Depends(get_db)):
+    # Hashing runs on auth's own pool and queries on the threadpool; the event loop never waits on either
+    db_user = await run_in_threadpool(auth.find_user, db, credentials.username)
+    valid, rehash = await auth.verify_password(credentials.password, db_user.password_hash if db_user else None)
+    if not valid:
+        raise HTTPException(
+            status_code=401, detail="Incorrect username or password", headers={"WWW-Authenticate": "Bearer"}
+        )
+    if not db_user.is_active:
+        raise HTTPException(status_code=403, detail="Inactive user")
+    if rehash:
+        db_user.password_hash = await auth.hash_password(credentials.password)
+        await run_in_threadpool(db.commit)
+    token, expires_in = auth.start_session(db_user)
+    return schemas.Token(access_token=token, expires_in=expires_in, user=schemas.UserResponse.from_orm(db_user))
+
 # User endpoints
-@app.post("/users/", response_model=schemas.UserResponse)
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+def _insert_user(user: schemas.UserCreate, password_hash: str, db: Session):
     # Check if user exists
     db_user = db.query(models.User).filter(models.User.email == user.email).first()
     if db_user:
@@ -50,29 +116,41 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
         email=user.email,
         username=user.username,
         full_name=user.full_name,
-        password_hash=user.password,  # Note: In production, hash passwords!
+        password_hash=password_hash,
         role=user.role.value if hasattr(user.role, 'value') else user.role
     )
     db.add(db_user)
     db.commit()
+    stats.invalidate_dashboard_stats()
     db.refresh(db_user)
     return db_user
 
+@app.post("/users/", response_model=schemas.UserResponse)
+async def create_user(user: schemas.UserCreate, request: Request, db: Session = Depends(get_db)):
+    # Sign-up is public for customers only; any other role takes an admin token
+    caller = getattr(request.state, "user", None)
+    if user.role != schemas.UserRole.CUSTOMER and config.AUTH_REQUIRED and (caller is None or caller.role != "admin"):
+        raise HTTPException(status_code=403, detail=f"Only an admin can create {user.role.value} users")
+    password_hash = await auth.hash_password(user.password)
+    return await run_in_threadpool(_insert_user, user, password_hash, db)
+
 @app.get("/users/", response_model=List[schemas.UserResponse])
 def read_users(
     skip: int = 0, 
     limit: int = 100, 
     role: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(models.User)
+    fast = "read_users" in config.FAST_JSON_ROUTES
+    columns = fast_json.response_columns(models.User, schemas.UserResponse) if fast else [models.User]
+    query = db.query(*columns)
     if role:
         query = query.filter(models.User.role == role)
     users = query.offset(skip).limit(limit).all()
-    return users
+    return fast_json.rows_response(users, schemas.UserResponse) if fast else users
 
 @app.get("/users/{user_id}", response_model=schemas.UserResponse)
-def read_user(user_id: int, db: Session = Depends(get_db)):
+def read_user(user_id: int, db: Session = Depends(get_read_db)):
     db_user = db.query(models.User).filter(models.User.id == user_id).first()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
@@ -80,7 +158,15 @@ def read_user(user_id: int, db: Session = Depends(get_db)):
 
 # Lead endpoints
 @app.post("/leads/", response_model=schemas.LeadResponse)
-def create_lead(lead: schemas.LeadCreate, db: Session = Depends(get_db)):
+def create_lead(
+    lead: schemas.LeadCreate,
+    response: Response,
+    routing_strategy: Optional[str] = None,
+    team_id: Optional[int] = None,
+    allow_duplicates: bool = False,
+    db: Session = Depends(get_db)
+):
+    strategy = routing.check_strategy(routing_strategy)
     db_lead = models.Lead(
         first_name=lead.first_name,
         last_name=lead.last_name,
@@ -95,54 +181,239 @@ def create_lead(lead: schemas.LeadCreate, db: Session = Depends(get_db)):
         owner_id=lead.owner_id,
         sales_agent_id=lead.sales_agent_id
     )
+    matches = []
+    if not allow_duplicates:
+        # Candidates come from the blocking-key indexes, not a table scan
+        matches = dedup.find_duplicates(db, {field: getattr(db_lead, field) for field in dedup.MATCH_FIELDS})
+    if matches and config.DEDUP_REJECT:
+        ids = ", ".join(str(match.lead_id) for match in matches)
+        raise HTTPException(
+            status_code=409,
+            detail=f"Possible duplicate of lead(s) {ids}; retry with allow_duplicates=true to create it anyway",
+        )
+    if db_lead.sales_agent_id is None:
+        db_lead.sales_agent_id = routing.assign(db, db_lead.value, strategy, team_id)
     db.add(db_lead)
+    # lead_counters and the rollups job commit in the same transaction as the lead row
+    stats.record_lead_change(db, None, stats.lead_snapshot(db_lead))
+    db.flush()
+    jobs.publish(db, jobs.LEAD_CREATED, {"lead_id": db_lead.id})
     db.commit()
+    stats.invalidate_dashboard_stats()
     db.refresh(db_lead)
+    if matches:
+        response.headers["X-Possible-Duplicates"] = ",".join(str(match.lead_id) for match in matches)
     return db_lead
 
+@app.post("/leads/bulk", response_model=schemas.BulkImportResponse)
+async def bulk_import_leads(
+    request: Request,
+    batch_size: int = config.BULK_IMPORT_BATCH_SIZE,
+    routing_strategy: Optional[str] = None,
+    team_id: Optional[int] = None,
+    allow_duplicates: bool = False,
+    db: Session = Depends(get_db)
+):
+    # Accepts a JSON array, or a streamed NDJSON / CSV (with header row) body
+    content_type = request.headers.get("content-type", bulk.JSON).split(";")[0].strip().lower()
+    if content_type == bulk.JSON:
+        try:
+            payload = await request.json()
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(payload, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of leads")
+        rows = bulk.iter_json_rows(payload)
+    elif content_type == bulk.NDJSON:
+        rows = bulk.iter_ndjson_rows(request.stream())
+    elif content_type == bulk.CSV:
+        rows = bulk.iter_csv_rows(request.stream())
+    else:
+        raise HTTPException(status_code=415, detail=f"Unsupported content type: {content_type}")
+
+    batch_size = max(1, min(batch_size, config.BULK_IMPORT_MAX_BATCH_SIZE))
+    # Unless allow_duplicates, rows matching an existing lead or an earlier row are reported:
+    # as errors with CRM_DEDUP_REJECT, as warnings (and still inserted) without it
+    importer = bulk.LeadImporter(
+        db, routing.check_strategy(routing_strategy), team_id, allow_duplicates, config.DEDUP_REJECT
+    )
+    batch = []
+    async for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            # Validation and the executemany run off the event loop
+            await run_in_threadpool(importer.add_batch, batch)
+            batch = []
+    if batch:
+        await run_in_threadpool(importer.add_batch, batch)
+
+    stats.invalidate_dashboard_stats()
+    return importer.result()
+
+@app.patch("/leads/bulk", response_model=schemas.BulkUpdateResponse)
+def bulk_update_leads(body: schemas.LeadBulkUpdate, db: Session = Depends(get_db)):
+    # e.g. {"filter": {"sales_agent_id": 3, "status": "new"}, "patch": {"sales_agent_id": 7}}
+    patch = body.patch.dict(exclude_unset=True)
+    if not patch:
+        raise HTTPException(status_code=400, detail="patch must set at least one field")
+    criteria = lead_filters(**body.filter.dict()) if body.filter else []
+    if body.ids is None and not criteria:
+        raise HTTPException(status_code=400, detail="Provide ids or a non-empty filter")
+    result = bulk.update_leads(db, patch, criteria=criteria, ids=body.ids, chunk_size=config.BULK_UPDATE_CHUNK_SIZE)
+    stats.invalidate_dashboard_stats()
+    return result
+
+@app.post("/leads/merge", response_model=schemas.LeadMergeResponse)
+def merge_leads(body: schemas.LeadMerge, request: Request, db: Session = Depends(get_db)):
+    # Followups, tasks and activity move to the primary; the duplicates are deleted
+    user = getattr(request.state, "user", None)
+    result = dedup.merge_leads(db, body.primary_id, body.duplicate_ids, changed_by=user.id if user else None)
+    db.commit()
+    stats.invalidate_dashboard_stats()
+    dedup.invalidate_duplicate_groups()
+    return result
+
 @app.get("/leads/", response_model=List[schemas.LeadResponse])
 def read_leads(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[str] = None,
     owner_id: Optional[int] = None,
     sales_agent_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    expand: Optional[str] = None,
+    sort_by: str = "created_at",
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(models.Lead)
-    if status:
-        query = query.filter(models.Lead.status == status)
-    if owner_id:
-        query = query.filter(models.Lead.owner_id == owner_id)
-    if sales_agent_id:
-        query = query.filter(models.Lead.sales_agent_id == sales_agent_id)
-    
-    leads = query.order_by(models.Lead.created_at.desc()).offset(skip).limit(limit).all()
+    if sort_by not in LEAD_SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {', '.join(LEAD_SORT_COLUMNS)}")
+    expand_names = expansions.parse_expand(expand)
+    # Column tuples serialized straight to JSON bytes (config.FAST_JSON_ROUTES)
+    fast = not expand_names and "read_leads" in config.FAST_JSON_ROUTES
+    columns = fast_json.response_columns(models.Lead, schemas.LeadResponse) if fast else [models.Lead]
+    query = db.query(*columns).filter(*lead_filters(status, owner_id, sales_agent_id))
+    # Related rows for the whole page are loaded in one IN query per expansion
+    query = query.options(*expansions.lead_loader_options(expand_names))
+    # Keyset paging when a cursor is given, offset paging as a fallback; each
+    # sort (newest first, or highest score first) has its own indexes
+    leads, next_cursor = pagination.paginate(
+        query, LEAD_SORT_COLUMNS[sort_by], models.Lead.id,
+        limit=limit, skip=skip, cursor=cursor, descending=True, datetime_key=sort_by == "created_at"
+    )
+    if expand_names:
+        # Expanded leads (schemas.LeadExpandedResponse) bypass response_model
+        response = Response(expansions.render_leads(leads, expand_names), media_type="application/json")
+    elif fast:
+        response = fast_json.rows_response(leads, schemas.LeadResponse)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return response if expand_names or fast else leads
+
+@app.get("/leads/export")
+def export_leads(
+    request: Request,
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    sales_agent_id: Optional[int] = None
+):
+    # Streams rows from a server-side cursor; memory use does not grow with the table
+    return StreamingResponse(
+        export.lead_export(lead_filters(status, owner_id, sales_agent_id), format,
+                           replicas.session_factory(request)),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=leads.{format}"}
+    )
+
+@app.get("/leads/search", response_model=List[schemas.LeadResponse])
+def search_leads(
+    response: Response,
+    q: str = Query(..., min_length=1),
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    # FTS5 match over names, email, company, job title and notes, best bm25 first
+    leads, next_cursor = search.search_leads(db, q, limit=limit, cursor=cursor)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
     return leads
 
+@app.get("/leads/duplicates", response_model=List[schemas.DuplicateGroup])
+def read_duplicate_leads(
+    response: Response,
+    min_score: Optional[float] = Query(None, ge=0.0, le=1.0),
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    # Groups from one pass over the blocking-key indexes, cached (CRM_DEDUP_CACHE_TTL); paged by lowest lead id
+    groups = dedup.find_duplicate_groups(db, min_score)
+    if cursor:
+        _, after_id = pagination.decode_cursor(cursor, datetime_key=False)
+        groups = [group for group in groups if group.lead_ids[0] > after_id]
+    page = groups[:limit]
+    if limit and len(groups) > limit:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = pagination.encode_cursor(None, page[-1].lead_ids[0])
+    return page
+
 @app.get("/leads/{lead_id}", response_model=schemas.LeadResponse)
-def read_lead(lead_id: int, db: Session = Depends(get_db)):
-    db_lead = db.query(models.Lead).filter(models.Lead.id == lead_id).first()
+def read_lead(lead_id: int, expand: Optional[str] = None, db: Session = Depends(get_read_db)):
+    expand_names = expansions.parse_expand(expand)
+    db_lead = db.query(models.Lead).options(
+        *expansions.lead_loader_options(expand_names)
+    ).filter(models.Lead.id == lead_id).first()
     if db_lead is None:
         raise HTTPException(status_code=404, detail="Lead not found")
+    if expand_names:
+        return Response(
+            expansions.expanded_lead(db_lead, expand_names).json(exclude_unset=True),
+            media_type="application/json"
+        )
     return db_lead
 
 @app.put("/leads/{lead_id}", response_model=schemas.LeadResponse)
-def update_lead(lead_id: int, lead_update: schemas.LeadUpdate, db: Session = Depends(get_db)):
+def update_lead(lead_id: int, lead_update: schemas.LeadUpdate, request: Request, db: Session = Depends(get_db)):
     db_lead = db.query(models.Lead).filter(models.Lead.id == lead_id).first()
     if db_lead is None:
         raise HTTPException(status_code=404, detail="Lead not found")
     
     # Update fields
+    before = stats.lead_snapshots(db, [db_lead])[lead_id]
     update_data = lead_update.dict(exclude_unset=True)
+    changes = {
+        field: [getattr(db_lead, field), value]
+        for field, value in update_data.items() if getattr(db_lead, field) != value
+    }
     for field, value in update_data.items():
         setattr(db_lead, field, value)
     
     db_lead.updated_at = datetime.utcnow()
+    stats.record_lead_change(db, before, stats.lead_snapshot(db_lead), at=db_lead.updated_at)
+    user = getattr(request.state, "user", None)
+    activity.record(db, activity.change_rows(lead_id, changes, user.id if user else None, at=db_lead.updated_at))
+    jobs.publish(db, jobs.LEAD_UPDATED, {"lead_id": lead_id, "changes": changes})
     db.commit()
+    stats.invalidate_dashboard_stats()
     db.refresh(db_lead)
     return db_lead
 
+@app.get("/leads/{lead_id}/activity", response_model=List[schemas.LeadActivityResponse])
+def read_lead_activity(
+    lead_id: int,
+    response: Response,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_archived: bool = True,
+    db: Session = Depends(get_read_db)
+):
+    rows, next_cursor = activity.lead_activity(db, lead_id, limit=limit, cursor=cursor,
+                                               include_archived=include_archived)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return rows
+
 # Task endpoints
 @app.post("/tasks/", response_model=schemas.TaskResponse)
 def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db)):
@@ -156,29 +427,63 @@ def create_task(task: schemas.TaskCreate, db: Session = Depends(get_db)):
         related_lead_id=task.related_lead_id
     )
     db.add(db_task)
+    db.flush()
+    jobs.publish(db, jobs.TASK_CREATED, {"task_id": db_task.id, "lead_id": db_task.related_lead_id})
     db.commit()
+    stats.invalidate_dashboard_stats()
     db.refresh(db_task)
     return db_task
 
 @app.get("/tasks/", response_model=List[schemas.TaskResponse])
 def read_tasks(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     status: Optional[str] = None,
     assigned_to_id: Optional[int] = None,
     priority: Optional[str] = None,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(models.Task)
-    if status:
-        query = query.filter(models.Task.status == status)
-    if assigned_to_id:
-        query = query.filter(models.Task.assigned_to_id == assigned_to_id)
-    if priority:
-        query = query.filter(models.Task.priority == priority)
-    
-    tasks = query.order_by(models.Task.due_date).offset(skip).limit(limit).all()
-    return tasks
+    fast = "read_tasks" in config.FAST_JSON_ROUTES
+    columns = fast_json.response_columns(models.Task, schemas.TaskResponse) if fast else [models.Task]
+    query = db.query(*columns).filter(*task_filters(status, assigned_to_id, priority))
+    tasks, next_cursor = pagination.paginate(
+        query, models.Task.due_date, models.Task.id,
+        limit=limit, skip=skip, cursor=cursor
+    )
+    if fast:
+        response = fast_json.rows_response(tasks, schemas.TaskResponse)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return response if fast else tasks
+
+@app.get("/tasks/export")
+def export_tasks(
+    request: Request,
+    format: str = Query("ndjson", regex="^(ndjson|csv)$"),
+    status: Optional[str] = None,
+    assigned_to_id: Optional[int] = None,
+    priority: Optional[str] = None
+):
+    return StreamingResponse(
+        export.task_export(task_filters(status, assigned_to_id, priority), format,
+                           replicas.session_factory(request)),
+        media_type=export.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename=tasks.{format}"}
+    )
+
+@app.patch("/tasks/bulk", response_model=schemas.BulkUpdateResponse)
+def bulk_update_tasks(body: schemas.TaskBulkUpdate, db: Session = Depends(get_db)):
+    patch = body.patch.dict(exclude_unset=True)
+    if not patch:
+        raise HTTPException(status_code=400, detail="patch must set at least one field")
+    criteria = task_filters(**body.filter.dict()) if body.filter else []
+    if body.ids is None and not criteria:
+        raise HTTPException(status_code=400, detail="Provide ids or a non-empty filter")
+    result = bulk.update_tasks(db, patch, criteria=criteria, ids=body.ids, chunk_size=config.BULK_UPDATE_CHUNK_SIZE)
+    stats.invalidate_dashboard_stats()
+    return result
 
 @app.put("/tasks/{task_id}", response_model=schemas.TaskResponse)
 def update_task(task_id: int, task_update: schemas.TaskUpdate, db: Session = Depends(get_db)):
@@ -192,6 +497,7 @@ def update_task(task_id: int, task_update: schemas.TaskUpdate, db: Session = Dep
     
     db_task.updated_at = datetime.utcnow()
     db.commit()
+    stats.invalidate_dashboard_stats()
     db.refresh(db_task)
     return db_task
 
@@ -216,32 +522,70 @@ def create_sales_agent(agent: schemas.SalesAgentCreate, db: Session = Depends(ge
     )
     db.add(db_agent)
     db.commit()
+    routing.load_index.invalidate()
     db.refresh(db_agent)
     return db_agent
 
 @app.get("/sales-agents/", response_model=List[schemas.SalesAgentResponse])
-def read_sales_agents(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def read_sales_agents(skip: int = 0, limit: int = 100, db: Session = Depends(get_read_db)):
     agents = db.query(models.SalesAgent).offset(skip).limit(limit).all()
     return agents
 
+@app.get("/sales-agents/leaderboard", response_model=List[schemas.LeaderboardEntry])
+def read_sales_leaderboard(
+    period: str = "month",
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    sort_by: str = "won_value",
+    limit: int = 10,
+    db: Session = Depends(get_read_db)
+):
+    return performance.leaderboard(db, performance.check_period(period), from_, to, sort_by=sort_by, limit=limit)
+
+@app.get("/sales-agents/{agent_id}/performance", response_model=schemas.AgentPerformance)
+def read_sales_agent_performance(
+    agent_id: int,
+    period: str = "month",
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    db: Session = Depends(get_read_db)
+):
+    agent = db.query(models.SalesAgent).filter(models.SalesAgent.id == agent_id).first()
+    if agent is None:
+        raise HTTPException(status_code=404, detail="Sales agent not found")
+    return performance.agent_performance(db, agent, performance.check_period(period), from_, to)
+
+# Analytics endpoints
+@app.get("/analytics/funnel", response_model=schemas.Funnel)
+def read_funnel(
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    source: Optional[str] = None,
+    sales_agent_id: Optional[int] = None,
+    owner_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    return analytics.funnel(db, from_, to, source=source, sales_agent_id=sales_agent_id, owner_id=owner_id)
+
+@app.get("/analytics/timeseries", response_model=schemas.Timeseries)
+def read_timeseries(
+    period: str = "day",
+    from_: Optional[date] = Query(None, alias="from"),
+    to: Optional[date] = None,
+    source: Optional[str] = None,
+    sales_agent_id: Optional[int] = None,
+    owner_id: Optional[int] = None,
+    db: Session = Depends(get_read_db)
+):
+    return analytics.timeseries(db, analytics.check_period(period), from_, to, source=source,
+                                sales_agent_id=sales_agent_id, owner_id=owner_id)
+
 # Dashboard endpoints
 @app.get("/dashboard/stats")
-def get_dashboard_stats(db: Session = Depends(get_db)):
-    total_leads = db.query(models.Lead).count()
-    new_leads = db.query(models.Lead).filter(models.Lead.status == "new").count()
-    total_users = db.query(models.User).count()
-    active_tasks = db.query(models.Task).filter(models.Task.status.in_(["pending", "in_progress"])).count()
-    
-    closed_won = db.query(models.Lead).filter(models.Lead.status == "closed_won").count()
-    conversion_rate = round((closed_won / total_leads * 100) if total_leads > 0 else 0, 2)
-    
-    return {
-        "total_leads": total_leads,
-        "new_leads": new_leads,
-        "total_users": total_users,
-        "active_tasks": active_tasks,
-        "lead_conversion_rate": conversion_rate
-    }
+def get_dashboard_stats(request: Request, db: Session = Depends(get_read_db)):
+    # Served from a short-lived cache that lead/task/user writes invalidate; a
+    # replica may lag those writes, so only numbers read on the primary are cached
+    return stats.get_dashboard_stats(db, cache=not replicas.read_from_replica(request))
 
 # Lead Followup endpoints
 @app.post("/lead-followups/", response_model=schemas.LeadFollowupResponse)
@@ -258,20 +602,59 @@ def create_lead_followup(followup: schemas.LeadFollowupCreate, db: Session = Dep
         status=followup.status or "scheduled"
     )
     db.add(db_followup)
+    db.flush()
+    jobs.publish(db, jobs.FOLLOWUP_CREATED, {"followup_id": db_followup.id, "lead_id": db_followup.lead_id})
     db.commit()
     db.refresh(db_followup)
     return db_followup
 
 @app.get("/leads/{lead_id}/followups", response_model=List[schemas.LeadFollowupResponse])
-def get_lead_followups(lead_id: int, db: Session = Depends(get_db)):
+def get_lead_followups(lead_id: int, db: Session = Depends(get_read_db)):
     followups = db.query(models.LeadFollowup).filter(models.LeadFollowup.lead_id == lead_id).order_by(models.LeadFollowup.followup_date).all()
     return followups
 
+# Agenda: open followups and active tasks for one user, in due order
+@app.get("/agenda", response_model=List[schemas.AgendaItem])
+def read_agenda(
+    response: Response,
+    user_id: int,
+    from_: Optional[datetime] = Query(None, alias="from"),
+    to: Optional[datetime] = None,
+    limit: int = 100,
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_read_db)
+):
+    items, next_cursor = agenda.agenda(db, user_id, from_, to, limit=limit, cursor=cursor)
+    if next_cursor:
+        response.headers[pagination.NEXT_CURSOR_HEADER] = next_cursor
+    return items
+
+# Async database mode (CRM_DB_MODE=async): the lead, task, user and followup
+# endpoints run on the event loop with an async session, on the primary or a
+# replica as in sync mode, instead of the threadpool
+if config.DB_MODE == "async":
+    import async_db
+    async_db.install(app, [
+        read_users, read_user,
+        create_lead, bulk_update_leads, merge_leads, read_leads, search_leads, read_duplicate_leads,
+        read_lead, update_lead,
+        create_task, read_tasks, bulk_update_tasks, update_task,
+        create_lead_followup, get_lead_followups, read_agenda, read_lead_activity,
+        read_sales_leaderboard, read_sales_agent_performance, read_funnel, read_timeseries,
+    ], {get_db: async_db.get_async_db, get_read_db: async_db.get_async_read_db})
+
 # Initialize database on startup
 @app.on_event("startup")
 def startup_event():
+    auth.check_secret()
     models.create_tables()
-    print("Database tables created successfully")
+    print("Database schema is up to date")
+    if config.JOBS_WORKERS > 0:
+        jobs.queue.start()
+
+@app.on_event("shutdown")
+def shutdown_event():
+    jobs.queue.stop()
 
 if __name__ == "__main__":
     import uvicorn
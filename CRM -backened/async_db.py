@@ -0,0 +1,86 @@
+# async_db.py
+import inspect
+from typing import Callable, Dict, Iterable
+
+from fastapi import Depends, FastAPI, Request
+from fastapi.routing import APIRoute
+
+import models
+import replicas
+
+
+# Dependency to get an async DB session on the primary
+async def get_async_db():
+    async with models.get_async_sessionmakers()[0]() as db:
+        yield db
+
+
+# Dependency for GET handlers: an async session on a read replica when the
+# route is configured for one (config.REPLICA_ROUTES), the primary otherwise
+async def get_async_read_db(request: Request):
+    primary, replica_factories = models.get_async_sessionmakers()
+    index = replicas.replica_index(request)
+    async with (primary if index is None else replica_factories[index])() as db:
+        yield db
+
+
+def async_endpoint(endpoint: Callable, dependencies: Dict[Callable, Callable]) -> Callable:
+    """Wrap a sync ``def handler(..., db: Session)`` as an ``async def``.
+
+    The handler body runs through ``AsyncSession.run_sync``: its queries go
+    through the async driver on the event loop instead of occupying a
+    threadpool worker for the whole request. The wrapper exposes the same
+    parameters to FastAPI, with ``db`` coming from the async counterpart of
+    the handler's own session dependency (``dependencies``), so reads still
+    follow config.REPLICA_ROUTES.
+    """
+    signature = inspect.signature(endpoint)
+    parameters = []
+    for name, param in signature.parameters.items():
+        if name == "db":
+            param = param.replace(
+                default=Depends(dependencies[param.default.dependency]), annotation=inspect.Parameter.empty
+            )
+        parameters.append(param)
+
+    async def wrapper(**kwargs):
+        db = kwargs.pop("db")
+        return await db.run_sync(lambda session: endpoint(db=session, **kwargs))
+
+    # Same name as the sync handler: per-route settings (config.REPLICA_ROUTES) key on it
+    wrapper.__name__ = endpoint.__name__
+    wrapper.__doc__ = endpoint.__doc__
+    wrapper.__signature__ = signature.replace(parameters=parameters)
+    return wrapper
+
+
+def install(app: FastAPI, endpoints: Iterable[Callable], dependencies: Dict[Callable, Callable]):
+    """Swap the routes served by ``endpoints`` for async versions, in place.
+
+    ``dependencies`` maps each sync session dependency the endpoints use
+    (get_db, get_read_db) to its async counterpart. Routes keep their
+    position, path, methods and response model, so request matching and
+    the OpenAPI schema are unchanged.
+    """
+    endpoints = set(endpoints)
+    for index, route in enumerate(app.router.routes):
+        if not isinstance(route, APIRoute) or route.endpoint not in endpoints:
+            continue
+        app.router.routes[index] = APIRoute(
+            route.path,
+            async_endpoint(route.endpoint, dependencies),
+            response_model=route.response_model,
+            status_code=route.status_code,
+            tags=route.tags,
+            dependencies=route.dependencies,
+            summary=route.summary,
+            description=route.description,
+            response_description=route.response_description,
+            responses=route.responses,
+            deprecated=route.deprecated,
+            methods=route.methods,
+            operation_id=route.operation_id,
+            include_in_schema=route.include_in_schema,
+            response_class=route.response_class,
+            name=route.name,
+        )
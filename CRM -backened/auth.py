@@ -0,0 +1,209 @@
+# auth.py
+"""Password hashing, bearer tokens and the request authentication dependency.
+
+Passwords are hashed with scrypt on a small dedicated thread pool (hashlib
+releases the GIL while hashing), so a burst of logins neither blocks the
+event loop nor takes threads from the request threadpool. Tokens are
+HMAC-signed ``user_id.expires.signature`` strings; a verified token and the
+user it belongs to are cached for CRM_AUTH_CACHE_TTL seconds, so an
+authenticated request normally costs no database query.
+"""
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+
+import config
+import models
+from cache import TTLCache
+
+HASH_SCHEME = "scrypt"
+
+
+class CurrentUser(NamedTuple):
+    id: int
+    role: str
+    email: str
+
+
+_hash_pool = ThreadPoolExecutor(max_workers=config.AUTH_HASH_WORKERS, thread_name_prefix="crm-auth")
+# token -> CurrentUser
+_token_cache = TTLCache(ttl=config.AUTH_CACHE_TTL, maxsize=config.AUTH_CACHE_MAX_ENTRIES)
+# Signing key when auth is optional and CRM_AUTH_SECRET is unset; its tokens
+# only work on this process
+_process_secret = secrets.token_urlsafe(32)
+
+
+def _b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _unb64(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + "=" * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * 1024 * 1024, dklen=32)
+
+
+def hash_password_sync(password: str) -> str:
+    """``scrypt$n$r$p$salt$hash``. Slow on purpose: call hash_password from request code."""
+    n, r, p = config.AUTH_SCRYPT_N, config.AUTH_SCRYPT_R, config.AUTH_SCRYPT_P
+    salt = os.urandom(16)
+    return f"{HASH_SCHEME}${n}${r}${p}${_b64(salt)}${_b64(_scrypt(password, salt, n, r, p))}"
+
+
+def verify_password_sync(password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+    """``(matches, needs_rehash)`` for ``password`` against a stored hash.
+
+    Passwords stored before hashing was introduced are plain text; they are
+    still accepted, and flagged for rehashing, until the next login or
+    ``python manage.py hash-passwords``.
+    """
+    if stored is None:
+        # Unknown user: spend the same time as a real check
+        hash_password_sync(password)
+        return False, False
+    if not stored.startswith(HASH_SCHEME + "$"):
+        return hmac.compare_digest(password.encode(), stored.encode()), True
+    try:
+        _, n, r, p, salt, expected = stored.split("$")
+        n, r, p = int(n), int(r), int(p)
+        actual = _scrypt(password, _unb64(salt), n, r, p)
+    except ValueError:
+        return False, False
+    current = (n, r, p) == (config.AUTH_SCRYPT_N, config.AUTH_SCRYPT_R, config.AUTH_SCRYPT_P)
+    return hmac.compare_digest(actual, _unb64(expected)), not current
+
+
+async def hash_password(password: str) -> str:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, hash_password_sync, password)
+
+
+async def verify_password(password: str, stored: Optional[str]) -> Tuple[bool, bool]:
+    return await asyncio.get_running_loop().run_in_executor(_hash_pool, verify_password_sync, password, stored)
+
+
+def check_secret():
+    """Fail startup when auth is required but tokens have no shared key:
+    each worker process would reject the others' tokens."""
+    if config.AUTH_REQUIRED and not config.AUTH_SECRET:
+        raise RuntimeError("CRM_AUTH_SECRET must be set while CRM_AUTH_REQUIRED is on")
+
+
+def _sign(payload: str) -> str:
+    key = config.AUTH_SECRET or _process_secret
+    return _b64(hmac.new(key.encode(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int) -> Tuple[str, int]:
+    """A bearer token for ``user_id`` and its lifetime in seconds."""
+    expires = int(time.time()) + config.AUTH_TOKEN_TTL
+    payload = f"{user_id}.{expires}"
+    return f"{payload}.{_sign(payload)}", config.AUTH_TOKEN_TTL
+
+
+def start_session(user: models.User) -> Tuple[str, int]:
+    """Issue a token for ``user`` and cache it, so the client's first
+    authenticated request skips the user lookup."""
+    token, expires_in = issue_token(user.id)
+    remember(token, CurrentUser(user.id, user.role, user.email), int(time.time()) + expires_in)
+    return token, expires_in
+
+
+def read_token(token: str) -> Optional[Tuple[int, int]]:
+    """``(user_id, expires)`` for a well-signed, unexpired token, else None."""
+    try:
+        user_id, expires, signature = token.split(".")
+        user_id, expires = int(user_id), int(expires)
+    except ValueError:
+        return None
+    if not hmac.compare_digest(signature, _sign(f"{user_id}.{expires}")) or expires <= time.time():
+        return None
+    return user_id, expires
+
+
+def find_user(db: Session, login: str) -> Optional[models.User]:
+    """The user whose email or username is ``login``."""
+    return db.query(models.User).filter(or_(models.User.email == login, models.User.username == login)).first()
+
+
+def remember(token: str, user: CurrentUser, expires: int):
+    _token_cache.set(token, user, ttl=min(config.AUTH_CACHE_TTL, max(0.0, expires - time.time())))
+
+
+def _load_user(user_id: int) -> Optional[CurrentUser]:
+    db = models.SessionLocal()
+    try:
+        row = db.query(models.User.id, models.User.role, models.User.email, models.User.is_active).filter(
+            models.User.id == user_id
+        ).first()
+    finally:
+        db.close()
+    if row is None or not row.is_active:
+        return None
+    return CurrentUser(row.id, row.role, row.email)
+
+
+async def user_for_token(token: str) -> Optional[CurrentUser]:
+    user = _token_cache.get(token)
+    if user is not None:
+        return user
+    claims = read_token(token)
+    if claims is None:
+        return None
+    user = await run_in_threadpool(_load_user, claims[0])
+    if user is not None:
+        remember(token, user, claims[1])
+    return user
+
+
+def _bearer(request: Request) -> Optional[str]:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+
+async def request_user(request: Request) -> Optional[CurrentUser]:
+    """The user behind the request's bearer token, or None."""
+    token = _bearer(request)
+    return await user_for_token(token) if token else None
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=detail, headers={"WWW-Authenticate": "Bearer"})
+
+
+def is_staff(user: CurrentUser) -> bool:
+    """Whether ``user`` may use the CRM routes (config.AUTH_STAFF_ROLES)."""
+    return user.role in config.AUTH_STAFF_ROLES
+
+
+async def authenticate(request: Request) -> Optional[CurrentUser]:
+    """App-wide dependency: sets ``request.state.user`` from the bearer token.
+
+    Outside CRM_AUTH_PUBLIC_ROUTES a bad or expired token is rejected, and
+    so is a missing one while CRM_AUTH_REQUIRED is on; a customer's token
+    is refused there too.
+    """
+    token = _bearer(request)
+    user = await user_for_token(token) if token else None
+    endpoint = getattr(request.scope.get("endpoint"), "__name__", "")
+    if endpoint not in config.AUTH_PUBLIC_ROUTES:
+        if user is None and token:
+            raise _unauthorized("Invalid or expired token")
+        if user is None and config.AUTH_REQUIRED:
+            raise _unauthorized("Not authenticated")
+        if user is not None and not is_staff(user):
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not available to this account")
+    request.state.user = user
+    return user
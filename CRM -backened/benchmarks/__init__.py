@@ -0,0 +1,2 @@
+# Benchmarks for the CRM backend. Run from the backend directory, e.g.
+#   python -m benchmarks.bench_pagination --leads 1000000
@@ -0,0 +1,88 @@
+# benchmarks/bench_agenda.py
+"""Latency of GET /agenda pages over a large completed-followup history.
+
+Seeds open followups around today plus ``--history`` completed ones (mostly
+past, some closed early ahead of their date), then times the first page and
+a cursor page with the partial indexes ix_lead_followups_open_owner_date /
+_agent_date and again after dropping them (falling back to scanning the
+date order or sorting, and reading completed followups too).
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from fastapi import Response
+from sqlalchemy import text
+
+import app
+import models
+from benchmarks import seed
+
+
+def seed_history(engine, leads, count, batch_size=50000, seed_value=5):
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+    rows = (
+        {"lead_id": rng.randint(1, leads), "followup_date": now + timedelta(minutes=rng.randint(-3 * 365 * 1440, 30 * 1440)),
+         "notes": None, "status": "completed", "completed": True, "created_at": now}
+        for _ in range(count)
+    )
+    seed._insert_batches(engine, models.LeadFollowup.__table__, rows, batch_size)
+
+
+def time_pages(engine, users, since, limit, repeat):
+    db = seed.make_session(engine)
+    first, paged = [], []
+    for i in range(repeat):
+        user_id = i % users + 1
+        started = time.perf_counter()
+        response = Response()
+        app.read_agenda(response=response, user_id=user_id, from_=since, to=None, limit=limit, db=db)
+        first.append((time.perf_counter() - started) * 1000)
+        cursor = response.headers.get("x-next-cursor")
+        if cursor:
+            started = time.perf_counter()
+            app.read_agenda(response=Response(), user_id=user_id, from_=since, to=None, limit=limit,
+                            cursor=cursor, db=db)
+            paged.append((time.perf_counter() - started) * 1000)
+    db.close()
+    return sum(first) / len(first), sum(paged) / len(paged) if paged else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="bench_agenda.db")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--leads", type=int, default=50_000)
+    parser.add_argument("--history", type=int, default=2_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db)
+    seed.seed_users(engine, args.users)
+    seed.seed_sales_agents(engine, args.users // 4)
+    seed.seed_leads(engine, args.leads, users=args.users, agents=args.users // 4)
+    seed.seed_followups(engine, args.leads, per_lead=1)
+    seed.seed_tasks(engine, args.leads, users=args.users, leads=args.leads)
+    seed_history(engine, args.leads, args.history)
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+
+    since = datetime.utcnow() - timedelta(days=7)
+    print(f"{args.history} completed followups, {args.leads} open, page size {args.limit}")
+    print(f"{'index':<22} {'first page ms':>14} {'cursor page ms':>15}")
+    first, paged = time_pages(engine, args.users, since, args.limit, args.repeat)
+    print(f"{'owner/agent partial':<22} {first:>14.2f} {paged:>15.2f}")
+    with engine.begin() as conn:
+        conn.execute(text("DROP INDEX ix_lead_followups_open_owner_date"))
+        conn.execute(text("DROP INDEX ix_lead_followups_open_agent_date"))
+        conn.execute(text("ANALYZE"))
+    first, paged = time_pages(engine, args.users, since, args.limit, args.repeat)
+    print(f"{'lead_id index only':<22} {first:>14.2f} {paged:>15.2f}")
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# benchmarks/bench_agent_performance.py
+"""Latency of the sales agent performance and leaderboard endpoints.
+
+Seeds ``--agents`` agents and ``--leads`` leads (default 1k x 5M), builds
+lead_counters and agent_rollups, then times each endpoint against the
+equivalent aggregate over leads (closes dated by updated_at, as the
+rollup rebuild does). Also times status-changing lead updates, which now
+maintain the rollups.
+
+    python -m benchmarks.bench_agent_performance --leads 5000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, func, select, text
+
+import app
+import models
+import performance
+import stats
+from benchmarks import seed
+
+
+def timed(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def scan_leads(db, start, end, agent_id=None):
+    """The naive equivalent: aggregate closed leads straight from leads."""
+    lead = models.Lead
+    won = lead.status == "closed_won"
+    query = select(
+        lead.sales_agent_id,
+        func.sum(case((won, 1), else_=0)), func.sum(case((won, lead.value), else_=0.0)),
+        func.sum(case((won, 0), else_=1)), func.sum(case((won, 0.0), else_=lead.value)),
+    ).where(
+        lead.status.in_(stats.CLOSED_STATUSES),
+        lead.updated_at >= datetime.combine(start, datetime.min.time()),
+        lead.updated_at < datetime.combine(end, datetime.min.time()),
+    ).group_by(lead.sales_agent_id)
+    if agent_id is not None:
+        query = query.where(lead.sales_agent_id == agent_id)
+    return db.execute(query).all()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench_agent_performance.db")
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--leads", type=int, default=5_000_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--reuse", action="store_true", help="skip seeding when --db already exists")
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db, fresh=not args.reuse)
+    models.SessionLocal.configure(bind=engine)
+    db = seed.make_session(engine)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed.seed_users(engine, args.agents)
+        seed.seed_sales_agents(engine, args.agents)
+        seed.seed_leads(engine, args.leads, users=args.agents, agents=args.agents)
+        stats.rebuild_lead_counters(db)
+        performance.rebuild_agent_rollups(db)
+        db.commit()
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        print(f"seeded {args.leads} leads, {args.agents} agents in {time.perf_counter() - started:.0f}s")
+    rollup_rows = db.query(func.count()).select_from(models.AgentRollup).scalar()
+    print(f"agent_rollups rows: {rollup_rows}")
+
+    today = datetime.utcnow().date()
+    month = today.replace(day=1)
+    year_ago = (month - timedelta(days=335)).replace(day=1)
+    quarter_ago = today - timedelta(days=89)
+    rng = random.Random(1)
+
+    def agent():
+        return rng.randint(1, args.agents)
+
+    def agent_performance(start, end, period="month"):
+        return app.read_sales_agent_performance(agent_id=agent(), period=period, from_=start, to=end, db=db)
+
+    def leaderboard(start, end):
+        return app.read_sales_leaderboard(period="month", from_=start, to=end, sort_by="won_value", limit=10, db=db)
+
+    cases = [
+        ("performance month", lambda: agent_performance(None, None),
+         lambda: scan_leads(db, month, today + timedelta(days=1), agent())),
+        ("performance 12 months",
+         lambda: agent_performance(year_ago, month),
+         lambda: scan_leads(db, year_ago, today + timedelta(days=1), agent())),
+        ("performance 90 days",
+         lambda: agent_performance(quarter_ago, today, "day"),
+         lambda: scan_leads(db, quarter_ago, today + timedelta(days=1), agent())),
+        ("leaderboard month", lambda: leaderboard(None, None),
+         lambda: scan_leads(db, month, today + timedelta(days=1))),
+        ("leaderboard 12 months", lambda: leaderboard(year_ago, month),
+         lambda: scan_leads(db, year_ago, today + timedelta(days=1))),
+    ]
+    print(f"{'endpoint':<24} {'rollups ms':>11} {'scan leads ms':>14}")
+    for label, rollup_call, scan_call in cases:
+        rollup_ms = timed(rollup_call, args.repeat)
+        scan_ms = timed(scan_call, max(1, args.repeat // 10))
+        print(f"{label:<24} {rollup_ms:>11.2f} {scan_ms:>14.1f}")
+
+    # Incremental maintenance: status changes through the real endpoint
+    statuses = ["contacted", "qualified", "closed_won", "closed_lost"]
+    samples = []
+    for _ in range(args.updates):
+        update = app.schemas.LeadUpdate(status=rng.choice(statuses))
+        started = time.perf_counter()
+        app.update_lead(lead_id=rng.randint(1, args.leads), lead_update=update, db=db)
+        samples.append((time.perf_counter() - started) * 1000)
+    print(f"update_lead with status change: median {statistics.median(samples):.2f} ms over {args.updates}")
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_analytics.py
+"""Latency of GET /analytics/funnel and /analytics/timeseries.
+
+Seeds ``--leads`` leads (default 5M over three years), then times each
+endpoint uncached (splitting out the time spent pulling the grouped column
+arrays) and cached, against the naive equivalent of one aggregate query per bucket.
+
+    python -m benchmarks.bench_analytics --leads 5000000
+"""
+import argparse
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, text
+
+import analytics
+import app
+import models
+from benchmarks import seed
+
+
+def timed(call, repeat, before=None):
+    samples = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def per_bucket_queries(db, start, end, **filters):
+    """The naive time series: one created/won/lost/pipeline query per day."""
+    lead = models.Lead
+    day = start
+    while day <= end:
+        until = datetime.combine(day + timedelta(days=1), datetime.min.time())
+        since = datetime.combine(day, datetime.min.time())
+        query = db.query(func.count(lead.id), func.sum(lead.value)).filter_by(**filters)
+        query.filter(lead.created_at >= since, lead.created_at < until).one()
+        for closed in ("closed_won", "closed_lost"):
+            query.filter(lead.status == closed, lead.updated_at >= since, lead.updated_at < until).one()
+        query.filter(lead.created_at < until, lead.status.notin_(("closed_won", "closed_lost"))).one()
+        day += timedelta(days=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench_analytics.db")
+    parser.add_argument("--leads", type=int, default=5_000_000)
+    parser.add_argument("--agents", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="skip seeding when --db already exists")
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db, fresh=not args.reuse)
+    db = seed.make_session(engine)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed.seed_users(engine, args.agents)
+        seed.seed_sales_agents(engine, args.agents)
+        seed.seed_leads(engine, args.leads, users=args.agents, agents=args.agents)
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+        print(f"seeded {args.leads} leads in {time.perf_counter() - started:.0f}s")
+
+    today = datetime.utcnow().date()
+    quarter_ago = today - timedelta(days=89)
+    year_ago = today - timedelta(days=364)
+    two_years_ago = today - timedelta(days=729)
+    clear = analytics._cache.invalidate
+
+    cases = [
+        ("funnel 90 days", dict(start=quarter_ago, end=today), None),
+        ("funnel 1 year", dict(start=year_ago, end=today), None),
+        ("funnel 1 year, agent", dict(start=year_ago, end=today, sales_agent_id=7), None),
+        ("timeseries day 90 days", dict(start=quarter_ago, end=today), "day"),
+        ("timeseries week 1 year", dict(start=year_ago, end=today), "week"),
+        ("timeseries month 2 years", dict(start=two_years_ago, end=today), "month"),
+        ("timeseries month 2y, source", dict(start=two_years_ago, end=today, source="website"), "month"),
+    ]
+    print(f"{'call':<30} {'groups':>9} {'arrays ms':>10} {'uncached ms':>12} {'cached ms':>10}")
+    for label, params, period in cases:
+        if period is None:
+            def call(params=params):
+                return app.read_funnel(from_=params["start"], to=params["end"], source=params.get("source"),
+                                       sales_agent_id=params.get("sales_agent_id"), owner_id=None, db=db)
+        else:
+            def call(params=params, period=period):
+                return app.read_timeseries(period=period, from_=params["start"], to=params["end"],
+                                           source=params.get("source"), sales_agent_id=params.get("sales_agent_id"),
+                                           owner_id=None, db=db)
+        # The funnel only pulls leads created in the range
+        params = dict(params, open_before=period is not None)
+        columns = analytics.load_columns(db, **params)
+        arrays_ms = timed(lambda params=params: analytics.load_columns(db, **params), args.repeat)
+        uncached_ms = timed(call, args.repeat, before=clear)
+        cached_ms = timed(call, args.repeat * 20)
+        print(f"{label:<30} {len(columns['count']):>9} {arrays_ms:>10.1f} {uncached_ms:>12.1f} {cached_ms:>10.3f}")
+
+    started = time.perf_counter()
+    per_bucket_queries(db, quarter_ago, today)
+    print(f"naive timeseries day 90 days (one query set per bucket): {(time.perf_counter() - started) * 1000:.1f} ms")
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
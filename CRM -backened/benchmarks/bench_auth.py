@@ -0,0 +1,126 @@
+# benchmarks/bench_auth.py
+"""Login throughput and the cost of authenticating a request.
+
+Runs in-process (httpx over ASGI). First drives POST /auth/login at several
+concurrencies while a probe keeps calling GET /health, so the probe's
+latency shows whether password hashing ever blocks the event loop. Then
+times GET /leads/{id} without auth, with a cached token and with the token
+cache cleared before every request, counting SQL statements per request.
+
+    python -m benchmarks.bench_auth
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from sqlalchemy import event, update
+
+import app
+import auth
+import config
+import models
+from benchmarks import seed
+from benchmarks.load import percentile
+
+PASSWORD = "correct horse battery staple"
+
+
+async def login_flood(client, users, concurrency, duration):
+    deadline = time.perf_counter() + duration
+    logins, failures, probes = 0, 0, []
+
+    async def login(n):
+        nonlocal logins, failures
+        while time.perf_counter() < deadline:
+            response = await client.post("/auth/login", json={"username": f"user{n % users + 1}", "password": PASSWORD})
+            if response.status_code == 200:
+                logins += 1
+            else:
+                failures += 1
+            n += concurrency
+
+    async def probe():
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            await client.get("/health")
+            probes.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    await asyncio.gather(probe(), *(login(n) for n in range(concurrency)))
+    return logins / (time.perf_counter() - started), failures, probes
+
+
+async def timed_gets(client, path, headers, repeat, before=None):
+    samples = []
+    for _ in range(repeat):
+        if before is not None:
+            before()
+        started = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200, response.text
+    return statistics.median(samples)
+
+
+async def run(args, engine):
+    statements = [0]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count(*_):
+        statements[0] += 1
+
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        print(f"scrypt n={config.AUTH_SCRYPT_N} r={config.AUTH_SCRYPT_R}, {config.AUTH_HASH_WORKERS} hash worker(s)")
+        print(f"{'concurrency':>11} {'logins/s':>9} {'failed':>7} {'health p50 ms':>14} {'health p99 ms':>14}")
+        for concurrency in args.concurrency:
+            rate, failures, probes = await login_flood(client, args.users, concurrency, args.duration)
+            print(f"{concurrency:>11} {rate:>9.1f} {failures:>7} {percentile(probes, 50):>14.2f} "
+                  f"{percentile(probes, 99):>14.2f}")
+
+        response = await client.post("/auth/login", json={"username": "user1", "password": PASSWORD})
+        headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+        path = "/leads/1"
+        cases = [
+            ("no auth (CRM_AUTH_REQUIRED=0)", {}, None, False),
+            ("bearer token, cached", headers, None, True),
+            ("bearer token, cache cleared", headers, auth._token_cache.invalidate, True),
+        ]
+        print(f"\n{'GET ' + path:<32} {'median ms':>10} {'SQL/request':>12}")
+        for label, request_headers, before, required in cases:
+            config.AUTH_REQUIRED = required
+            await timed_gets(client, path, request_headers, 20, before)
+            statements[0] = 0
+            median = await timed_gets(client, path, request_headers, args.repeat, before)
+            print(f"{label:<32} {median:>10.3f} {statements[0] / args.repeat:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench_auth.db")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db)
+    seed.seed_users(engine, args.users)
+    seed.seed_sales_agents(engine, args.users)
+    seed.seed_leads(engine, 1000, users=args.users, agents=args.users)
+    with engine.begin() as conn:
+        # One hash for everyone: seeding should not take users x hash time
+        conn.execute(update(models.User).values(password_hash=auth.hash_password_sync(PASSWORD)))
+    models.SessionLocal.configure(bind=engine)
+    config.RESPONSE_CACHE_TTLS.clear()
+    try:
+        asyncio.run(run(args, engine))
+    finally:
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
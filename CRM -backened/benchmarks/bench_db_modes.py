@@ -0,0 +1,91 @@
+# benchmarks/bench_db_modes.py
+"""Requests/sec and latency percentiles for CRM_DB_MODE=sync vs async.
+
+Starts uvicorn once per mode against the same seeded database and drives
+a mixed list/detail/create workload at a fixed concurrency.
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import subprocess
+import sys
+import time
+
+import httpx
+
+from benchmarks import seed
+from benchmarks.load import percentile, wait_until_up
+
+
+async def worker(client, deadline, leads, latencies, errors, rng):
+    while time.perf_counter() < deadline:
+        roll = rng.random()
+        if roll < 0.5:
+            request = client.get("/leads/", params={"limit": 50})
+        elif roll < 0.8:
+            request = client.get(f"/leads/{rng.randint(1, leads)}")
+        elif roll < 0.9:
+            request = client.get("/tasks/", params={"limit": 50})
+        else:
+            request = client.post("/leads/", json={"first_name": "Load", "last_name": "Test", "value": 10.0})
+        started = time.perf_counter()
+        response = await request
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            errors.append(response.status_code)
+
+
+async def drive(base_url, concurrency, duration, leads):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            worker(client, deadline, leads, latencies, errors, random.Random(i)) for i in range(concurrency)
+        ))
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="bench_db_modes.db")
+    parser.add_argument("--leads", type=int, default=100_000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db)
+    seed.seed_users(engine, 100)
+    seed.seed_sales_agents(engine, 100)
+    seed.seed_leads(engine, args.leads)
+    seed.seed_tasks(engine, args.leads // 2, leads=args.leads)
+    engine.dispose()
+
+    base_url = f"http://127.0.0.1:{args.port}"
+    print(f"{'mode':<6} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for mode in ("sync", "async"):
+        db_path = f"{args.db}.{mode}"
+        shutil.copyfile(args.db, db_path)
+        env = dict(os.environ, CRM_DB_MODE=mode, CRM_DATABASE_URL=f"sqlite:///{db_path}", CRM_AUTH_REQUIRED="0")
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.port), "--log-level", "warning"],
+            env=env,
+        )
+        try:
+            wait_until_up(base_url)
+            latencies, errors = asyncio.run(drive(base_url, args.concurrency, args.duration, args.leads))
+        finally:
+            server.terminate()
+            server.wait()
+            os.remove(db_path)
+        print(
+            f"{mode:<6} {len(latencies) / args.duration:>8.0f} {percentile(latencies, 50):>8.1f} "
+            f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f} {len(errors):>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
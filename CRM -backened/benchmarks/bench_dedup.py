@@ -0,0 +1,187 @@
+# benchmarks/bench_dedup.py
+"""Duplicate detection over a large leads table.
+
+Seeds ``--leads`` leads (default 2M) plus ``--duplicates`` near-copies of
+random ones (sub-addressed email under a misspelt name, reformatted phone,
+or swapped and re-cased name at the same company with a legal suffix),
+backfills the blocking keys, then times:
+
+* the full-table pass behind GET /leads/duplicates, with its recall of the
+  injected pairs, against an exact GROUP BY lower(email) over the raw column;
+* the per-lead check run by POST /leads/, against the same lookup without
+  the key indexes (a scan per lead);
+* a LeadImporter batch with and without the duplicate check.
+
+    python -m benchmarks.bench_dedup --leads 2000000
+"""
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import delete, func, insert, or_, select, text
+
+import bulk
+import config
+import dedup
+import models
+from benchmarks import seed
+
+
+def timed(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def variant(row, kind, rng):
+    """A near-copy of ``row`` that a person might enter again."""
+    lead = dict(row)
+    if kind == 0:
+        local, _, domain = row["email"].partition("@")
+        lead["email"] = f"{local.upper()}+crm@{domain}"
+        name = row["first_name"]
+        cut = rng.randrange(len(name))
+        lead["first_name"] = name[:cut] + name[cut + 1:] or name
+        lead["phone"] = None
+    elif kind == 1:
+        digits = row["phone"][-10:]
+        lead["phone"] = f"({digits[:3]}) {digits[3:6]}-{digits[6:]}"
+        lead["email"] = f"other{rng.randint(1, 10 ** 9)}@example.org"
+    else:
+        lead["first_name"], lead["last_name"] = row["last_name"].upper(), row["first_name"]
+        lead["company"] = f"{row['company']}, Inc."
+        lead["email"], lead["phone"] = None, None
+    return lead
+
+
+def inject_duplicates(engine, db, leads, count, rng):
+    """Insert ``count`` variants of random leads; returns (original id, copy id) pairs."""
+    lead = models.Lead
+    columns = [lead.id, lead.first_name, lead.last_name, lead.email, lead.phone, lead.company]
+    sources = rng.sample(range(1, leads + 1), count)
+    originals = {}
+    for start in range(0, count, 10_000):
+        chunk = sources[start:start + 10_000]
+        originals.update((row.id, row._mapping) for row in db.execute(select(*columns).where(lead.id.in_(chunk))))
+    rows, pairs = [], []
+    for n, source in enumerate(sources):
+        copy = variant(originals[source], n % 3, rng)
+        copy["id"] = leads + n + 1
+        copy.update(status="new", value=100.0)
+        rows.append(copy)
+        pairs.append((source, copy["id"]))
+    with engine.begin() as conn:
+        conn.execute(insert(models.Lead.__table__), rows)
+    return pairs
+
+
+def unindexed_lookup(db, values):
+    """The check without key columns: normalize in SQL and scan the table."""
+    lead = models.Lead
+    digits = func.replace(func.replace(func.replace(func.replace(lead.phone, "+", ""), " ", ""), "-", ""), "(", "")
+    query = select(lead.id).where(or_(
+        func.lower(lead.email) == (values["email"] or "").lower(),
+        func.substr(digits, -10) == (dedup.phone_key(values["phone"]) or ""),
+        (func.lower(lead.first_name) == values["first_name"].lower())
+        & (func.lower(lead.last_name) == values["last_name"].lower()),
+    ))
+    return db.execute(query).all()
+
+
+def import_rows(count, rng, existing):
+    """``count`` new leads, every other one a variant of an existing lead."""
+    rows = []
+    for n in range(count):
+        if n % 2:
+            row = variant(rng.choice(existing), n % 3, rng)
+        else:
+            row = {"first_name": f"Imported{n}", "last_name": "Lead", "email": f"imported{n}@example.net",
+                   "phone": None, "company": f"Company {n}"}
+        row.pop("id", None)
+        rows.append((n + 1, dict(row, status="new", value=10.0)))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench_dedup.db")
+    parser.add_argument("--leads", type=int, default=2_000_000)
+    parser.add_argument("--duplicates", type=int, default=20_000)
+    parser.add_argument("--checks", type=int, default=1000)
+    parser.add_argument("--import-rows", type=int, default=10_000)
+    parser.add_argument("--reuse", action="store_true", help="skip seeding when --db already exists")
+    args = parser.parse_args()
+    rng = random.Random(5)
+
+    engine = seed.make_engine(args.db, fresh=not args.reuse)
+    db = seed.make_session(engine)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed.seed_users(engine, 100)
+        seed.seed_sales_agents(engine, 100)
+        seed.seed_leads(engine, args.leads, users=100, agents=100)
+        pairs = inject_duplicates(engine, db, args.leads, args.duplicates, rng)
+        print(f"seeded {args.leads} leads + {args.duplicates} near-duplicates in {time.perf_counter() - started:.0f}s")
+        started = time.perf_counter()
+        done = dedup.rebuild_match_keys(db)
+        elapsed = time.perf_counter() - started
+        print(f"key backfill (manage.py rebuild-match-keys): {done} leads in {elapsed:.1f}s, {done / elapsed:,.0f} leads/s")
+        with engine.begin() as conn:
+            conn.execute(text("ANALYZE"))
+    else:
+        pairs = [(source, args.leads + n + 1) for n, source in
+                 enumerate(random.Random(5).sample(range(1, args.leads + 1), args.duplicates))]
+    total = db.query(func.count(models.Lead.id)).scalar()
+
+    started = time.perf_counter()
+    groups = dedup._duplicate_groups(db, config.DEDUP_MIN_SCORE)
+    pass_s = time.perf_counter() - started
+    group_of = {lead_id: n for n, group in enumerate(groups) for lead_id in group.lead_ids}
+    found = sum(1 for a, b in pairs if a in group_of and group_of.get(a) == group_of.get(b))
+    print(f"\nfull-table pass over {total} leads: {pass_s:.1f}s, {len(groups)} groups, "
+          f"{found}/{len(pairs)} injected pairs grouped ({found / max(len(pairs), 1):.1%})")
+    started = time.perf_counter()
+    exact = db.execute(
+        select(func.lower(models.Lead.email)).where(models.Lead.email.isnot(None))
+        .group_by(func.lower(models.Lead.email)).having(func.count() > 1)
+    ).all()
+    print(f"exact GROUP BY lower(email), no key index: {time.perf_counter() - started:.1f}s, {len(exact)} groups")
+
+    sample_ids = rng.sample(range(1, args.leads + 1), args.checks)
+    lead = models.Lead
+    samples = [
+        dict(row._mapping) for row in db.execute(
+            select(lead.id, lead.first_name, lead.last_name, lead.email, lead.phone, lead.company)
+            .where(lead.id.in_(sample_ids))
+        )
+    ]
+    it = iter(samples * 2)
+    check_ms = timed(lambda: dedup.find_duplicates(db, next(it)), len(samples))
+    scan_ms = timed(lambda: unindexed_lookup(db, samples[0]), 3)
+    print(f"\nper-lead check (POST /leads/): indexed median {check_ms:.3f} ms, unindexed scan {scan_ms:.0f} ms")
+
+    existing = [s for s in samples if s["email"] and s["phone"]]
+    max_id = db.query(func.max(lead.id)).scalar()
+    print(f"\n{'import ' + str(args.import_rows) + ' rows (half duplicates)':<44} {'rows/s':>8} {'inserted':>9} {'rejected':>9}")
+    for label, allow in (("LeadImporter, duplicate check", False), ("LeadImporter, allow_duplicates", True)):
+        rows = import_rows(args.import_rows, random.Random(9), existing)
+        importer = bulk.LeadImporter(db, allow_duplicates=allow)
+        started = time.perf_counter()
+        for start in range(0, len(rows), config.BULK_IMPORT_BATCH_SIZE):
+            importer.add_batch(rows[start:start + config.BULK_IMPORT_BATCH_SIZE])
+        elapsed = time.perf_counter() - started
+        result = importer.result()
+        print(f"{label:<44} {len(rows) / elapsed:>8,.0f} {result.inserted:>9} {result.failed:>9}")
+        # Leave the table as seeded for the next run
+        db.execute(delete(lead.__table__).where(lead.id > max_id))
+        db.commit()
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
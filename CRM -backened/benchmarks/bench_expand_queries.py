@@ -0,0 +1,71 @@
+# benchmarks/bench_expand_queries.py
+"""Query count and latency of GET /leads/?expand=owner,sales_agent,followups.
+
+Compares the eager-loaded expansion with the N+1 pattern (list page, then
+one followup and one user lookup per lead) the front end used before.
+tests/test_expand_queries.py holds the query count bound.
+"""
+import argparse
+import time
+
+from fastapi import Response
+from sqlalchemy import event
+
+import app
+from benchmarks import seed
+
+EXPAND = "owner,sales_agent,followups"
+
+
+class QueryCounter:
+    def __init__(self, engine):
+        self.count = 0
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+def n_plus_one(db, limit):
+    leads = app.read_leads(response=Response(), limit=limit, db=db)
+    for lead in leads:
+        app.get_lead_followups(lead_id=lead.id, db=db)
+        if lead.owner_id:
+            app.read_user(user_id=lead.owner_id, db=db)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="bench_expand_queries.db")
+    parser.add_argument("--leads", type=int, default=20_000)
+    parser.add_argument("--page-sizes", type=int, nargs="+", default=[10, 100, 1000])
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db)
+    seed.seed_users(engine, 100)
+    seed.seed_sales_agents(engine, 100)
+    seed.seed_leads(engine, args.leads)
+    seed.seed_followups(engine, args.leads)
+    counter = QueryCounter(engine)
+
+    print(f"{'page':>6} {'expand queries':>15} {'expand ms':>10} {'n+1 queries':>12} {'n+1 ms':>8}")
+    for limit in args.page_sizes:
+        db = seed.make_session(engine)
+        counter.count = 0
+        started = time.perf_counter()
+        app.read_leads(response=Response(), limit=limit, expand=EXPAND, db=db)
+        expand_ms = (time.perf_counter() - started) * 1000
+        expand_queries = counter.count
+        db.close()
+
+        db = seed.make_session(engine)
+        counter.count = 0
+        started = time.perf_counter()
+        n_plus_one(db, limit)
+        naive_ms = (time.perf_counter() - started) * 1000
+        db.close()
+        print(f"{limit:>6} {expand_queries:>15} {expand_ms:>10.1f} {counter.count:>12} {naive_ms:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# benchmarks/bench_metrics.py
+"""Overhead of the request/DB instrumentation (config.METRICS_ENABLED).
+
+Runs the same in-process request mix with metrics off and on, alternating
+rounds to spread out noise, and exits non-zero if the median overhead is
+above --max-overhead percent.
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+import app
+import config
+from benchmarks import seed
+
+
+def run_round(client, requests):
+    started = time.perf_counter()
+    for path, params in requests:
+        assert client.get(path, params=params).status_code == 200
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="bench_metrics.db")
+    parser.add_argument("--leads", type=int, default=20_000)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--max-overhead", type=float, default=3.0)
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db)
+    seed.seed_users(engine, 100)
+    seed.seed_sales_agents(engine, 100)
+    seed.seed_leads(engine, args.leads)
+    seed.seed_tasks(engine, args.leads, leads=args.leads)
+
+    def get_read_db():
+        db = seed.make_session(engine)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.app.dependency_overrides[app.get_read_db] = get_read_db
+    config.RESPONSE_CACHE_TTLS.clear()
+    config.AUTH_REQUIRED = False
+    client = TestClient(app.app)
+
+    rng = random.Random(1)
+    requests = [
+        rng.choice([
+            ("/leads/", {"limit": 50}),
+            (f"/leads/{rng.randint(1, args.leads)}", {}),
+            ("/tasks/", {"limit": 50, "status": "pending"}),
+            ("/health", {}),
+        ])
+        for _ in range(args.requests)
+    ]
+    run_round(client, requests)  # warm up
+
+    timings = {False: [], True: []}
+    for _ in range(args.rounds):
+        for enabled in (False, True):
+            config.METRICS_ENABLED = enabled
+            timings[enabled].append(run_round(client, requests))
+
+    off, on = statistics.median(timings[False]), statistics.median(timings[True])
+    overhead = (on - off) / off * 100
+    print(f"metrics off {args.requests / off:>8.0f} req/s")
+    print(f"metrics on  {args.requests / on:>8.0f} req/s  overhead {overhead:+.1f}%")
+    sys.exit(1 if overhead > args.max_overhead else 0)
+
+
+if __name__ == "__main__":
+    main()
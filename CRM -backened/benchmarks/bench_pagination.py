@@ -0,0 +1,67 @@
+# benchmarks/bench_pagination.py
+"""Offset vs keyset paging latency for GET /leads/ as page depth grows."""
+import argparse
+import statistics
+import time
+
+from fastapi import Response
+
+import app
+import models
+import pagination
+from benchmarks import seed
+
+
+def time_call(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="bench_pagination.db")
+    parser.add_argument("--leads", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="reuse an already seeded database")
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db, fresh=not args.reuse)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed.seed_leads(engine, args.leads)
+        print(f"seeded {args.leads} leads in {time.perf_counter() - started:.1f}s")
+    db = seed.make_session(engine)
+
+    print(f"{'page':>8} {'offset ms':>10} {'cursor ms':>10}")
+    page = 1
+    while (page - 1) * args.limit < args.leads:
+        skip = (page - 1) * args.limit
+        cursor = None
+        if skip:
+            # Cursor a client would hold after reading the previous page
+            last = (
+                db.query(models.Lead.created_at, models.Lead.id)
+                .order_by(models.Lead.created_at.desc(), models.Lead.id.desc())
+                .offset(skip - 1).limit(1).one()
+            )
+            cursor = pagination.encode_cursor(last.created_at, last.id)
+
+        offset_ms = time_call(
+            lambda: app.read_leads(response=Response(), skip=skip, limit=args.limit, db=db), args.repeat
+        )
+        cursor_ms = time_call(
+            lambda: app.read_leads(response=Response(), limit=args.limit, cursor=cursor, db=db), args.repeat
+        )
+        print(f"{page:>8} {offset_ms:>10.2f} {cursor_ms:>10.2f}")
+        page *= 10
+
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+# benchmarks/bench_routing.py
+"""Lead routing: assign new leads across sales agents with each strategy.
+
+Imports ``--leads`` unassigned leads through LeadImporter with routing on,
+against a book of existing leads spread over ``--agents`` agents, and
+reports throughput, the resulting spread of open leads and open value per
+agent and whether the in-memory load index still matches the database.
+The routing decision alone (pick + reserve on the loaded index) and a
+short run of the naive approach (a COUNT ... GROUP BY per assignment) are
+timed for comparison.
+"""
+import argparse
+import time
+
+from sqlalchemy import func, select
+
+import bulk
+import models
+import routing
+import stats
+from benchmarks import seed
+
+
+def raw_leads(count):
+    for i in range(count):
+        yield {"first_name": f"First{i}", "last_name": f"Last{i}", "value": float(i % 5000)}
+
+
+def open_leads_per_agent(db):
+    rows = db.execute(
+        select(models.Lead.sales_agent_id, func.count(models.Lead.id))
+        .where(models.Lead.status.notin_(stats.CLOSED_STATUSES), models.Lead.sales_agent_id.isnot(None))
+        .group_by(models.Lead.sales_agent_id)
+    ).all()
+    return dict(rows)
+
+
+def bench_strategy(db, strategy, count, batch_size):
+    routing.load_index.invalidate()
+    importer = bulk.LeadImporter(db, strategy)
+    started = time.perf_counter()
+    batch = []
+    for row in enumerate(raw_leads(count), start=1):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            importer.add_batch(batch)
+            batch = []
+    if batch:
+        importer.add_batch(batch)
+    elapsed = time.perf_counter() - started
+    assert importer.inserted == count, importer.result()
+    return elapsed
+
+
+def bench_index_only(db, strategy, count):
+    routing.load_index.load(db)
+    started = time.perf_counter()
+    picked = []
+    for raw in raw_leads(count):
+        agent_id = routing.load_index.pick(strategy)
+        routing.load_index.reserve(agent_id, raw["value"])
+        picked.append((agent_id, raw["value"]))
+    elapsed = time.perf_counter() - started
+    for agent_id, value in picked:
+        routing.load_index.release(agent_id, value)
+    return elapsed
+
+
+def bench_naive(db, count):
+    # What routing costs without the index: find the least-loaded agent with a query per lead
+    started = time.perf_counter()
+    for raw in raw_leads(count):
+        load = func.count(models.Lead.id)
+        agent_id = db.execute(
+            select(models.SalesAgent.id)
+            .outerjoin(models.Lead, (models.Lead.sales_agent_id == models.SalesAgent.id)
+                       & models.Lead.status.notin_(stats.CLOSED_STATUSES))
+            .group_by(models.SalesAgent.id).order_by(load, models.SalesAgent.id).limit(1)
+        ).scalar()
+        db.add(models.Lead(sales_agent_id=agent_id, status="new", **raw))
+        db.flush()
+    db.rollback()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="bench_routing.db")
+    parser.add_argument("--agents", type=int, default=500)
+    parser.add_argument("--existing-leads", type=int, default=200_000)
+    parser.add_argument("--leads", type=int, default=100_000)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--naive-leads", type=int, default=500)
+    args = parser.parse_args()
+
+    for strategy in routing.STRATEGIES:
+        engine = seed.make_engine(args.db)
+        seed.seed_users(engine, args.agents)
+        seed.seed_sales_agents(engine, args.agents)
+        seed.seed_leads(engine, args.existing_leads, users=args.agents, agents=args.agents)
+        db = seed.make_session(engine)
+        stats.rebuild_lead_counters(db)
+        db.commit()
+
+        elapsed = bench_index_only(db, strategy, args.leads)
+        print(f"{strategy:<18} {args.leads:>8} picks  {args.leads / elapsed:>9.0f} picks/s  (index only)")
+
+        elapsed = bench_strategy(db, strategy, args.leads, args.batch_size)
+        live = open_leads_per_agent(db)
+        index = routing.load_index
+        counts = [live.get(agent_id, 0) for agent_id in range(1, args.agents + 1)]
+        values = [index.open_value[agent_id] for agent_id in range(1, args.agents + 1)]
+        consistent = all(index.open_count[a] == live.get(a, 0) for a in index.open_count)
+        print(f"{strategy:<18} {args.leads:>8} leads  {args.leads / elapsed:>9.0f} leads/s  (import)  "
+              f"open leads/agent {min(counts)}..{max(counts)}  open value/agent {min(values):.0f}..{max(values):.0f}  "
+              f"index consistent={consistent}", flush=True)
+
+        if strategy == routing.LEAST_OPEN_LEADS and args.naive_leads:
+            elapsed = bench_naive(db, args.naive_leads)
+            print(f"{'naive COUNT':<18} {args.naive_leads:>8} leads  {args.naive_leads / elapsed:>9.0f} leads/s")
+        db.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
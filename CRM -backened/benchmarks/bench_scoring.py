@@ -0,0 +1,124 @@
+# benchmarks/bench_scoring.py
+"""Lead scoring over a large table.
+
+Seeds ``--leads`` leads (default 1M) with two followups each and half as
+many tasks, then times:
+
+* the initial backfill as the migration runs it (score indexes built
+  afterwards), then ``manage.py rescore-leads`` (scoring.rescore_all) as
+  scheduled: a day later, when the clock-driven parts of open leads have
+  drifted, and again with nothing changed;
+* the default scorer alone over arrays for every lead;
+* incremental rescoring as run before a commit: one lead (a single-lead
+  write) and a bulk update chunk;
+* the first page of GET /leads/?sort_by=score, against the same ORDER BY
+  with the score index unusable.
+
+    python -m benchmarks.bench_scoring --leads 1000000
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+from fastapi import Response
+from sqlalchemy import select, text
+
+import app
+import config
+import models
+import scoring
+from benchmarks import seed
+
+
+def timed(call, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="bench_scoring.db")
+    parser.add_argument("--leads", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=config.LEAD_SCORE_BATCH_SIZE)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--reuse", action="store_true", help="skip seeding when --db already exists")
+    args = parser.parse_args()
+    rng = random.Random(11)
+
+    if args.reuse:
+        engine = seed.make_engine(args.db, fresh=False)
+    else:
+        started = time.perf_counter()
+        engine = seed.seed_scale(args.db, users=1000, agents=200, leads=args.leads, followups_per_lead=2,
+                                 tasks=args.leads // 2)
+        with engine.begin() as conn:
+            # Most followups are history
+            conn.execute(text("UPDATE lead_followups SET completed = 1 WHERE id % 3 != 0"))
+        print(f"seeded {args.leads} leads, {2 * args.leads} followups, {args.leads // 2} tasks "
+              f"in {time.perf_counter() - started:.0f}s")
+    db = seed.make_session(engine)
+    now = datetime.utcnow()
+    score_indexes = [index for index in models.Lead.__table__.indexes if "score" in index.columns]
+
+    def backfill():
+        # As in the migration: score everything, then index the scores
+        with engine.begin() as conn:
+            for index in score_indexes:
+                index.drop(conn)
+        result = scoring.rescore_all(db, args.batch_size, now)
+        with engine.begin() as conn:
+            for index in score_indexes:
+                index.create(conn)
+        return result
+
+    passes = [] if args.reuse else [("initial backfill + indexes", backfill)]
+    passes += [
+        ("rescore-leads, a day later", lambda: scoring.rescore_all(db, args.batch_size, now + timedelta(days=1))),
+        ("rescore-leads, nothing changed", lambda: scoring.rescore_all(db, args.batch_size, now + timedelta(days=1))),
+    ]
+    print(f"\n{'full rescore, batch ' + str(args.batch_size):<36} {'seconds':>8} {'leads/s':>10} {'changed':>9}")
+    for label, call in passes:
+        started = time.perf_counter()
+        scored, changed = call()
+        elapsed = time.perf_counter() - started
+        print(f"{label:<36} {elapsed:>8.1f} {scored / elapsed:>10,.0f} {changed:>9}")
+
+    nrng = np.random.default_rng(3)
+    features = {
+        "status": nrng.integers(-1, 7, args.leads), "value": nrng.uniform(0, 50000, args.leads),
+        "source": nrng.integers(-1, len(scoring.SOURCES), args.leads), "contact": nrng.integers(0, 5, args.leads),
+        "age_days": nrng.uniform(0, 1000, args.leads), "followups": nrng.integers(0, 5, args.leads),
+        "followups_completed": nrng.integers(0, 3, args.leads),
+        "days_since_followup": np.where(nrng.random(args.leads) < 0.2, np.inf, nrng.uniform(0, 60, args.leads)),
+        "upcoming_followups": nrng.integers(0, 2, args.leads), "open_tasks": nrng.integers(0, 3, args.leads),
+    }
+    compute_ms = timed(lambda: scoring.compute(features), 5)
+    print(f"default scorer alone, {args.leads} leads: {compute_ms:.0f} ms")
+
+    total = args.leads
+    one_ms = timed(lambda: (scoring.rescore(db, [rng.randint(1, total)], now), db.rollback()), args.repeat)
+    chunk = config.BULK_UPDATE_CHUNK_SIZE
+    chunk_ms = timed(lambda: (scoring.rescore(db, rng.sample(range(1, total + 1), chunk), now), db.rollback()), 20)
+    print(f"\nincremental rescore: 1 lead {one_ms:.2f} ms, {chunk} leads (bulk chunk) {chunk_ms:.1f} ms")
+
+    lead = models.Lead
+    page_ms = timed(lambda: app.read_leads(response=Response(), sort_by="score", db=db), 50)
+    status_ms = timed(lambda: app.read_leads(response=Response(), status="qualified", sort_by="score", db=db), 50)
+    # "score + 0" hides the column from the planner: a full scan and sort
+    unindexed = select(lead.id).order_by((lead.score + 0).desc(), lead.id.desc()).limit(100)
+    scan_ms = timed(lambda: db.execute(unindexed).all(), 3)
+    print(f"\nGET /leads/?sort_by=score, first 100: {page_ms:.2f} ms; with status filter {status_ms:.2f} ms; "
+          f"without the index {scan_ms:.0f} ms")
+    db.close()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
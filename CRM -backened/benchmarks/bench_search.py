@@ -0,0 +1,61 @@
+# benchmarks/bench_search.py
+"""GET /leads/search latency: FTS5 + bm25 vs a LIKE '%q%' scan over the same columns."""
+import argparse
+import statistics
+import time
+
+from sqlalchemy import or_
+
+import models
+import search
+from benchmarks import seed
+
+QUERIES = ["lead123456@example", "First777777", "Last42", "Company 1999", "manager", "zzznomatch"]
+
+
+def like_search(db, q, limit):
+    pattern = f"%{q}%"
+    columns = [getattr(models.Lead, name) for name in models.LEAD_SEARCH_COLUMNS]
+    return db.query(models.Lead).filter(or_(*(column.like(pattern) for column in columns))).limit(limit).all()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="bench_search.db")
+    parser.add_argument("--leads", type=int, default=1_000_000)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--reuse", action="store_true", help="reuse an already seeded database")
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db, fresh=not args.reuse)
+    if not args.reuse:
+        started = time.perf_counter()
+        seed.seed_leads(engine, args.leads)
+        print(f"seeded and indexed {args.leads} leads in {time.perf_counter() - started:.1f}s")
+    db = seed.make_session(engine)
+
+    print(f"{'query':<22} {'fts ms':>8} {'hits':>5} {'like ms':>9} {'hits':>5}")
+    for q in QUERIES:
+        fts_ms, (fts_rows, _) = timed(lambda: search.search_leads(db, q, args.limit), args.repeat)
+        like_ms, like_rows = timed(lambda: like_search(db, q, args.limit), args.repeat)
+        print(f"{q:<22} {fts_ms:>8.2f} {len(fts_rows):>5} {like_ms:>9.2f} {len(like_rows):>5}")
+
+    started = time.perf_counter()
+    search.rebuild_index(db)
+    db.commit()
+    print(f"rebuild-search: {time.perf_counter() - started:.1f}s")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
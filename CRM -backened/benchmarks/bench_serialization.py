@@ -0,0 +1,72 @@
+# benchmarks/bench_serialization.py
+"""Rows/sec of read_leads, read_tasks and read_users with and without the
+column-tuple + orjson fast path (config.FAST_JSON_ROUTES).
+
+Each request goes through the full FastAPI stack in-process, so the numbers
+include query, serialization and response handling but no network.
+"""
+import argparse
+import time
+
+from fastapi.testclient import TestClient
+
+import app
+import config
+from benchmarks import seed
+
+ENDPOINTS = [
+    ("read_leads", "/leads/"),
+    ("read_tasks", "/tasks/"),
+    ("read_users", "/users/"),
+]
+
+
+def bench(client, path, limit, duration):
+    rows = requests = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < duration:
+        response = client.get(path, params={"limit": limit})
+        assert response.status_code == 200, response.text
+        rows += limit
+        requests += 1
+    elapsed = time.perf_counter() - started
+    return rows / elapsed, elapsed / requests * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="bench_serialization.db")
+    parser.add_argument("--rows", type=int, default=20_000)
+    parser.add_argument("--limit", type=int, default=1000)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+
+    engine = seed.make_engine(args.db)
+    seed.seed_users(engine, args.rows)
+    seed.seed_sales_agents(engine, 100)
+    seed.seed_leads(engine, args.rows)
+    seed.seed_tasks(engine, args.rows, leads=args.rows)
+
+    def get_read_db():
+        db = seed.make_session(engine)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.app.dependency_overrides[app.get_read_db] = get_read_db
+    config.RESPONSE_CACHE_TTLS.clear()
+    config.AUTH_REQUIRED = False
+    client = TestClient(app.app)
+
+    for name, path in ENDPOINTS:
+        config.FAST_JSON_ROUTES.discard(name)
+        orm_rate, orm_ms = bench(client, path, args.limit, args.duration)
+        config.FAST_JSON_ROUTES.add(name)
+        fast_rate, fast_ms = bench(client, path, args.limit, args.duration)
+        print(f"{name:<11} limit={args.limit}  orm {orm_rate:>9.0f} rows/s ({orm_ms:6.1f} ms/page)  "
+              f"fast {fast_rate:>9.0f} rows/s ({fast_ms:6.1f} ms/page)  x{fast_rate / orm_rate:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_sqlite_tuning.py
+"""Mixed read/write throughput with the default SQLite setup vs the tuned
+PRAGMAs from config.SQLITE_PRAGMAS (WAL, synchronous=NORMAL, busy_timeout...).
+"""
+import argparse
+import random
+import threading
+import time
+
+from fastapi import Response
+from sqlalchemy.exc import OperationalError
+
+import app
+import config
+import schemas
+from benchmarks import seed
+
+# What an untuned connection looks like: rollback journal, fsync on every commit
+BASELINE_PRAGMAS = {"journal_mode": "DELETE", "synchronous": "FULL"}
+
+
+def run_mix(engine, threads, duration, write_ratio, leads):
+    counts = {"reads": 0, "writes": 0, "locked": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker(seed_value):
+        rng = random.Random(seed_value)
+        db = seed.make_session(engine)
+        local = {"reads": 0, "writes": 0, "locked": 0}
+        while time.perf_counter() < deadline:
+            try:
+                if rng.random() < write_ratio:
+                    app.create_lead(schemas.LeadCreate(first_name="Mix", last_name="Write", value=1.0), db=db)
+                    local["writes"] += 1
+                else:
+                    app.read_leads(response=Response(), limit=20, owner_id=rng.randint(1, 100), db=db)
+                    app.read_lead(lead_id=rng.randint(1, leads), db=db)
+                    local["reads"] += 1
+            except OperationalError:
+                db.rollback()
+                local["locked"] += 1
+        db.close()
+        with lock:
+            for key, value in local.items():
+                counts[key] += value
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--db", default="bench_sqlite_tuning.db")
+    parser.add_argument("--leads", type=int, default=100_000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    print(f"{'config':<9} {'ops/s':>8} {'reads/s':>8} {'writes/s':>9} {'locked':>7}")
+    for label, pragmas in (("baseline", BASELINE_PRAGMAS), ("tuned", config.SQLITE_PRAGMAS)):
+        engine = seed.make_engine(args.db, pragmas=pragmas)
+        seed.seed_leads(engine, args.leads)
+        counts = run_mix(engine, args.threads, args.duration, args.write_ratio, args.leads)
+        engine.dispose()
+        ops = counts["reads"] + counts["writes"]
+        print(
+            f"{label:<9} {ops / args.duration:>8.0f} {counts['reads'] / args.duration:>8.0f} "
+            f"{counts['writes'] / args.duration:>9.0f} {counts['locked']:>7}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+# benchmarks/load.py
+"""Mixed-workload load test for the API, with JSON results and baseline comparison.
+
+Seeds a database at the chosen scale, then drives a weighted mix of
+list/filter, detail, search, dashboard, followup, create and update
+requests for ``--duration`` seconds. It runs in-process (httpx over ASGI,
+no network) and/or against a local uvicorn. It reports rps and p50/p95/p99
+per operation, and can write and compare JSON results:
+
+    python -m benchmarks.load --scale small --out results.json
+    python -m benchmarks.load --scale small --baseline results.json --tolerance 10
+
+With ``--baseline`` it exits non-zero when any operation's rps drops, or its
+p95 grows, by more than ``--tolerance`` percent.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import httpx
+
+from benchmarks import seed
+
+STATUSES = ["new", "contacted", "qualified", "proposal", "negotiation"]
+SEARCH_TERMS = ["First1", "Company 12", "Last42", "example7", "Manager"]
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def wait_until_up(base_url, timeout=20):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(base_url + "/health").status_code == 200:
+                return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError("server did not start")
+
+
+class Workload:
+    """Weighted request generators; ``next(rng)`` returns (operation, method, url, kwargs)."""
+
+    def __init__(self, counts):
+        self.users = counts["users"]
+        self.agents = counts["agents"]
+        self.leads = counts["leads"]
+        self.operations = [
+            (20, "list_leads", self.list_leads),
+            (15, "get_lead", self.get_lead),
+            (12, "list_tasks", self.list_tasks),
+            (10, "dashboard", self.dashboard),
+            (10, "list_followups", self.list_followups),
+            (5, "search_leads", self.search_leads),
+            (10, "update_lead", self.update_lead),
+            (10, "create_lead", self.create_lead),
+            (8, "create_followup", self.create_followup),
+        ]
+        self.weights = [weight for weight, _, _ in self.operations]
+
+    def next(self, rng):
+        _, name, build = rng.choices(self.operations, weights=self.weights)[0]
+        return (name,) + build(rng)
+
+    def list_leads(self, rng):
+        params = {"limit": 50}
+        roll = rng.random()
+        if roll < 0.3:
+            params["status"] = rng.choice(STATUSES)
+        elif roll < 0.5:
+            params["sales_agent_id"] = rng.randint(1, self.agents)
+        elif roll < 0.6:
+            params["owner_id"] = rng.randint(1, self.users)
+        return "GET", "/leads/", {"params": params}
+
+    def get_lead(self, rng):
+        return "GET", f"/leads/{rng.randint(1, self.leads)}", {}
+
+    def list_tasks(self, rng):
+        params = {"limit": 50}
+        if rng.random() < 0.5:
+            params["status"] = rng.choice(["pending", "in_progress"])
+        return "GET", "/tasks/", {"params": params}
+
+    def dashboard(self, rng):
+        return "GET", "/dashboard/stats", {}
+
+    def list_followups(self, rng):
+        return "GET", f"/leads/{rng.randint(1, self.leads)}/followups", {}
+
+    def search_leads(self, rng):
+        return "GET", "/leads/search", {"params": {"q": rng.choice(SEARCH_TERMS), "limit": 20}}
+
+    def update_lead(self, rng):
+        body = {"status": rng.choice(STATUSES), "value": round(rng.uniform(0, 50000), 2)}
+        return "PUT", f"/leads/{rng.randint(1, self.leads)}", {"json": body}
+
+    def create_lead(self, rng):
+        n = rng.randint(1, 10 ** 9)
+        body = {
+            "first_name": f"Load{n}", "last_name": "Test", "email": f"load{n}@example.com",
+            "company": f"Company {n % 20000}", "status": "new", "value": round(rng.uniform(0, 50000), 2),
+            "owner_id": rng.randint(1, self.users), "sales_agent_id": rng.randint(1, self.agents),
+        }
+        return "POST", "/leads/", {"json": body}
+
+    def create_followup(self, rng):
+        when = datetime.utcnow() + timedelta(days=rng.randint(1, 30))
+        body = {"lead_id": rng.randint(1, self.leads), "followup_date": when.isoformat(), "notes": "load test"}
+        return "POST", "/lead-followups/", {"json": body}
+
+
+async def worker(client, workload, deadline, samples, rng):
+    while time.perf_counter() < deadline:
+        name, method, url, kwargs = workload.next(rng)
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+            failed = response.status_code >= 400
+        except httpx.HTTPError:
+            failed = True
+        samples.append((name, (time.perf_counter() - started) * 1000, failed))
+
+
+async def drive(client, workload, concurrency, duration, warmup, seed_value):
+    if warmup:
+        await asyncio.gather(*(
+            worker(client, workload, time.perf_counter() + warmup, [], random.Random(-i - 1))
+            for i in range(concurrency)
+        ))
+    samples = []
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        worker(client, workload, started + duration, samples, random.Random(seed_value + i))
+        for i in range(concurrency)
+    ))
+    return samples, time.perf_counter() - started
+
+
+def summarize(samples, elapsed):
+    def stats_for(rows):
+        latencies = [latency for _, latency, _ in rows]
+        return {
+            "requests": len(rows),
+            "errors": sum(1 for _, _, failed in rows if failed),
+            "rps": round(len(rows) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+        }
+
+    by_operation = {}
+    for row in samples:
+        by_operation.setdefault(row[0], []).append(row)
+    return {
+        "overall": stats_for(samples),
+        "operations": {name: stats_for(rows) for name, rows in sorted(by_operation.items())},
+    }
+
+
+async def run_in_process(db_path, workload, args):
+    import app
+    import config
+    import models
+
+    if config.DB_MODE != "sync":
+        raise SystemExit("in-process mode drives the sync session factory; use --mode uvicorn for CRM_DB_MODE=async")
+    # config.DATABASE_URL was read at import; point the app's sessions at the seeded copy
+    engine = models.make_engine(f"sqlite:///{db_path}")
+    models.SessionLocal.configure(bind=engine)
+    config.AUTH_REQUIRED = False
+    transport = httpx.ASGITransport(app=app.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        try:
+            return await drive(client, workload, args.concurrency, args.duration, args.warmup, args.seed)
+        finally:
+            engine.dispose()
+
+
+def run_uvicorn(db_path, workload, args):
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, CRM_DATABASE_URL=f"sqlite:///{db_path}", CRM_AUTH_REQUIRED="0")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--port", str(args.port), "--log-level", "warning",
+         "--workers", str(args.workers)],
+        env=env,
+    )
+    try:
+        wait_until_up(base_url)
+
+        async def run():
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+                return await drive(client, workload, args.concurrency, args.duration, args.warmup, args.seed)
+
+        return asyncio.run(run())
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def print_table(title, summary):
+    print(f"\n{title}")
+    print(f"{'operation':<16} {'requests':>9} {'errors':>7} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    rows = list(summary["operations"].items()) + [("overall", summary["overall"])]
+    for name, row in rows:
+        print(f"{name:<16} {row['requests']:>9} {row['errors']:>7} {row['rps']:>8.1f} "
+              f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}")
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of ``results`` against ``baseline``, as printable strings."""
+    regressions = []
+    for mode, summary in results["modes"].items():
+        base_summary = baseline.get("modes", {}).get(mode)
+        if base_summary is None:
+            continue
+        rows = dict(summary["operations"], overall=summary["overall"])
+        base_rows = dict(base_summary["operations"], overall=base_summary["overall"])
+        for name, row in rows.items():
+            base = base_rows.get(name)
+            if not base or not base["rps"]:
+                continue
+            rps_change = (row["rps"] - base["rps"]) / base["rps"] * 100
+            p95_change = (row["p95_ms"] - base["p95_ms"]) / base["p95_ms"] * 100 if base["p95_ms"] else 0.0
+            if rps_change < -tolerance or p95_change > tolerance:
+                regressions.append(
+                    f"{mode}/{name}: rps {base['rps']} -> {row['rps']} ({rps_change:+.1f}%), "
+                    f"p95 {base['p95_ms']} -> {row['p95_ms']} ms ({p95_change:+.1f}%)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(seed.SCALES), default="small")
+    for name in ("users", "agents", "leads", "followups-per-lead", "tasks"):
+        parser.add_argument(f"--{name}", type=int, help="override the scale's row count")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="inprocess")
+    parser.add_argument("--db", default="bench_load.db")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--out", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="allowed regression, percent")
+    args = parser.parse_args()
+
+    counts = dict(seed.SCALES[args.scale])
+    for key in counts:
+        override = getattr(args, key)
+        if override is not None:
+            counts[key] = override
+    seed.seed_scale(args.db, **counts).dispose()
+    workload = Workload(counts)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+            "scale": args.scale, "counts": counts, "concurrency": args.concurrency,
+            "duration": args.duration, "seed": args.seed, "workers": args.workers,
+            "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+        },
+        "modes": {},
+    }
+    modes = ["inprocess", "uvicorn"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        # Every mode starts from the same freshly seeded rows
+        db_path = f"{args.db}.{mode}"
+        shutil.copyfile(args.db, db_path)
+        try:
+            if mode == "inprocess":
+                samples, elapsed = asyncio.run(run_in_process(db_path, workload, args))
+            else:
+                samples, elapsed = run_uvicorn(db_path, workload, args)
+        finally:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(db_path + suffix):
+                    os.remove(db_path + suffix)
+        results["modes"][mode] = summarize(samples, elapsed)
+        print_table(f"{mode} ({args.scale}, concurrency {args.concurrency}, {args.duration:.0f}s)",
+                    results["modes"][mode])
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        print()
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"no regressions beyond {args.tolerance:.0f}% against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
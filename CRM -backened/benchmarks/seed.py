@@ -0,0 +1,160 @@
+# benchmarks/seed.py
+import os
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert, text
+from sqlalchemy.orm import sessionmaker
+
+import models
+import stats
+
+STATUSES = ["new", "contacted", "qualified", "proposal", "negotiation", "closed_won", "closed_lost"]
+SOURCES = ["website", "referral", "social_media", "cold_call", "event", "other"]
+
+# Row counts for seed_scale
+SCALES = {
+    "small": {"users": 200, "agents": 50, "leads": 10_000, "followups_per_lead": 2, "tasks": 5_000},
+    "medium": {"users": 1_000, "agents": 200, "leads": 100_000, "followups_per_lead": 2, "tasks": 50_000},
+    "large": {"users": 5_000, "agents": 500, "leads": 1_000_000, "followups_per_lead": 2, "tasks": 500_000},
+}
+
+
+def make_engine(path, fresh=True, pragmas=None):
+    if fresh:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+    engine = models.make_engine(f"sqlite:///{path}", pragmas=pragmas)
+    models.Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def make_session(engine):
+    return sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+
+
+def _insert_batches(engine, table, rows, batch_size):
+    batch = []
+    with engine.begin() as conn:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                conn.execute(insert(table), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(table), batch)
+
+
+def seed_users(engine, count, roles=("sales_agent",), batch_size=10000):
+    now = datetime.utcnow()
+    rows = (
+        {
+            "id": i,
+            "email": f"user{i}@example.com",
+            "username": f"user{i}",
+            "full_name": f"User {i}",
+            "password_hash": "x",
+            "role": roles[i % len(roles)],
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(1, count + 1)
+    )
+    _insert_batches(engine, models.User.__table__, rows, batch_size)
+
+
+def seed_sales_agents(engine, count, batch_size=10000):
+    """One agent per user id 1..count; call seed_users first."""
+    rows = (
+        {
+            "id": i,
+            "user_id": i,
+            "employee_id": f"E{i:06d}",
+            "department": "sales",
+            "quota": 100000.0,
+            "commission_rate": 0.05,
+        }
+        for i in range(1, count + 1)
+    )
+    _insert_batches(engine, models.SalesAgent.__table__, rows, batch_size)
+
+
+def seed_leads(engine, count, users=100, agents=100, batch_size=20000, seed=42):
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=3 * 365)
+    step = timedelta(days=3 * 365) / max(count, 1)
+
+    def rows():
+        for i in range(1, count + 1):
+            created = start + step * i
+            yield {
+                "id": i,
+                "first_name": f"First{i}",
+                "last_name": f"Last{i % 5000}",
+                "email": f"lead{i}@example{i % 997}.com",
+                "phone": f"+1555{i:07d}",
+                "company": f"Company {i % 20000}",
+                "job_title": "Manager",
+                "source": rng.choice(SOURCES),
+                "status": rng.choice(STATUSES),
+                "value": round(rng.uniform(0, 50000), 2),
+                "notes": None,
+                "created_at": created,
+                "updated_at": created,
+                "owner_id": rng.randint(1, users),
+                "sales_agent_id": rng.randint(1, agents),
+            }
+
+    _insert_batches(engine, models.Lead.__table__, rows(), batch_size)
+
+
+def seed_tasks(engine, count, users=100, leads=1, batch_size=20000, seed=7):
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=365)
+    rows = (
+        {
+            "id": i,
+            "title": f"Task {i}",
+            "description": None,
+            "due_date": start + timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60)),
+            "status": rng.choice(["pending", "in_progress", "completed", "cancelled"]),
+            "priority": rng.choice(["low", "medium", "high", "critical"]),
+            "created_at": start,
+            "updated_at": start,
+            "assigned_to_id": rng.randint(1, users),
+            "related_lead_id": rng.randint(1, leads),
+        }
+        for i in range(1, count + 1)
+    )
+    _insert_batches(engine, models.Task.__table__, rows, batch_size)
+
+
+def seed_followups(engine, leads, per_lead=3, batch_size=20000, seed=3):
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    rows = (
+        {"lead_id": lead_id, "followup_date": now + timedelta(days=rng.randint(-30, 30)), "notes": None,
+         "status": "scheduled", "completed": False, "created_at": now}
+        for lead_id in range(1, leads + 1) for _ in range(per_lead)
+    )
+    _insert_batches(engine, models.LeadFollowup.__table__, rows, batch_size)
+
+
+def seed_scale(path, users, agents, leads, followups_per_lead, tasks, pragmas=None):
+    """A fresh database with every table populated, lead_counters built and
+    planner statistics gathered. Same arguments, same rows."""
+    engine = make_engine(path, pragmas=pragmas)
+    seed_users(engine, users, roles=("sales_agent", "customer", "admin", "head_of_sales"))
+    seed_sales_agents(engine, agents)
+    seed_leads(engine, leads, users=users, agents=agents)
+    seed_followups(engine, leads, per_lead=followups_per_lead)
+    seed_tasks(engine, tasks, users=users, leads=leads)
+    db = make_session(engine)
+    stats.rebuild_lead_counters(db)
+    db.commit()
+    db.close()
+    with engine.begin() as conn:
+        conn.execute(text("ANALYZE"))
+    return engine
@@ -0,0 +1,333 @@
+# bulk.py
+import codecs
+import csv
+import json
+from datetime import datetime
+from typing import AsyncIterator, Callable, List, Optional, Sequence
+
+from pydantic import ValidationError
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+import activity
+import dedup
+import models
+import routing
+import schemas
+import scoring
+import stats
+
+# Content types accepted by POST /leads/bulk
+JSON = "application/json"
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+
+
+def lead_row(lead: schemas.LeadCreate) -> dict:
+    """Column values for a validated lead, mirroring create_lead (match keys included)."""
+    row = {
+        "first_name": lead.first_name,
+        "last_name": lead.last_name,
+        "email": lead.email,
+        "phone": lead.phone,
+        "company": lead.company,
+        "job_title": lead.job_title,
+        "source": lead.source,
+        "status": lead.status.value if hasattr(lead.status, 'value') else lead.status,
+        "value": lead.value or 0.0,
+        "notes": lead.notes,
+        "owner_id": lead.owner_id,
+        "sales_agent_id": lead.sales_agent_id,
+    }
+    row.update(dedup.match_keys(row))
+    return row
+
+
+def _format_validation_error(exc: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in exc.errors()]
+
+
+def _begin_outer(db: Session):
+    """Open the database transaction before the first SAVEPOINT.
+
+    pysqlite only emits BEGIN ahead of INSERT/UPDATE/DELETE, so a SAVEPOINT
+    issued first starts a transaction of its own and its RELEASE commits the
+    rows, apart from the counters and jobs the caller writes after them.
+    """
+    connection = db.connection()
+    if connection.dialect.name == "sqlite" and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql("BEGIN")
+
+
+class LeadImporter:
+    """Validates raw lead dicts and inserts them one executemany per batch.
+
+    Invalid rows are reported by their 1-based position in the upload and
+    never abort the rest of the batch. Unless ``allow_duplicates``, rows
+    matching an existing lead or an earlier row (see dedup) are reported
+    too: as errors and left out with ``reject_duplicates``, as warnings and
+    inserted without it.
+    """
+
+    def __init__(self, db: Session, routing_strategy: str = routing.NONE, team_id: Optional[int] = None,
+                 allow_duplicates: bool = False, reject_duplicates: bool = True):
+        self.db = db
+        self.routing_strategy = routing_strategy
+        self.team_id = team_id
+        self.allow_duplicates = allow_duplicates
+        self.reject_duplicates = reject_duplicates
+        self.received = 0
+        self.inserted = 0
+        self.errors: List[schemas.BulkRowError] = []
+        self.warnings: List[schemas.BulkRowError] = []
+
+    def add_batch(self, raw_rows: List[tuple]):
+        """Validate and insert ``(row_number, raw)`` pairs, committing once.
+
+        ``raw`` is a dict, or an error message when the row could not be parsed.
+        """
+        rows, numbers = [], []
+        for number, raw in raw_rows:
+            self.received += 1
+            if isinstance(raw, str):
+                self.errors.append(schemas.BulkRowError(row=number, errors=[raw]))
+                continue
+            try:
+                row = lead_row(schemas.LeadCreate(**raw))
+            except ValidationError as exc:
+                self.errors.append(schemas.BulkRowError(row=number, errors=_format_validation_error(exc)))
+                continue
+            except TypeError:
+                self.errors.append(schemas.BulkRowError(row=number, errors=["row must be an object"]))
+                continue
+            if row["sales_agent_id"] is None:
+                row["sales_agent_id"] = routing.assign(self.db, row["value"], self.routing_strategy, self.team_id)
+            rows.append(row)
+            numbers.append(number)
+        if rows and not self.allow_duplicates:
+            rows, numbers = self._check_duplicates(rows, numbers)
+        if not rows:
+            return
+
+        # New leads have no followups or tasks yet: scored from their own fields, the whole batch at once
+        for row, score in zip(rows, scoring.score_rows(rows).tolist()):
+            row["score"] = score
+        rows = self._insert(rows, numbers)
+        stats.record_lead_changes(self.db, (
+            (None, stats.LeadSnapshot(r["status"], r["sales_agent_id"], r["owner_id"], r["value"]))
+            for r in rows
+        ))
+        self.db.commit()
+        self.inserted += len(rows)
+
+    def _check_duplicates(self, rows: List[dict], numbers: List[int]):
+        kept_rows, kept_numbers = [], []
+        for row, number, match in zip(rows, numbers, dedup.find_batch_duplicates(self.db, rows)):
+            if match is not None:
+                other = f"lead {match.lead_id}" if match.lead_id is not None else f"row {numbers[match.row]}"
+                report = schemas.BulkRowError(
+                    row=number, errors=[f"possible duplicate of {other} (score {match.score:.2f})"]
+                )
+                if self.reject_duplicates:
+                    self.errors.append(report)
+                    continue
+                self.warnings.append(report)
+            kept_rows.append(row)
+            kept_numbers.append(number)
+        return kept_rows, kept_numbers
+
+    def _insert(self, rows: List[dict], numbers: List[int]) -> List[dict]:
+        table = models.Lead.__table__
+        _begin_outer(self.db)
+        try:
+            with self.db.begin_nested():
+                self.db.execute(insert(table), rows)
+            return rows
+        except SQLAlchemyError:
+            pass
+
+        # Retry one row at a time so a single bad row only rejects itself
+        inserted = []
+        for row, number in zip(rows, numbers):
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(insert(table), [row])
+                inserted.append(row)
+            except SQLAlchemyError as exc:
+                self.errors.append(schemas.BulkRowError(row=number, errors=[str(getattr(exc, "orig", exc))]))
+        return inserted
+
+    def result(self) -> schemas.BulkImportResponse:
+        return schemas.BulkImportResponse(
+            received=self.received,
+            inserted=self.inserted,
+            failed=len(self.errors),
+            errors=sorted(self.errors, key=lambda e: e.row),
+            warnings=sorted(self.warnings, key=lambda w: w.row),
+        )
+
+
+def update_in_chunks(
+    db: Session,
+    model,
+    values: dict,
+    criteria: Sequence = (),
+    ids: Optional[List[int]] = None,
+    chunk_size: int = 500,
+    snapshot_columns: Sequence = (),
+    on_chunk: Optional[Callable] = None,
+) -> schemas.BulkUpdateResponse:
+    """Apply ``values`` to the rows selected by ``ids`` and/or ``criteria``.
+
+    Rows are taken in id order, ``chunk_size`` at a time. Each chunk is one
+    ``UPDATE ... WHERE id IN (...)`` committed on its own, so a large
+    reassignment never holds the write lock for long. ``on_chunk(rows)`` gets
+    the chunk's (id, *snapshot_columns) rows as they were before the update,
+    inside the chunk's transaction.
+    """
+    table = model.__table__
+    values = dict(values, updated_at=datetime.utcnow())
+    columns = [table.c.id, *snapshot_columns]
+
+    def chunks():
+        if ids is not None:
+            unique_ids = sorted(set(ids))
+            for start in range(0, len(unique_ids), chunk_size):
+                chunk = unique_ids[start:start + chunk_size]
+                yield chunk, db.execute(select(*columns).where(table.c.id.in_(chunk), *criteria)).all()
+        else:
+            last_id = 0
+            while True:
+                rows = db.execute(
+                    select(*columns).where(table.c.id > last_id, *criteria)
+                    .order_by(table.c.id).limit(chunk_size)
+                ).all()
+                if not rows:
+                    return
+                last_id = rows[-1].id
+                yield None, rows
+
+    updated = 0
+    unmatched = []
+    for requested, rows in chunks():
+        row_ids = [row.id for row in rows]
+        if requested is not None:
+            found = set(row_ids)
+            unmatched.extend(i for i in requested if i not in found)
+        if not row_ids:
+            continue
+        db.execute(update(table).where(table.c.id.in_(row_ids)).values(**values))
+        if on_chunk is not None:
+            on_chunk(rows)
+        db.commit()
+        updated += len(row_ids)
+    return schemas.BulkUpdateResponse(updated=updated, unmatched_ids=unmatched)
+
+
+def update_leads(db: Session, patch: dict, criteria: Sequence = (), ids: Optional[List[int]] = None,
+                 chunk_size: int = 500) -> schemas.BulkUpdateResponse:
+    """Set-based lead update that keeps lead_counters, the activity log,
+    the duplicate-matching keys and the lead scores in step, chunk by chunk."""
+    changed = {field: value for field, value in patch.items() if field in stats.LeadSnapshot._fields}
+    rekey = any(field in dedup.MATCH_FIELDS for field in patch)
+    rescore = any(field in scoring.LEAD_FIELDS for field in patch)
+
+    def on_chunk(rows):
+        now = datetime.utcnow()
+        counter_changes, activity_rows = [], []
+        # Before this chunk's activity rows, which would date the closes
+        snapshots = stats.lead_snapshots(db, rows) if changed else {}
+        for row in rows:
+            if changed:
+                before = snapshots[row.id]
+                counter_changes.append((before, before._replace(**changed)))
+            field_changes = {
+                field: [getattr(row, field), value] for field, value in patch.items() if getattr(row, field) != value
+            }
+            activity_rows += activity.change_rows(row.id, field_changes, at=now)
+        if counter_changes:
+            stats.record_lead_changes(db, counter_changes, at=now)
+        activity.record(db, activity_rows)
+        if rekey:
+            dedup.update_match_keys(db, [dict(row._mapping, **patch) for row in rows])
+        if rescore:
+            scoring.touch(db, [row.id for row in rows])
+
+    lead = models.Lead
+    # Old values of every patched field (for the log) plus the counter inputs
+    columns = {name: getattr(lead, name) for name in ("status", "sales_agent_id", "owner_id", "value")}
+    columns.update((field, getattr(lead, field)) for field in patch)
+    if rekey:
+        columns.update((field, getattr(lead, field)) for field in dedup.MATCH_FIELDS)
+    return update_in_chunks(
+        db, lead, patch, criteria=criteria, ids=ids, chunk_size=chunk_size,
+        snapshot_columns=list(columns.values()), on_chunk=on_chunk,
+    )
+
+
+def update_tasks(db: Session, patch: dict, criteria: Sequence = (), ids: Optional[List[int]] = None,
+                 chunk_size: int = 500) -> schemas.BulkUpdateResponse:
+    """Set-based task update; when it changes what lead scores read, the
+    related leads of each chunk are queued for rescoring."""
+    task = models.Task
+    if not any(field in scoring.TASK_FIELDS for field in patch):
+        return update_in_chunks(db, task, patch, criteria=criteria, ids=ids, chunk_size=chunk_size)
+    return update_in_chunks(
+        db, task, patch, criteria=criteria, ids=ids, chunk_size=chunk_size,
+        snapshot_columns=[task.related_lead_id],
+        on_chunk=lambda rows: scoring.touch(db, [row.related_lead_id for row in rows]),
+    )
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    """Decode a byte stream into lines without buffering the whole body."""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def iter_json_rows(payload: list) -> AsyncIterator[tuple]:
+    for number, raw in enumerate(payload, start=1):
+        yield number, raw
+
+
+async def iter_ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    number = 0
+    async for line in iter_lines(chunks):
+        if not line.strip():
+            continue
+        number += 1
+        try:
+            yield number, json.loads(line)
+        except ValueError as exc:
+            yield number, f"invalid JSON: {exc}"
+
+
+async def iter_csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple]:
+    header: Optional[List[str]] = None
+    record = ""
+    number = 0
+    async for line in iter_lines(chunks):
+        # A quoted field may span lines; wait until the quotes balance
+        record = f"{record}\n{line}" if record else line
+        if record.count('"') % 2:
+            continue
+        values, record = next(csv.reader([record.rstrip("\r")]), []), ""
+        if not values:
+            continue
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        number += 1
+        if len(values) != len(header):
+            yield number, f"expected {len(header)} columns, got {len(values)}"
+            continue
+        yield number, {key: (value if value != "" else None) for key, value in zip(header, values)}
@@ -0,0 +1,173 @@
+# cache.py
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+import config
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Small thread-safe in-process cache whose entries expire after ``ttl`` seconds.
+
+    With ``maxsize`` set it also evicts the least recently used entry once full.
+    """
+
+    def __init__(self, ttl: float, maxsize: Optional[int] = None):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Bumped by invalidate(): a value computed before it is not stored
+        self._generation = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def _store(self, key, value, ttl: Optional[float]):
+        self._entries[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._entries.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute, store: bool = True):
+        """The cached value for ``key``, else ``compute()``, stored unless
+        ``store`` is false or an invalidate() ran while it was computing."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            generation = self._generation
+            value = compute()
+            with self._lock:
+                if store and generation == self._generation:
+                    self._store(key, value, None)
+        return value
+
+    def invalidate(self, key=None):
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Shared cache backends. Besides key/value entries they hold a version counter
+# and last-modified time per table, bumped after every committed write.
+
+class MemoryBackend:
+    """Per-process backend: an LRU TTLCache plus a dict of table versions.
+
+    Only for a single worker process: each process counts its own versions
+    from its own start time, so workers would hand out different ETags and
+    Last-Modified dates for the same response. Use RedisBackend otherwise.
+    """
+
+    def __init__(self, maxsize: int):
+        self.entries = TTLCache(ttl=0, maxsize=maxsize)
+        self._versions: Dict[str, Tuple[int, float]] = {}
+        self._lock = threading.Lock()
+        self._started_at = time.time()
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value, ttl: float):
+        self.entries.set(key, value, ttl)
+
+    def clear(self):
+        self.entries.invalidate()
+
+    def bump(self, tables: Iterable[str]):
+        now = time.time()
+        with self._lock:
+            for table in tables:
+                version, _ = self._versions.get(table, (0, now))
+                self._versions[table] = (version + 1, now)
+
+    def versions(self, tables: Iterable[str]) -> Dict[str, Tuple[int, float]]:
+        """``{table: (version, last_modified)}``; untouched tables date from startup."""
+        return {table: self._versions.get(table, (0, self._started_at)) for table in tables}
+
+
+class RedisBackend:
+    """Backend shared by every worker, on any Redis-protocol server.
+
+    Needs the optional ``redis`` package. Entries are pickled, and versions
+    live in two hashes, so a write in one worker invalidates all of them.
+    """
+
+    def __init__(self, url: str, prefix: str = "crm:"):
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._started_at: Optional[float] = None
+
+    def get(self, key):
+        raw = self.client.get(self.prefix + key)
+        return None if raw is None else pickle.loads(raw)
+
+    def set(self, key, value, ttl: float):
+        self.client.set(self.prefix + key, pickle.dumps(value), px=max(1, int(ttl * 1000)))
+
+    def clear(self):
+        # Keep the shared baseline: workers have already read it
+        keys = [key for key in self.client.scan_iter(match=self.prefix + "*")
+                if key != (self.prefix + "started_at").encode()]
+        if keys:
+            self.client.delete(*keys)
+
+    def bump(self, tables: Iterable[str]):
+        now = time.time()
+        pipe = self.client.pipeline()
+        for table in tables:
+            pipe.hincrby(self.prefix + "versions", table, 1)
+            pipe.hset(self.prefix + "modified", table, now)
+        pipe.execute()
+
+    def started_at(self) -> float:
+        """Last-modified time of tables nobody has written to yet: set once in
+        Redis by the first worker to ask (SETNX), so every worker agrees."""
+        if self._started_at is None:
+            pipe = self.client.pipeline()
+            pipe.set(self.prefix + "started_at", time.time(), nx=True)
+            pipe.get(self.prefix + "started_at")
+            self._started_at = float(pipe.execute()[1])
+        return self._started_at
+
+    def versions(self, tables: Iterable[str]) -> Dict[str, Tuple[int, float]]:
+        tables = list(tables)
+        pipe = self.client.pipeline()
+        pipe.hmget(self.prefix + "versions", tables)
+        pipe.hmget(self.prefix + "modified", tables)
+        versions, modified = pipe.execute()
+        return {
+            table: (int(version or 0), float(modified_at) if modified_at else self.started_at())
+            for table, version, modified_at in zip(tables, versions, modified)
+        }
+
+
+def make_backend():
+    if config.CACHE_BACKEND == "redis":
+        return RedisBackend(config.CACHE_URL)
+    return MemoryBackend(maxsize=config.CACHE_MAX_ENTRIES)
@@ -0,0 +1,167 @@
+# config.py
+import os
+
+# Database
+DATABASE_URL = os.getenv("CRM_DATABASE_URL", "sqlite:///./crm.db")
+# "sync" serves requests from the threadpool with models.SessionLocal;
+# "async" swaps the lead/task/user/followup endpoints for async versions
+# that query through an async engine (async_db.py)
+DB_MODE = os.getenv("CRM_DB_MODE", "sync").lower()
+ASYNC_DATABASE_URL = os.getenv(
+    "CRM_ASYNC_DATABASE_URL", DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+)
+
+# Read replicas: comma-separated URLs. GET endpoints named in
+# REPLICA_ROUTES read from them round-robin; everything else uses the primary.
+READ_REPLICA_URLS = [url.strip() for url in os.getenv("CRM_READ_REPLICA_URLS", "").split(",") if url.strip()]
+# The same replicas through the async driver, for CRM_DB_MODE=async
+ASYNC_READ_REPLICA_URLS = [url.replace("sqlite://", "sqlite+aiosqlite://", 1) for url in READ_REPLICA_URLS]
+REPLICA_ROUTES = {
+    name.strip() for name in os.getenv(
+        "CRM_REPLICA_ROUTES",
+        "read_users,read_user,read_leads,search_leads,read_lead,export_leads,read_tasks,export_tasks,"
+        "read_sales_agents,get_dashboard_stats,get_lead_followups,read_agenda,read_lead_activity,"
+        "read_sales_leaderboard,read_sales_agent_performance,read_funnel,read_timeseries,read_duplicate_leads",
+    ).split(",") if name.strip()
+}
+# After a write, the same client reads from the primary for this many seconds
+READ_YOUR_WRITES_WINDOW = float(os.getenv("CRM_READ_YOUR_WRITES_WINDOW", "5"))
+
+# Connection pool (ignored for in-memory SQLite)
+DB_POOL_SIZE = int(os.getenv("CRM_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("CRM_DB_MAX_OVERFLOW", "10"))
+DB_POOL_RECYCLE = int(os.getenv("CRM_DB_POOL_RECYCLE", "-1"))
+DB_POOL_PRE_PING = os.getenv("CRM_DB_POOL_PRE_PING", "false").lower() in ("1", "true", "yes")
+
+# PRAGMAs applied to every new SQLite connection. WAL lets readers run
+# alongside a writer; busy_timeout makes writers wait instead of failing
+# with "database is locked".
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("CRM_SQLITE_JOURNAL_MODE", "WAL"),
+    "synchronous": os.getenv("CRM_SQLITE_SYNCHRONOUS", "NORMAL"),
+    "busy_timeout": int(os.getenv("CRM_SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "mmap_size": int(os.getenv("CRM_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("CRM_SQLITE_CACHE_SIZE", "-65536")),  # negative = KiB
+    "foreign_keys": os.getenv("CRM_SQLITE_FOREIGN_KEYS", "OFF"),
+}
+
+# Seconds a computed /dashboard/stats payload is served before recomputing.
+# Lead, task and user writes invalidate it immediately.
+DASHBOARD_STATS_TTL = float(os.getenv("CRM_DASHBOARD_STATS_TTL", "30"))
+
+# List endpoints (by handler name) that select column tuples and serialize them
+# with orjson instead of building ORM objects and validating response_model
+FAST_JSON_ROUTES = {
+    name.strip() for name in os.getenv("CRM_FAST_JSON_ROUTES", "").split(",") if name.strip()
+}
+
+# Request/DB metrics served at /metrics
+METRICS_ENABLED = os.getenv("CRM_METRICS_ENABLED", "1").lower() in ("1", "true", "yes")
+# Add X-DB-Queries / X-DB-Time-Ms to every response
+METRICS_DEBUG_HEADERS = os.getenv("CRM_METRICS_DEBUG_HEADERS", "0").lower() in ("1", "true", "yes")
+# Statements at least this slow are logged to the crm.slow_query logger
+SLOW_QUERY_MS = float(os.getenv("CRM_SLOW_QUERY_MS", "200"))
+
+# Response cache: "memory" (per process, so only with a single worker: each
+# process would send its own ETags) or "redis" (shared, CRM_CACHE_URL)
+CACHE_BACKEND = os.getenv("CRM_CACHE_BACKEND", "memory").lower()
+CACHE_URL = os.getenv("CRM_CACHE_URL", "redis://localhost:6379/0")
+CACHE_MAX_ENTRIES = int(os.getenv("CRM_CACHE_MAX_ENTRIES", "1024"))
+# Bodies larger than this are served with ETags but not stored
+CACHE_MAX_BODY_BYTES = int(os.getenv("CRM_CACHE_MAX_BODY_BYTES", str(1024 * 1024)))
+# Cached GET paths and their TTL in seconds, as "path=ttl,..."; writes
+# invalidate them before the TTL runs out
+RESPONSE_CACHE_TTLS = {
+    path.strip(): float(ttl) for path, ttl in (
+        item.split("=", 1) for item in os.getenv(
+            "CRM_RESPONSE_CACHE_TTLS",
+            "/leads/=15,/users/=60,/sales-agents/=60,/dashboard/stats=30",
+        ).split(",") if "=" in item
+    )
+}
+
+# Rows validated and inserted per transaction by POST /leads/bulk
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("CRM_BULK_IMPORT_BATCH_SIZE", "1000"))
+BULK_IMPORT_MAX_BATCH_SIZE = 10000
+# Sales agent assignment for new leads without a sales_agent_id:
+# none, round_robin, least_open_leads or least_pipeline (open value vs quota)
+LEAD_ROUTING_STRATEGY = os.getenv("CRM_LEAD_ROUTING_STRATEGY", "none")
+# Seconds before the in-memory agent load index is reloaded from lead_counters
+LEAD_ROUTING_REFRESH = float(os.getenv("CRM_LEAD_ROUTING_REFRESH", "60"))
+# Rows changed per UPDATE statement (and transaction) by PATCH /leads/bulk, /tasks/bulk
+BULK_UPDATE_CHUNK_SIZE = int(os.getenv("CRM_BULK_UPDATE_CHUNK_SIZE", "500"))
+# Days of lead activity kept in the hot lead_activity table; older rows are
+# moved to lead_activity_archive by `python manage.py archive-activity`
+ACTIVITY_HOT_DAYS = int(os.getenv("CRM_ACTIVITY_HOT_DAYS", "180"))
+# Seconds a computed /analytics/* result is reused for the same parameters;
+# unlike dashboard stats, writes do not invalidate it
+ANALYTICS_CACHE_TTL = float(os.getenv("CRM_ANALYTICS_CACHE_TTL", "300"))
+# Duplicate detection (dedup.py): a lead scoring at least DEDUP_MIN_SCORE
+# against an existing lead is still created by POST /leads/, which lists the
+# matches in an X-Possible-Duplicates header (/leads/bulk: in the report's
+# warnings). With DEDUP_REJECT on, POST /leads/ answers 409 and /leads/bulk
+# reports the row as an error instead, unless allow_duplicates is set
+DEDUP_MIN_SCORE = float(os.getenv("CRM_DEDUP_MIN_SCORE", "0.85"))
+DEDUP_REJECT = os.getenv("CRM_DEDUP_REJECT", "false").lower() in ("1", "true", "yes")
+# Candidates fetched per blocking key when checking one new lead
+DEDUP_MAX_CANDIDATES = int(os.getenv("CRM_DEDUP_MAX_CANDIDATES", "50"))
+# GET /leads/duplicates skips blocks with more leads than this (a shared
+# office number, a generic name) rather than score every pair in them
+DEDUP_MAX_BLOCK = int(os.getenv("CRM_DEDUP_MAX_BLOCK", "100"))
+# Seconds a GET /leads/duplicates pass is reused; merges invalidate it
+DEDUP_CACHE_TTL = float(os.getenv("CRM_DEDUP_CACHE_TTL", "300"))
+# Lead scoring (scoring.py): the scorer, a registered name or "module:function"
+LEAD_SCORER = os.getenv("CRM_LEAD_SCORER", "default")
+# Leads scored per batch (and transaction) by `python manage.py rescore-leads`
+LEAD_SCORE_BATCH_SIZE = int(os.getenv("CRM_LEAD_SCORE_BATCH_SIZE", "50000"))
+
+# Authentication (auth.py). With AUTH_REQUIRED on, every route outside
+# AUTH_PUBLIC_ROUTES (endpoint names) needs an "Authorization: Bearer" token
+# from POST /auth/login. Off by default until the front end sends tokens;
+# requests that do carry one are still checked. Anonymous create_user calls
+# can only sign up customers
+AUTH_REQUIRED = os.getenv("CRM_AUTH_REQUIRED", "false").lower() in ("1", "true", "yes")
+AUTH_PUBLIC_ROUTES = {
+    name.strip() for name in os.getenv(
+        "CRM_AUTH_PUBLIC_ROUTES", "read_root,health_check,read_metrics,login,create_user",
+    ).split(",") if name.strip()
+}
+# Roles whose tokens reach the CRM routes; any other role (customer) only
+# reaches AUTH_PUBLIC_ROUTES
+AUTH_STAFF_ROLES = {
+    role.strip() for role in os.getenv(
+        "CRM_AUTH_STAFF_ROLES", "admin,head_of_sales,sales_agent",
+    ).split(",") if role.strip()
+}
+# Token signing key shared by every worker; the app refuses to start without
+# it while AUTH_REQUIRED is on (otherwise a per-process key is generated)
+AUTH_SECRET = os.getenv("CRM_AUTH_SECRET", "")
+AUTH_TOKEN_TTL = int(os.getenv("CRM_AUTH_TOKEN_TTL", str(12 * 3600)))
+# Seconds a verified token and its user (id, role, active) are cached; a
+# deactivated user keeps access for at most this long
+AUTH_CACHE_TTL = float(os.getenv("CRM_AUTH_CACHE_TTL", "30"))
+AUTH_CACHE_MAX_ENTRIES = int(os.getenv("CRM_AUTH_CACHE_MAX_ENTRIES", "10000"))
+# scrypt cost (n=2**14, r=8: ~16 MiB and tens of ms per hash) and the threads
+# hashing runs on; logins beyond that wait their turn
+AUTH_SCRYPT_N = int(os.getenv("CRM_AUTH_SCRYPT_N", str(2 ** 14)))
+AUTH_SCRYPT_R = int(os.getenv("CRM_AUTH_SCRYPT_R", "8"))
+AUTH_SCRYPT_P = int(os.getenv("CRM_AUTH_SCRYPT_P", "1"))
+AUTH_HASH_WORKERS = int(os.getenv("CRM_AUTH_HASH_WORKERS", "2"))
+
+# Background jobs (jobs.py): worker threads started with the app; 0 leaves
+# the outbox to an out-of-process worker (python manage.py run-jobs)
+JOBS_WORKERS = int(os.getenv("CRM_JOBS_WORKERS", "2"))
+# Jobs claimed per worker round trip
+JOBS_BATCH_SIZE = int(os.getenv("CRM_JOBS_BATCH_SIZE", "20"))
+# Seconds an idle worker waits before polling again (commits in this process wake it early)
+JOBS_POLL_INTERVAL = float(os.getenv("CRM_JOBS_POLL_INTERVAL", "1"))
+# Attempts before a job is dead-lettered; retries back off exponentially from
+# JOBS_BACKOFF_BASE up to JOBS_BACKOFF_MAX seconds
+JOBS_MAX_ATTEMPTS = int(os.getenv("CRM_JOBS_MAX_ATTEMPTS", "5"))
+JOBS_BACKOFF_BASE = float(os.getenv("CRM_JOBS_BACKOFF_BASE", "2"))
+JOBS_BACKOFF_MAX = float(os.getenv("CRM_JOBS_BACKOFF_MAX", "300"))
+# A running job whose worker has not finished it within this many seconds
+# (crashed or killed) is handed out again
+JOBS_LEASE_SECONDS = float(os.getenv("CRM_JOBS_LEASE_SECONDS", "300"))
+# Seconds finished jobs are kept before being purged
+JOBS_KEEP_DONE_SECONDS = float(os.getenv("CRM_JOBS_KEEP_DONE_SECONDS", "3600"))
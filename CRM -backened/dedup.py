@@ -0,0 +1,415 @@
+# dedup.py
+"""Duplicate lead detection and merging.
+
+Every lead carries normalized blocking keys (email_key, phone_key, and
+name_key + company_key), each indexed. Only leads sharing a key are ever
+compared, so checking a new lead costs a few index lookups whatever the
+size of the table, and a full-table pass groups on the indexes instead of
+comparing every pair. Compared leads get a fuzzy 0-1 score (see score).
+
+The keys are kept current on every write: ORM inserts/updates through the
+mapper events below, Core inserts (bulk.lead_row) and set-based updates
+(bulk.update_leads) through match_keys / update_match_keys.
+"""
+import re
+import unicodedata
+from collections import defaultdict
+from datetime import datetime
+from difflib import SequenceMatcher
+from itertools import groupby
+from operator import itemgetter
+from typing import Dict, Iterator, List, Mapping, NamedTuple, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, bindparam, case, delete, event, func, select, tuple_, update
+from sqlalchemy.orm import Session
+
+import activity
+import config
+import jobs
+import models
+import schemas
+import scoring
+import stats
+from cache import TTLCache
+
+# Lead fields the keys are computed from
+MATCH_FIELDS = ("first_name", "last_name", "email", "phone", "company")
+KEY_COLUMNS = ("email_key", "phone_key", "name_key", "company_key")
+# Blocks: leads with equal values in all of a block's columns are compared
+BLOCKS = {
+    "email": ("email_key",),
+    "phone": ("phone_key",),
+    "name": ("name_key", "company_key"),
+}
+# Mailboxes that ignore dots in the local part
+DOTLESS_EMAIL_DOMAINS = {"gmail.com": "gmail.com", "googlemail.com": "gmail.com"}
+# Dropped from the end of company names: "Acme, Inc." == "ACME"
+COMPANY_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "ltd", "limited", "corp", "corporation", "co", "company",
+    "plc", "gmbh", "ag", "sa", "bv", "pty",
+}
+# Phone numbers are compared on their last PHONE_DIGITS digits (so a country
+# code is optional); shorter numbers are too ambiguous to block on
+PHONE_DIGITS = 10
+MIN_PHONE_DIGITS = 7
+# Blank primary fields that a merge fills from the duplicates
+MERGE_FILL_FIELDS = ("email", "phone", "company", "job_title", "source", "notes")
+# Rows per batch for the key backfill and when streaming blocks
+BATCH_SIZE = 10_000
+
+_groups_cache = TTLCache(ttl=config.DEDUP_CACHE_TTL, maxsize=16)
+
+
+class BatchMatch(NamedTuple):
+    """Best match of an incoming row: an existing lead, or an earlier row of the same batch."""
+    lead_id: Optional[int]
+    row: Optional[int]  # index in the batch
+    score: float
+
+
+def _words(text: Optional[str]) -> List[str]:
+    """Lowercase ASCII words of ``text``, accents folded."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode().lower()
+    return re.findall(r"[a-z0-9]+", text)
+
+
+def email_key(email: Optional[str]) -> Optional[str]:
+    local, _, domain = (email or "").strip().lower().rpartition("@")
+    # Sub-addresses reach the same mailbox: jane+crm@x.com == jane@x.com
+    local = local.split("+", 1)[0]
+    if domain in DOTLESS_EMAIL_DOMAINS:
+        local, domain = local.replace(".", ""), DOTLESS_EMAIL_DOMAINS[domain]
+    return f"{local}@{domain}" if local and domain else None
+
+
+def phone_key(phone: Optional[str]) -> Optional[str]:
+    digits = re.sub(r"\D", "", phone or "")
+    return digits[-PHONE_DIGITS:] if len(digits) >= MIN_PHONE_DIGITS else None
+
+
+def name_key(first_name: Optional[str], last_name: Optional[str]) -> Optional[str]:
+    # Sorted, so swapped first/last names still match
+    return " ".join(sorted(_words(first_name) + _words(last_name))) or None
+
+
+def company_key(company: Optional[str]) -> str:
+    words = _words(company)
+    while words and words[-1] in COMPANY_SUFFIXES:
+        words.pop()
+    # "" rather than NULL, so leads without a company still block on name
+    return " ".join(words)
+
+
+def match_keys(values: Mapping) -> Dict[str, Optional[str]]:
+    """KEY_COLUMNS values for a lead given as a mapping with MATCH_FIELDS."""
+    return {
+        "email_key": email_key(values["email"]),
+        "phone_key": phone_key(values["phone"]),
+        "name_key": name_key(values["first_name"], values["last_name"]),
+        "company_key": company_key(values["company"]),
+    }
+
+
+@event.listens_for(models.Lead, "before_insert")
+@event.listens_for(models.Lead, "before_update")
+def _set_match_keys(mapper, connection, target):
+    for column, value in match_keys({field: getattr(target, field) for field in MATCH_FIELDS}).items():
+        if getattr(target, column) != value:
+            setattr(target, column, value)
+
+
+def update_match_keys(db: Session, rows: List[Mapping]):
+    """Recompute the keys of ``rows`` (mappings with id and MATCH_FIELDS), one executemany."""
+    if not rows:
+        return
+    table = models.Lead.__table__
+    stmt = update(table).where(table.c.id == bindparam("lead_id")).values(
+        # Derived columns, not a lead change: keep updated_at out of the onupdate default
+        dict({column: bindparam(column) for column in KEY_COLUMNS}, updated_at=table.c.updated_at)
+    )
+    db.execute(stmt, [dict(match_keys(row), lead_id=row["id"]) for row in rows])
+
+
+def rebuild_match_keys(db: Session, batch_size: int = BATCH_SIZE) -> int:
+    """Recompute every lead's keys in id order, one transaction per batch. Returns leads done."""
+    lead = models.Lead
+    columns = [lead.id] + [getattr(lead, field) for field in MATCH_FIELDS]
+    done, last_id = 0, 0
+    while True:
+        rows = db.execute(
+            select(*columns).where(lead.id > last_id).order_by(lead.id).limit(batch_size)
+        ).mappings().all()
+        if not rows:
+            return done
+        update_match_keys(db, rows)
+        db.commit()
+        done += len(rows)
+        last_id = rows[-1]["id"]
+
+
+def _similarity(a: Optional[str], b: Optional[str]) -> float:
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def score(a: Mapping, b: Mapping) -> float:
+    """How likely two leads (mappings with KEY_COLUMNS) are the same person, 0-1.
+
+    A shared mailbox is near-certain and a shared phone strong evidence,
+    each raised by how alike the names are; otherwise it is name similarity
+    weighed with company similarity (an unknown company counts as 0.5).
+    """
+    name = _similarity(a["name_key"], b["name_key"])
+    if a["email_key"] and a["email_key"] == b["email_key"]:
+        return round(0.9 + 0.1 * name, 4)
+    if a["phone_key"] and a["phone_key"] == b["phone_key"]:
+        return round(0.7 + 0.3 * name, 4)
+    company = _similarity(a["company_key"], b["company_key"]) if a["company_key"] and b["company_key"] else 0.5
+    return round(0.6 * name + 0.4 * company, 4)
+
+
+def _block_value(values: Mapping, columns: tuple):
+    value = tuple(values[column] for column in columns)
+    return None if value[0] is None else value
+
+
+def matched_on(a: Mapping, b: Mapping) -> List[str]:
+    return [
+        block for block, columns in BLOCKS.items()
+        if _block_value(a, columns) is not None and _block_value(a, columns) == _block_value(b, columns)
+    ]
+
+
+def _candidate_columns():
+    lead = models.Lead
+    return [lead.id] + [getattr(lead, name) for name in MATCH_FIELDS + KEY_COLUMNS]
+
+
+def _block_condition(columns: tuple, values: list):
+    """``columns IN values``, for one- or multi-column blocks."""
+    lead_columns = [getattr(models.Lead, column) for column in columns]
+    if len(values) == 1:
+        return and_(*(column == value for column, value in zip(lead_columns, values[0])))
+    if len(lead_columns) == 1:
+        return lead_columns[0].in_([value[0] for value in values])
+    # The leading-column IN lets SQLite search the index; a bare row-value IN list scans the table
+    return and_(lead_columns[0].in_({value[0] for value in values}), tuple_(*lead_columns).in_(values))
+
+
+def candidates(db: Session, keys: Mapping, limit: Optional[int] = None) -> List[Mapping]:
+    """Leads sharing a block with ``keys``: one index lookup per block, at
+    most ``limit`` (CRM_DEDUP_MAX_CANDIDATES) leads from each."""
+    limit = limit or config.DEDUP_MAX_CANDIDATES
+    found = {}
+    for columns in BLOCKS.values():
+        value = _block_value(keys, columns)
+        if value is None:
+            continue
+        query = select(*_candidate_columns()).where(_block_condition(columns, [value])).limit(limit)
+        for row in db.execute(query).mappings():
+            found.setdefault(row["id"], row)
+    return list(found.values())
+
+
+def find_duplicates(db: Session, values: Mapping, exclude_id: Optional[int] = None,
+                    min_score: Optional[float] = None) -> List[schemas.DuplicateMatch]:
+    """Existing leads scoring at least ``min_score`` (CRM_DEDUP_MIN_SCORE)
+    against ``values`` (a mapping with MATCH_FIELDS), best first."""
+    min_score = config.DEDUP_MIN_SCORE if min_score is None else min_score
+    keys = match_keys(values)
+    matches = []
+    for row in candidates(db, keys):
+        if row["id"] == exclude_id:
+            continue
+        row_score = score(keys, row)
+        if row_score >= min_score:
+            matches.append(schemas.DuplicateMatch(lead_id=row["id"], score=row_score, matched_on=matched_on(keys, row)))
+    return sorted(matches, key=lambda match: (-match.score, match.lead_id))
+
+
+def find_batch_duplicates(db: Session, rows: List[Mapping],
+                          min_score: Optional[float] = None) -> List[Optional[BatchMatch]]:
+    """For each of ``rows`` (mappings with KEY_COLUMNS), its best match at or
+    above ``min_score`` among existing leads and the earlier non-duplicate
+    rows of the batch, or None.
+
+    Existing candidates are fetched with one IN query per block for the
+    whole batch, then every row is compared with its blocks only.
+    """
+    min_score = config.DEDUP_MIN_SCORE if min_score is None else min_score
+    # block -> block value -> [(values, BatchMatch without a score)]
+    index = {block: defaultdict(list) for block in BLOCKS}
+
+    def add(values, lead_id=None, row=None):
+        for block, columns in BLOCKS.items():
+            value = _block_value(values, columns)
+            if value is not None:
+                index[block][value].append((values, lead_id, row))
+
+    for block, columns in BLOCKS.items():
+        values = list({value for value in (_block_value(row, columns) for row in rows) if value is not None})
+        for start in range(0, len(values), 1000):
+            query = select(*_candidate_columns()).where(_block_condition(columns, values[start:start + 1000]))
+            for existing in db.execute(query).mappings():
+                add(existing, lead_id=existing["id"])
+
+    matches = []
+    for position, row in enumerate(rows):
+        best, seen = None, set()
+        for block, columns in BLOCKS.items():
+            value = _block_value(row, columns)
+            for other, lead_id, other_row in index[block].get(value, ()) if value is not None else ():
+                if (lead_id, other_row) in seen:
+                    continue
+                seen.add((lead_id, other_row))
+                row_score = score(row, other)
+                if row_score >= min_score and (best is None or row_score > best.score):
+                    best = BatchMatch(lead_id, other_row, row_score)
+        matches.append(best)
+        if best is None:
+            add(row, row=position)
+    return matches
+
+
+def _blocks(db: Session, columns: tuple) -> Iterator[List[Mapping]]:
+    """The leads of every block (value of ``columns``) holding more than one lead."""
+    lead_columns = [getattr(models.Lead, column) for column in columns]
+    shared = (
+        select(*lead_columns).where(lead_columns[0].isnot(None))
+        .group_by(*lead_columns).having(func.count() > 1)
+    )
+    key = lead_columns[0] if len(lead_columns) == 1 else tuple_(*lead_columns)
+    query = select(*_candidate_columns()).where(key.in_(shared)).order_by(*lead_columns, models.Lead.id)
+    # Core execution, streamed: blocks arrive one after another in index order
+    result = db.connection().execute(query.execution_options(yield_per=BATCH_SIZE)).mappings()
+    for _, rows in groupby(result, key=itemgetter(*columns)):
+        yield list(rows)
+
+
+def find_duplicate_groups(db: Session, min_score: Optional[float] = None) -> List[schemas.DuplicateGroup]:
+    """Every group of leads linked by pairwise scores of at least
+    ``min_score``, ordered by their lowest lead id. A full-table pass,
+    cached for CRM_DEDUP_CACHE_TTL seconds."""
+    min_score = config.DEDUP_MIN_SCORE if min_score is None else min_score
+    return _groups_cache.get_or_compute(min_score, lambda: _duplicate_groups(db, min_score))
+
+
+def _duplicate_groups(db: Session, min_score: float) -> List[schemas.DuplicateGroup]:
+    parent: Dict[int, int] = {}
+    leads: Dict[int, Mapping] = {}
+    pairs = []
+
+    def root(lead_id):
+        while parent[lead_id] != lead_id:
+            parent[lead_id] = parent[parent[lead_id]]
+            lead_id = parent[lead_id]
+        return lead_id
+
+    for block, columns in BLOCKS.items():
+        for members in _blocks(db, columns):
+            # A shared switchboard number or a common name: too many pairs, too little signal
+            if len(members) > config.DEDUP_MAX_BLOCK:
+                continue
+            for i, a in enumerate(members):
+                for b in members[i + 1:]:
+                    pair_score = score(a, b)
+                    if pair_score < min_score:
+                        continue
+                    for member in (a, b):
+                        leads.setdefault(member["id"], member)
+                        parent.setdefault(member["id"], member["id"])
+                    pairs.append((a["id"], b["id"], pair_score, block))
+                    parent[root(a["id"])] = root(b["id"])
+
+    groups: Dict[int, dict] = {}
+    for a, _, pair_score, block in pairs:
+        group = groups.setdefault(root(a), {"score": 0.0, "matched_on": set()})
+        group["score"] = max(group["score"], pair_score)
+        group["matched_on"].add(block)
+    members = defaultdict(list)
+    for lead_id in sorted(leads):
+        members[root(lead_id)].append(lead_id)
+    result = [
+        schemas.DuplicateGroup(
+            lead_ids=ids,
+            score=groups[group_root]["score"],
+            matched_on=[block for block in BLOCKS if block in groups[group_root]["matched_on"]],
+            leads=[schemas.DuplicateLead(**{name: leads[lead_id][name] for name in schemas.DuplicateLead.__fields__})
+                   for lead_id in ids],
+        )
+        for group_root, ids in members.items()
+    ]
+    return sorted(result, key=lambda group: group.lead_ids[0])
+
+
+def invalidate_duplicate_groups():
+    _groups_cache.invalidate()
+
+
+def merge_leads(db: Session, primary_id: int, duplicate_ids: List[int],
+                changed_by: Optional[int] = None) -> schemas.LeadMergeResponse:
+    """Fold ``duplicate_ids`` into ``primary_id``, in the caller's transaction.
+
+    Followups, tasks and activity history of the duplicates move to the
+    primary (their status changes as MERGED_STATUS_CHANGED, which never date
+    the primary's status or close), blank contact fields on the primary are filled from the oldest
+    duplicate that has them, and the duplicates are deleted with their
+    lead_counters contribution.
+    """
+    duplicate_ids = sorted(set(duplicate_ids))
+    if not duplicate_ids:
+        raise HTTPException(status_code=400, detail="duplicate_ids must not be empty")
+    if primary_id in duplicate_ids:
+        raise HTTPException(status_code=400, detail="primary_id must not be one of duplicate_ids")
+    lead = models.Lead
+    found = {row.id: row for row in db.query(lead).filter(lead.id.in_([primary_id] + duplicate_ids))}
+    missing = [lead_id for lead_id in [primary_id] + duplicate_ids if lead_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Lead(s) not found: {', '.join(map(str, missing))}")
+    primary = found[primary_id]
+    duplicates = [found[lead_id] for lead_id in duplicate_ids]
+    # Taken before their activity moves to the primary, which would lose their close dates
+    removed = stats.lead_snapshots(db, duplicates)
+
+    now = datetime.utcnow()
+    changes = {}
+    for field in MERGE_FILL_FIELDS:
+        if getattr(primary, field) not in (None, ""):
+            continue
+        value = next((getattr(d, field) for d in duplicates if getattr(d, field) not in (None, "")), None)
+        if value is not None:
+            changes[field] = [getattr(primary, field), value]
+            setattr(primary, field, value)
+    primary.updated_at = now
+
+    followups = models.LeadFollowup.__table__
+    tasks = models.Task.__table__
+    followups_moved = db.execute(
+        update(followups).where(followups.c.lead_id.in_(duplicate_ids)).values(lead_id=primary_id)
+    ).rowcount
+    tasks_moved = db.execute(
+        update(tasks).where(tasks.c.related_lead_id.in_(duplicate_ids)).values(related_lead_id=primary_id)
+    ).rowcount
+    for history in (models.LeadActivity.__table__, models.LeadActivityArchive.__table__):
+        db.execute(update(history).where(history.c.lead_id.in_(duplicate_ids)).values(
+            lead_id=primary_id,
+            event=case((history.c.event == activity.STATUS_CHANGED, activity.MERGED_STATUS_CHANGED),
+                       else_=history.c.event),
+        ))
+
+    stats.record_lead_changes(db, ((snapshot, None) for snapshot in removed.values()), at=now)
+    for duplicate in duplicates:
+        db.expunge(duplicate)
+    db.execute(delete(lead.__table__).where(lead.id.in_(duplicate_ids)))
+    activity.record(db, activity.change_rows(primary_id, changes, changed_by, at=now)
+                    + activity.merge_rows(primary_id, duplicate_ids, changed_by, at=now))
+    jobs.publish(db, jobs.LEAD_UPDATED, {"lead_id": primary_id, "changes": changes, "merged_ids": duplicate_ids})
+    # The primary's score now counts the moved followups and tasks; rescored by the job
+    scoring.touch(db, [primary_id])
+    return schemas.LeadMergeResponse(
+        lead=primary, merged_ids=duplicate_ids, followups_moved=followups_moved, tasks_moved=tasks_moved,
+    )
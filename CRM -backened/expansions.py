@@ -0,0 +1,59 @@
+# expansions.py
+from typing import List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import joinedload, selectinload
+
+import models
+import schemas
+
+# ?expand= name -> loader options. Many-to-one relations are joined into the
+# page query; followups come from an extra lead_id IN (...) query per
+# SELECTIN_CHUNK_SIZE leads of the page (ix_lead_followups_lead_date), so a
+# page of up to 500 leads costs two queries.
+LEAD_EXPANSIONS = {
+    "owner": [joinedload(models.Lead.owner)],
+    "sales_agent": [joinedload(models.Lead.sales_agent).joinedload(models.SalesAgent.user)],
+    "followups": [selectinload(models.Lead.followups)],
+}
+# Ids per IN list in a selectinload query (fixed by SQLAlchemy)
+SELECTIN_CHUNK_SIZE = 500
+
+_LEAD_FIELDS = list(schemas.LeadResponse.__fields__)
+
+
+def parse_expand(expand: Optional[str]) -> List[str]:
+    if not expand:
+        return []
+    names = [name.strip() for name in expand.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(LEAD_EXPANSIONS))
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown expand value(s): {', '.join(unknown)}; allowed: {', '.join(LEAD_EXPANSIONS)}",
+        )
+    return list(dict.fromkeys(names))
+
+
+def lead_loader_options(expansions: List[str]) -> list:
+    return [option for name in expansions for option in LEAD_EXPANSIONS[name]]
+
+
+def expanded_lead(lead: models.Lead, expansions: List[str]) -> schemas.LeadExpandedResponse:
+    """LeadExpandedResponse with only the requested relations set.
+
+    Relations are read only when requested, so an unexpanded relation is
+    never lazy-loaded; serialize with ``.json(exclude_unset=True)``.
+    """
+    data = {name: getattr(lead, name) for name in _LEAD_FIELDS}
+    if "owner" in expansions:
+        data["owner"] = lead.owner
+    if "sales_agent" in expansions:
+        data["sales_agent"] = lead.sales_agent
+    if "followups" in expansions:
+        data["followups"] = sorted(lead.followups, key=lambda f: f.followup_date)
+    return schemas.LeadExpandedResponse.parse_obj(data)
+
+
+def render_leads(leads: List[models.Lead], expansions: List[str]) -> str:
+    return "[" + ",".join(expanded_lead(lead, expansions).json(exclude_unset=True) for lead in leads) + "]"
@@ -0,0 +1,59 @@
+# export.py
+import csv
+import io
+from datetime import datetime
+from typing import Iterator
+
+from sqlalchemy import select
+
+import fast_json
+import models
+import schemas
+
+NDJSON = "application/x-ndjson"
+CSV = "text/csv"
+MEDIA_TYPES = {"ndjson": NDJSON, "csv": CSV}
+
+# Rows fetched from the cursor per round and written per yielded chunk
+EXPORT_CHUNK_SIZE = 1000
+
+
+def stream_rows(model, response_schema, criteria: list, fmt: str,
+                session_factory=None, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator:
+    """Yield an NDJSON or CSV export of ``model`` rows matching ``criteria``.
+
+    Rows come straight off a server-side cursor as plain tuples (no ORM
+    objects, no pydantic models), so memory stays flat regardless of
+    table size. The generator owns its session because it outlives the
+    request's dependency scope.
+    """
+    names = list(response_schema.__fields__)
+    query = select(*fast_json.response_columns(model, response_schema)).where(*criteria).order_by(model.id)
+
+    db = (session_factory or models.SessionLocal)()
+    try:
+        result = db.execute(query, execution_options={"yield_per": chunk_size})
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            for rows in result.partitions():
+                for row in rows:
+                    writer.writerow(["" if v is None else v.isoformat() if isinstance(v, datetime) else v for v in row])
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            yield buffer.getvalue()
+        else:
+            for rows in result.partitions():
+                yield b"".join(fast_json.dumps(dict(zip(names, row))) + b"\n" for row in rows)
+    finally:
+        db.close()
+
+
+def lead_export(criteria: list, fmt: str, session_factory=None) -> Iterator:
+    return stream_rows(models.Lead, schemas.LeadResponse, criteria, fmt, session_factory)
+
+
+def task_export(criteria: list, fmt: str, session_factory=None) -> Iterator:
+    return stream_rows(models.Task, schemas.TaskResponse, criteria, fmt, session_factory)
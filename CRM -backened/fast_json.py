@@ -0,0 +1,47 @@
+# fast_json.py
+import json
+from datetime import date, datetime
+from typing import Iterable, List, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same JSON, slower
+    orjson = None
+
+
+def response_columns(model, schema: Type[BaseModel]) -> list:
+    """The model columns behind each schema field, in the schema's field order.
+
+    ``db.query(*response_columns(...))`` returns plain row tuples, skipping
+    entity construction and the identity map.
+    """
+    return [getattr(model, name) for name in schema.__fields__]
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def render_rows(rows: Iterable, schema: Type[BaseModel]) -> bytes:
+    """Serialize ``response_columns`` rows as a JSON array of ``schema`` objects.
+
+    Rows are not validated against ``schema``: the columns already hold the
+    types it declares, which is what makes this path cheap.
+    """
+    fields: List[str] = list(schema.__fields__)
+    return dumps([dict(zip(fields, row)) for row in rows])
+
+
+def rows_response(rows: Iterable, schema: Type[BaseModel]) -> Response:
+    return Response(render_rows(rows, schema), media_type="application/json")
@@ -0,0 +1,42 @@
+# filters.py
+from typing import Optional
+
+import models
+
+
+# Orders GET /leads/ accepts (sort_by), newest or highest first
+LEAD_SORT_COLUMNS = {
+    "created_at": models.Lead.created_at,
+    "score": models.Lead.score,
+}
+
+
+# Filter criteria shared by the list, export and bulk endpoints
+def lead_filters(
+    status: Optional[str] = None,
+    owner_id: Optional[int] = None,
+    sales_agent_id: Optional[int] = None,
+) -> list:
+    criteria = []
+    if status:
+        criteria.append(models.Lead.status == status)
+    if owner_id:
+        criteria.append(models.Lead.owner_id == owner_id)
+    if sales_agent_id:
+        criteria.append(models.Lead.sales_agent_id == sales_agent_id)
+    return criteria
+
+
+def task_filters(
+    status: Optional[str] = None,
+    assigned_to_id: Optional[int] = None,
+    priority: Optional[str] = None,
+) -> list:
+    criteria = []
+    if status:
+        criteria.append(models.Task.status == status)
+    if assigned_to_id:
+        criteria.append(models.Task.assigned_to_id == assigned_to_id)
+    if priority:
+        criteria.append(models.Task.priority == priority)
+    return criteria
@@ -0,0 +1,338 @@
+# jobs.py
+"""Background jobs for post-write side effects, via a transactional outbox.
+
+Write endpoints call ``publish(db, event, payload)`` before committing: it
+adds one ``jobs`` row per handler subscribed to the event, in the same
+transaction, so a side effect is recorded if and only if the write is.
+Worker threads claim due rows in batches and run each handler in its own
+transaction together with marking the row done, so a crash rolls both back
+and the lease sweep hands the job out again. Handlers must tolerate being
+run again after such a crash. The done mark only applies while the worker
+still holds the job's lease, so a handler that outlives it and loses the job
+to another worker commits nothing.
+
+Derived data that may trail the write is kept by subscribers too:
+performance.py keeps agent_rollups and scoring.py keeps leads.score, so a
+write commits without them and they catch up as soon as a worker runs the
+job. lead_counters is not among them; stats.py writes it with the lead.
+"""
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from sqlalchemy import delete, func, select, update
+from sqlalchemy import event as sa_event
+from sqlalchemy.orm import Session
+
+import config
+import metrics
+import models
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+STATUSES = (PENDING, RUNNING, DONE, DEAD)
+# Metrics outcome of a run whose lease expired before it finished
+LEASE_LOST = "lease_lost"
+
+# Events published by the write endpoints
+LEAD_CREATED = "lead.created"
+LEAD_UPDATED = "lead.updated"
+TASK_CREATED = "task.created"
+FOLLOWUP_CREATED = "followup.created"
+# Derived data published by stats.py and scoring.py for any write that changes it
+LEAD_CLOSES_CHANGED = "lead_closes.changed"
+LEAD_SCORES_STALE = "lead_scores.stale"
+
+# Session.info key set when the open transaction published jobs
+_PUBLISHED = "jobs_published"
+
+log = logging.getLogger("crm.jobs")
+event_log = logging.getLogger("crm.events")
+
+# handler name -> callable(db, event, payload); event -> handler names
+HANDLERS: Dict[str, Callable] = {}
+SUBSCRIBERS: Dict[str, List[str]] = {}
+
+
+def subscribe(*events: str):
+    """Register a ``handler(db, event, payload)`` for ``events``.
+
+    Each subscriber gets its own job, so one failing side effect is retried
+    without re-running the others. Handlers write through ``db`` and leave
+    the commit to the worker.
+    """
+    def register(handler: Callable) -> Callable:
+        name = f"{handler.__module__}.{handler.__name__}"
+        HANDLERS[name] = handler
+        for event in events:
+            SUBSCRIBERS.setdefault(event, []).append(name)
+        return handler
+    return register
+
+
+def publish(db: Session, event: str, payload: dict):
+    """Queue ``event`` for its subscribers; takes effect when ``db`` commits."""
+    names = SUBSCRIBERS.get(event)
+    if not names:
+        return
+    body = json.dumps(payload, default=str)
+    db.add_all([
+        models.Job(kind=name, event=event, payload=body, max_attempts=config.JOBS_MAX_ATTEMPTS)
+        for name in names
+    ])
+    db.info[_PUBLISHED] = True
+
+
+@sa_event.listens_for(Session, "after_commit")
+def _after_commit(db: Session):
+    if db.info.pop(_PUBLISHED, False):
+        queue.wake()
+
+
+@sa_event.listens_for(Session, "after_rollback")
+def _after_rollback(db: Session):
+    db.info.pop(_PUBLISHED, None)
+
+
+def backoff(attempts: int) -> float:
+    """Seconds before retry number ``attempts``: exponential, capped, jittered."""
+    delay = min(config.JOBS_BACKOFF_BASE * 2 ** (attempts - 1), config.JOBS_BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.0)
+
+
+def claim(db: Session, worker: str, limit: int) -> List[models.Job]:
+    """Mark up to ``limit`` due jobs running for ``worker`` and return them.
+
+    One UPDATE does the claim, so concurrent workers (threads or processes)
+    never get the same job; attempts are counted here so a job that kills
+    its worker every time still reaches max_attempts.
+    """
+    job = models.Job
+    now = datetime.utcnow()
+    token = f"{worker}/{uuid.uuid4().hex[:12]}"
+    due = (
+        select(job.id).where(job.status == PENDING, job.run_after <= now)
+        .order_by(job.run_after, job.id).limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = db.execute(
+        update(job).where(job.id.in_(due), job.status == PENDING)
+        .values(status=RUNNING, locked_by=token, locked_at=now, attempts=job.attempts + 1)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    if not claimed:
+        return []
+    return db.query(job).filter(job.locked_by == token).order_by(job.id).all()
+
+
+def _finish(db: Session, job_id: int, token: str, **values) -> bool:
+    """Record a claimed job's outcome, only if ``token`` still holds its lease."""
+    job = models.Job
+    return db.execute(
+        update(job).where(job.id == job_id, job.status == RUNNING, job.locked_by == token)
+        .values(locked_by=None, locked_at=None, **values)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+
+
+def execute(db: Session, job: models.Job):
+    """Run one claimed job and record the outcome.
+
+    If sweep() released the job while it ran, nothing is recorded and the
+    handler's writes are rolled back: the worker now holding it commits them.
+    """
+    # Read before the handler: after a rollback the row may belong to another worker
+    job_id, kind, token = job.id, job.kind, job.locked_by
+    attempts, max_attempts = job.attempts, job.max_attempts
+    handler = HANDLERS.get(kind)
+    started = time.perf_counter()
+    try:
+        if handler is None:
+            raise LookupError(f"no handler registered for {kind}")
+        handler(db, job.event, json.loads(job.payload))
+        # Handler writes and the done mark commit together
+        outcome = DONE if _finish(db, job_id, token, status=DONE, finished_at=datetime.utcnow(),
+                                  last_error=None) else LEASE_LOST
+    except Exception:
+        db.rollback()
+        error = traceback.format_exc(limit=5)
+        if attempts >= max_attempts:
+            values = dict(status=DEAD, finished_at=datetime.utcnow())
+            outcome = DEAD
+        else:
+            values = dict(status=PENDING, run_after=datetime.utcnow() + timedelta(seconds=backoff(attempts)))
+            outcome = "retry"
+        if not _finish(db, job_id, token, last_error=error, **values):
+            outcome = LEASE_LOST
+        elif outcome == DEAD:
+            log.error("job %s (%s) dead after %d attempts: %s", job_id, kind, attempts, error)
+        else:
+            log.warning("job %s (%s) failed, attempt %d: %s", job_id, kind, attempts, error)
+    if outcome == LEASE_LOST:
+        db.rollback()
+        log.warning("job %s (%s) outlived its lease; its writes were rolled back", job_id, kind)
+    else:
+        db.commit()
+    metrics.JOBS_DURATION.observe(time.perf_counter() - started, (kind,))
+    metrics.JOBS_PROCESSED.inc((kind, outcome))
+
+
+def sweep(db: Session, lease_seconds: float = None, keep_done_seconds: float = None) -> int:
+    """Release jobs whose lease expired (their worker died) and purge old
+    finished jobs. Returns the number of jobs released."""
+    job = models.Job
+    now = datetime.utcnow()
+    expired = (job.status == RUNNING,
+               job.locked_at < now - timedelta(seconds=lease_seconds or config.JOBS_LEASE_SECONDS))
+    # A job that keeps taking its worker down is dead-lettered rather than retried forever
+    db.execute(
+        update(job).where(*expired, job.attempts >= job.max_attempts)
+        .values(status=DEAD, finished_at=now, locked_by=None, locked_at=None, last_error="lease expired")
+        .execution_options(synchronize_session=False)
+    )
+    released = db.execute(
+        update(job).where(*expired)
+        .values(status=PENDING, run_after=now, locked_by=None, locked_at=None, last_error="lease expired")
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    keep = keep_done_seconds if keep_done_seconds is not None else config.JOBS_KEEP_DONE_SECONDS
+    db.execute(
+        delete(job).where(job.status == DONE, job.finished_at < now - timedelta(seconds=keep))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if released:
+        log.warning("released %d jobs with expired leases", released)
+    return released
+
+
+def requeue_dead(db: Session) -> int:
+    """Give every dead-lettered job a fresh set of attempts."""
+    job = models.Job
+    requeued = db.execute(
+        update(job).where(job.status == DEAD)
+        .values(status=PENDING, attempts=0, run_after=datetime.utcnow(), finished_at=None)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.commit()
+    return requeued
+
+
+def update_metrics(db: Session):
+    """Refresh the queue depth and lag gauges from the outbox."""
+    job = models.Job
+    now = datetime.utcnow()
+    counts = dict(db.execute(select(job.status, func.count()).group_by(job.status)).all())
+    for status in STATUSES:
+        metrics.JOBS_DEPTH.set(counts.get(status, 0), (status,))
+    oldest = db.execute(
+        select(func.min(job.run_after)).where(job.status == PENDING, job.run_after <= now)
+    ).scalar()
+    metrics.JOBS_LAG.set((now - oldest).total_seconds() if oldest else 0.0)
+
+
+class JobQueue:
+    """A pool of worker threads draining the outbox."""
+
+    def __init__(self, session_factory: Callable[[], Session] = None, workers: int = None,
+                 batch_size: int = None, poll_interval: float = None):
+        # Looked up per call so a rebound models.SessionLocal is honoured
+        self.session_factory = session_factory or (lambda: models.SessionLocal())
+        self.workers = config.JOBS_WORKERS if workers is None else workers
+        self.batch_size = batch_size or config.JOBS_BATCH_SIZE
+        self.poll_interval = poll_interval or config.JOBS_POLL_INTERVAL
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._swept = 0.0
+        self._sweep_lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def start(self):
+        if self.running:
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, args=(f"{self.name}:{n}",), name=f"crm-jobs-{n}", daemon=True)
+            for n in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stop after the batches in progress; unstarted jobs stay pending."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def wake(self):
+        self._wake.set()
+
+    def run_once(self, worker: str) -> int:
+        """Sweep if due, then claim and run one batch. Returns jobs run."""
+        db = self.session_factory()
+        try:
+            self._maybe_sweep(db)
+            batch = claim(db, worker, self.batch_size)
+            for job in batch:
+                if self._stop.is_set():
+                    # Hand the rest of the batch back rather than wait out the lease
+                    db.execute(
+                        update(models.Job).where(models.Job.id == job.id, models.Job.status == RUNNING)
+                        .values(status=PENDING, attempts=models.Job.attempts - 1, locked_by=None, locked_at=None)
+                        .execution_options(synchronize_session=False)
+                    )
+                    db.commit()
+                    continue
+                execute(db, job)
+            return len(batch)
+        finally:
+            db.close()
+
+    def _maybe_sweep(self, db: Session):
+        now = time.monotonic()
+        # One thread sweeps, a few times per lease
+        if now - self._swept < config.JOBS_LEASE_SECONDS / 4 or not self._sweep_lock.acquire(blocking=False):
+            return
+        try:
+            self._swept = now
+            sweep(db)
+        finally:
+            self._sweep_lock.release()
+
+    def _run(self, worker: str):
+        while not self._stop.is_set():
+            try:
+                if self.run_once(worker):
+                    continue
+            except Exception:
+                log.exception("job worker %s failed", worker)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+
+queue = JobQueue()
+
+
+@subscribe(LEAD_CREATED, LEAD_UPDATED, TASK_CREATED, FOLLOWUP_CREATED)
+def log_event(db: Session, event: str, payload: dict):
+    # Notification hook: one structured line per event on the crm.events logger
+    event_log.info("%s %s", event, json.dumps(payload, sort_keys=True, default=str))
+
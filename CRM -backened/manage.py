@@ -0,0 +1,199 @@
+# manage.py
+"""Maintenance commands for the CRM backend.
+
+    python manage.py rebuild-stats
+    python manage.py rebuild-rollups
+    python manage.py check-stats
+    python manage.py rebuild-search
+    python manage.py rebuild-match-keys
+    python manage.py rescore-leads
+    python manage.py sync-replicas
+    python manage.py archive-activity
+    python manage.py run-jobs
+    python manage.py requeue-dead-jobs
+    python manage.py hash-passwords
+    python manage.py create-admin
+"""
+import argparse
+import getpass
+import logging
+import sys
+import time
+
+import activity
+import auth
+import config
+import dedup
+import jobs
+import models
+import performance
+import replicas
+import scoring
+import search
+import stats
+
+
+def rebuild_stats(args):
+    db = models.SessionLocal()
+    try:
+        stats.rebuild_lead_counters(db)
+        db.commit()
+    finally:
+        db.close()
+    stats.invalidate_dashboard_stats()
+    print("lead_counters rebuilt")
+
+
+def rebuild_rollups(args):
+    db = models.SessionLocal()
+    try:
+        performance.rebuild_agent_rollups(db)
+        db.commit()
+    finally:
+        db.close()
+    print("agent_rollups rebuilt (closes dated by their status_changed activity)")
+
+
+def check_stats(args):
+    db = models.SessionLocal()
+    try:
+        mismatches = stats.check_lead_counters(db)
+    finally:
+        db.close()
+    for dimension, dimension_id, lead_status, stored, live in mismatches:
+        print(f"{dimension}:{dimension_id}:{lead_status or '-'} stored={stored} live={live}")
+    if mismatches:
+        print(f"{len(mismatches)} lead_counters rows out of sync; run rebuild-stats")
+        return 1
+    print("lead_counters consistent")
+    return 0
+
+
+def sync_replicas(args):
+    if not models.ReplicaSessionLocals:
+        print("no read replicas configured (CRM_READ_REPLICA_URLS)")
+        return 1
+    replicas.sync_sqlite_replicas()
+    print(f"copied primary to {len(models.ReplicaSessionLocals)} replica(s)")
+
+
+def rebuild_search(args):
+    db = models.SessionLocal()
+    try:
+        search.rebuild_index(db)
+        db.commit()
+    finally:
+        db.close()
+    print("leads_fts rebuilt")
+
+
+def rebuild_match_keys(args):
+    db = models.SessionLocal()
+    try:
+        done = dedup.rebuild_match_keys(db)
+    finally:
+        db.close()
+    dedup.invalidate_duplicate_groups()
+    print(f"recomputed duplicate-matching keys for {done} lead(s)")
+
+
+def rescore_leads(args):
+    db = models.SessionLocal()
+    started = time.perf_counter()
+    try:
+        scored, changed = scoring.rescore_all(db)
+    finally:
+        db.close()
+    print(f"scored {scored} lead(s) with the {config.LEAD_SCORER} scorer in {time.perf_counter() - started:.1f}s, "
+          f"{changed} score(s) changed")
+
+
+def archive_activity(args):
+    db = models.SessionLocal()
+    try:
+        moved = activity.archive(db)
+    finally:
+        db.close()
+    print(f"moved {moved} lead_activity row(s) older than {config.ACTIVITY_HOT_DAYS} days to lead_activity_archive")
+
+
+def run_jobs(args):
+    # Importing the app registers every job subscriber
+    import app  # noqa: F401
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    queue = jobs.JobQueue(workers=max(config.JOBS_WORKERS, 1))
+    queue.start()
+    print(f"running {queue.workers} job worker(s); Ctrl+C to stop")
+    try:
+        while queue.running:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        queue.stop()
+
+
+def requeue_dead_jobs(args):
+    db = models.SessionLocal()
+    try:
+        requeued = jobs.requeue_dead(db)
+    finally:
+        db.close()
+    print(f"requeued {requeued} dead job(s)")
+
+
+def hash_passwords(args):
+    db = models.SessionLocal()
+    try:
+        users = db.query(models.User).filter(~models.User.password_hash.startswith(auth.HASH_SCHEME + "$")).all()
+        for user in users:
+            user.password_hash = auth.hash_password_sync(user.password_hash)
+        db.commit()
+    finally:
+        db.close()
+    print(f"hashed {len(users)} plain-text password(s)")
+
+
+def create_admin(args):
+    # POST /users/ only creates other roles for an admin, so the first one starts here
+    email = input("Email: ").strip()
+    password = getpass.getpass("Password: ")
+    db = models.SessionLocal()
+    try:
+        if db.query(models.User).filter(models.User.email == email).first():
+            print(f"{email} is already registered")
+            return 1
+        db.add(models.User(email=email, password_hash=auth.hash_password_sync(password), role="admin"))
+        db.commit()
+    finally:
+        db.close()
+    print(f"created admin {email}")
+
+
+COMMANDS = {
+    "rebuild-stats": (rebuild_stats, "recompute lead_counters from the leads table"),
+    "rebuild-rollups": (rebuild_rollups, "recompute agent_rollups from closed leads"),
+    "check-stats": (check_stats, "diff lead_counters against a live aggregate"),
+    "rebuild-search": (rebuild_search, "recreate and repopulate the leads_fts full-text index"),
+    "rebuild-match-keys": (rebuild_match_keys, "recompute the leads' duplicate-matching keys (email/phone/name/company)"),
+    "rescore-leads": (rescore_leads, "recompute every lead's score (run on a schedule: parts of it age)"),
+    "sync-replicas": (sync_replicas, "copy the primary SQLite file over each file-based read replica"),
+    "archive-activity": (archive_activity, "move lead_activity rows older than CRM_ACTIVITY_HOT_DAYS to the archive"),
+    "run-jobs": (run_jobs, "run background job workers (CRM_JOBS_WORKERS threads) outside the API process"),
+    "requeue-dead-jobs": (requeue_dead_jobs, "give dead-lettered jobs a fresh set of attempts"),
+    "hash-passwords": (hash_passwords, "replace plain-text passwords left from before hashing with scrypt hashes"),
+    "create-admin": (create_admin, "create an admin user (prompts for email and password)"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="CRM maintenance commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+    args = parser.parse_args(argv)
+    models.create_tables()
+    return COMMANDS[args.command][0](args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
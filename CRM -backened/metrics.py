@@ -0,0 +1,222 @@
+# metrics.py
+import bisect
+import contextvars
+import logging
+import threading
+import time
+from typing import Dict, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import config
+
+# Prometheus text exposition format
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Debug headers, sent when config.METRICS_DEBUG_HEADERS is on
+DB_QUERIES_HEADER = "X-DB-Queries"
+DB_TIME_HEADER = "X-DB-Time-Ms"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+
+slow_query_log = logging.getLogger("crm.slow_query")
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.kind = "counter"
+        self._values: Dict[Tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Tuple = (), amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            yield self.name, dict(zip(self.labels, labels)), value
+
+
+class Gauge(Counter):
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = ()):
+        super().__init__(name, help_text, labels)
+        self.kind = "gauge"
+
+    def dec(self, labels: Tuple = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: Tuple = ()):
+        with self._lock:
+            self._values[labels] = float(value)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = name, help_text, tuple(labels)
+        self.kind = "histogram"
+        self.buckets = tuple(buckets)
+        # labels -> [per-bucket counts (last one is +Inf), sum]
+        self._values: Dict[Tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Tuple = ()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labels)
+            if entry is None:
+                entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        for labels, counts, total in items:
+            base = dict(zip(self.labels, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", {**base, "le": "+Inf" if bound == float("inf") else repr(bound)}, cumulative
+            yield f"{self.name}_sum", base, total
+            yield f"{self.name}_count", base, cumulative
+
+
+REQUESTS = Counter("crm_http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+REQUEST_LATENCY = Histogram(
+    "crm_http_request_duration_seconds", "HTTP request latency.", ("method", "route")
+)
+IN_FLIGHT = Gauge("crm_http_requests_in_flight", "HTTP requests being served.")
+DB_QUERIES = Counter("crm_db_queries_total", "SQL statements executed, by route.", ("route",))
+DB_TIME = Counter("crm_db_query_seconds_total", "Time spent executing SQL, by route.", ("route",))
+DB_QUERIES_PER_REQUEST = Histogram(
+    "crm_db_queries_per_request", "SQL statements per HTTP request.", ("route",),
+    buckets=(0, 1, 2, 3, 5, 10, 25, 50, 100),
+)
+QUERY_LATENCY = Histogram("crm_db_query_duration_seconds", "SQL statement latency.", buckets=QUERY_BUCKETS)
+SLOW_QUERIES = Counter("crm_db_slow_queries_total", "Statements slower than CRM_SLOW_QUERY_MS.", ("route",))
+# Background jobs; the depth and lag gauges are refreshed from the outbox at scrape time
+JOBS_DEPTH = Gauge("crm_jobs", "Jobs in the outbox by status.", ("status",))
+JOBS_LAG = Gauge("crm_jobs_lag_seconds", "Age of the oldest job that is due but not yet claimed.")
+JOBS_PROCESSED = Counter("crm_jobs_processed_total", "Job attempts by handler and outcome.", ("kind", "outcome"))
+JOBS_DURATION = Histogram("crm_job_duration_seconds", "Job handler run time.", ("kind",))
+
+REGISTRY = (REQUESTS, REQUEST_LATENCY, IN_FLIGHT, DB_QUERIES, DB_TIME, DB_QUERIES_PER_REQUEST,
+            QUERY_LATENCY, SLOW_QUERIES, JOBS_DEPTH, JOBS_LAG, JOBS_PROCESSED, JOBS_DURATION)
+
+
+class RequestStats:
+    __slots__ = ("scope", "queries", "db_seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.db_seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        # The router stores the matched route in the scope; unmatched paths share one label
+        return getattr(self.scope.get("route"), "path", "unmatched")
+
+
+# RequestStats of the request being served; handlers running in the threadpool
+# get a copy of the context, so they update the same object
+current_request = contextvars.ContextVar("crm_request_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if config.METRICS_ENABLED:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("query_started")
+    if not started:
+        return
+    elapsed = time.perf_counter() - started.pop()
+    QUERY_LATENCY.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_seconds += elapsed
+    if elapsed * 1000 >= config.SLOW_QUERY_MS:
+        route = stats.route if stats is not None else "background"
+        SLOW_QUERIES.inc((route,))
+        slow_query_log.warning("slow query %.1f ms on %s: %s", elapsed * 1000, route, " ".join(statement.split()))
+
+
+@event.listens_for(Engine, "handle_error")
+def _handle_error(exception_context):
+    # after_cursor_execute does not run for a failed statement
+    conn = exception_context.connection
+    started = conn.info.get("query_started") if conn is not None else None
+    if started:
+        started.pop()
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware (no per-request task, unlike app.middleware("http"))
+    recording latency, status and DB usage per route template."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                if config.METRICS_DEBUG_HEADERS:
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (DB_QUERIES_HEADER.lower().encode(), str(stats.queries).encode()),
+                        (DB_TIME_HEADER.lower().encode(), f"{stats.db_seconds * 1000:.2f}".encode()),
+                    ]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            current_request.reset(token)
+            route, method = stats.route, scope["method"]
+            REQUESTS.inc((method, route, str(status[0])))
+            REQUEST_LATENCY.observe(elapsed, (method, route))
+            DB_QUERIES.inc((route,), stats.queries)
+            DB_TIME.inc((route,), stats.db_seconds)
+            DB_QUERIES_PER_REQUEST.observe(stats.queries, (route,))
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{key}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{_format_labels(labels)} {float(value)!r}")
+    return "\n".join(lines) + "\n"
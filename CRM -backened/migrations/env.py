@@ -1,6 +1,7 @@
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
+from sqlalchemy import inspect
 from sqlalchemy import pool
 
 from alembic import context
@@ -52,6 +53,20 @@ def run_migrations_offline() -> None:
         context.run_migrations()
 
 
+# The shipped initial migration; older databases made by models.create_tables()
+# have its table names but no alembic_version row
+INITIAL_REVISION = "bb438085ce6c"
+
+
+def adopt_unversioned(connection) -> None:
+    """Stamp a database that has tables but no alembic_version at the initial
+    revision, so upgrading it starts with 4f6b0a2c9e17 (which aligns its
+    tables with models.py) instead of re-creating tables it already has."""
+    migration_context = context.get_context()
+    if migration_context.get_current_revision() is None and inspect(connection).has_table("leads"):
+        migration_context.stamp(context.script, INITIAL_REVISION)
+
+
 def run_migrations_online() -> None:
     """Run migrations in 'online' mode.
 
@@ -59,6 +74,18 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # models.create_tables() runs the migrations on its own connection
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection, target_metadata=target_metadata
+        )
+
+        with context.begin_transaction():
+            adopt_unversioned(connection)
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
@@ -71,6 +98,7 @@ def run_migrations_online() -> None:
         )
 
         with context.begin_transaction():
+            adopt_unversioned(connection)
             context.run_migrations()
 
 
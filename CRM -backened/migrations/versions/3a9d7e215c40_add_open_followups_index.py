@@ -0,0 +1,31 @@
+"""Add partial index on open followups
+
+Revision ID: 3a9d7e215c40
+Revises: c47a2e9f5b13
+Create Date: 2026-10-18 16:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a9d7e215c40'
+down_revision: Union[str, None] = 'c47a2e9f5b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only open followups are indexed, so /agenda scans stay small as history grows
+    op.create_index(
+        'ix_lead_followups_open_lead_date', 'lead_followups', ['lead_id', 'followup_date'], unique=False,
+        sqlite_where=sa.text('completed = 0'), postgresql_where=sa.text('completed = false'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lead_followups_open_lead_date', table_name='lead_followups', if_exists=True)
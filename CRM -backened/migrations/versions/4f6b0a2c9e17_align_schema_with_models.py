@@ -0,0 +1,239 @@
+"""Align the initial schema with models.py
+
+Revision ID: 4f6b0a2c9e17
+Revises: bb438085ce6c
+Create Date: 2026-10-18 09:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4f6b0a2c9e17'
+down_revision: Union[str, None] = 'bb438085ce6c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# bb438085ce6c created tables that share a name with a model but not its
+# columns (lead_id, user_type, ...). Those are kept as legacy_<name>, the
+# tables below (models.py as of this revision) take their place and the
+# legacy rows are copied over.
+def _tables():
+    return {
+        'users': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('username', sa.String(), nullable=True),
+            sa.Column('full_name', sa.String(), nullable=True),
+            sa.Column('password_hash', sa.String(), nullable=False),
+            sa.Column('role', sa.String(), nullable=True),
+            sa.Column('is_active', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+        ],
+        'sales_agents': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('employee_id', sa.String(), nullable=True),
+            sa.Column('department', sa.String(), nullable=True),
+            sa.Column('hire_date', sa.DateTime(), nullable=True),
+            sa.Column('quota', sa.Float(), nullable=True),
+            sa.Column('commission_rate', sa.Float(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id'),
+            sa.UniqueConstraint('employee_id'),
+        ],
+        'head_of_sales': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('department', sa.String(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id'),
+        ],
+        'sales_team_assignments': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('head_of_sales_id', sa.Integer(), nullable=False),
+            sa.Column('sales_agent_id', sa.Integer(), nullable=False),
+            sa.Column('assigned_date', sa.DateTime(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.ForeignKeyConstraint(['head_of_sales_id'], ['head_of_sales.id'], ondelete='CASCADE'),
+            sa.ForeignKeyConstraint(['sales_agent_id'], ['sales_agents.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        ],
+        'leads': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('first_name', sa.String(), nullable=False),
+            sa.Column('last_name', sa.String(), nullable=False),
+            sa.Column('email', sa.String(), nullable=True),
+            sa.Column('phone', sa.String(), nullable=True),
+            sa.Column('company', sa.String(), nullable=True),
+            sa.Column('job_title', sa.String(), nullable=True),
+            sa.Column('source', sa.String(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('value', sa.Float(), nullable=True),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('owner_id', sa.Integer(), nullable=True),
+            sa.Column('sales_agent_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['owner_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['sales_agent_id'], ['sales_agents.id']),
+            sa.PrimaryKeyConstraint('id'),
+        ],
+        'lead_followups': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('lead_id', sa.Integer(), nullable=False),
+            sa.Column('followup_date', sa.DateTime(), nullable=False),
+            sa.Column('notes', sa.Text(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('completed', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['lead_id'], ['leads.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id'),
+        ],
+        'tasks': [
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('due_date', sa.DateTime(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('priority', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.Column('assigned_to_id', sa.Integer(), nullable=True),
+            sa.Column('related_lead_id', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['assigned_to_id'], ['users.id']),
+            sa.ForeignKeyConstraint(['related_lead_id'], ['leads.id']),
+            sa.PrimaryKeyConstraint('id'),
+        ],
+    }
+
+
+INDEXES = [
+    ('ix_users_id', 'users', ['id'], False),
+    ('ix_users_email', 'users', ['email'], True),
+    ('ix_users_username', 'users', ['username'], True),
+    ('ix_sales_agents_id', 'sales_agents', ['id'], False),
+    ('ix_head_of_sales_id', 'head_of_sales', ['id'], False),
+    ('ix_sales_team_assignments_id', 'sales_team_assignments', ['id'], False),
+    ('ix_leads_email', 'leads', ['email'], False),
+    ('ix_leads_id', 'leads', ['id'], False),
+    ('ix_lead_followups_id', 'lead_followups', ['id'], False),
+    ('ix_tasks_id', 'tasks', ['id'], False),
+]
+
+# legacy table -> INSERT ... SELECT into its replacement
+COPY_ROWS = {
+    'users': (
+        "INSERT INTO users (id, email, username, password_hash, role, is_active, created_at, updated_at) "
+        "SELECT user_id, email, username, password_hash, user_type, is_active, created_at, created_at "
+        "FROM legacy_users"
+    ),
+    'sales_agents': (
+        "INSERT INTO sales_agents (id, user_id, employee_id, department, hire_date, quota, commission_rate) "
+        "SELECT agent_id, user_id, employee_id, department, hire_date, 0.0, 0.0 FROM legacy_sales_agents"
+    ),
+    'head_of_sales': (
+        "INSERT INTO head_of_sales (id, user_id, department) "
+        "SELECT head_id, user_id, department FROM legacy_head_of_sales"
+    ),
+    'sales_team_assignments': (
+        "INSERT INTO sales_team_assignments (id, head_of_sales_id, sales_agent_id, assigned_date) "
+        "SELECT assignment_id, head_id, agent_id, assigned_date FROM legacy_sales_team_assignments"
+    ),
+    # The active primary assignment becomes the lead's sales agent
+    'leads': (
+        "INSERT INTO leads (id, first_name, last_name, email, phone, company, source, status, value, notes, "
+        "created_at, updated_at, sales_agent_id) "
+        "SELECT lead_id, first_name, last_name, email, phone, company_name, lead_source, "
+        "COALESCE(lead_status, 'new'), COALESCE(budget, 0.0), description, created_at, updated_at, "
+        "(SELECT a.agent_id FROM lead_assignments a WHERE a.lead_id = l.lead_id AND a.is_active "
+        "ORDER BY a.assignment_type = 'primary' DESC, a.assignment_date DESC LIMIT 1) "
+        "FROM legacy_leads l"
+    ),
+    # A followup with a recorded outcome has happened
+    'lead_followups': (
+        "INSERT INTO lead_followups (id, lead_id, followup_date, notes, status, completed, created_at) "
+        "SELECT followup_id, lead_id, followup_date, notes, "
+        "CASE WHEN outcome IS NULL THEN 'scheduled' ELSE 'completed' END, outcome IS NOT NULL, followup_date "
+        "FROM legacy_lead_followups"
+    ),
+}
+
+# Tables bb438085ce6c created; they keep pointing at each other once renamed
+LEGACY_TABLES = {
+    'leads', 'products', 'users', 'head_of_sales', 'lead_actions', 'lead_status_history', 'sales_agents',
+    'head_lead_oversight', 'lead_assignments', 'lead_communications', 'lead_followups', 'sales_team_assignments',
+}
+
+
+def _repoint_foreign_keys(bind, renamed):
+    """Rebuild non-legacy tables whose foreign keys SQLite moved to a legacy_ table.
+
+    SQLite rewrites REFERENCES clauses on ALTER TABLE ... RENAME, which is
+    right for the legacy tables but not for tables created from models.py
+    (tasks, ...) that already referenced leads(id) / users(id).
+    """
+    inspector = sa.inspect(bind)
+    for table in inspector.get_table_names():
+        if table in LEGACY_TABLES or table.startswith('legacy_') or table == 'alembic_version':
+            continue
+        create_sql = bind.execute(
+            sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': table}
+        ).scalar()
+        fixed = create_sql
+        for name in renamed:
+            fixed = fixed.replace(f'REFERENCES "legacy_{name}"', f'REFERENCES {name}')
+            fixed = fixed.replace(f'REFERENCES legacy_{name} ', f'REFERENCES {name} ')
+        if fixed == create_sql:
+            continue
+        index_sql = bind.execute(
+            sa.text("SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = :name AND sql IS NOT NULL"),
+            {'name': table},
+        ).scalars().all()
+        temp = f'_rebuild_{table}'
+        op.execute(fixed.replace(table, temp, 1))
+        op.execute(f'INSERT INTO {temp} SELECT * FROM {table}')
+        op.execute(f'DROP TABLE {table}')
+        op.execute(f'ALTER TABLE {temp} RENAME TO {table}')
+        for statement in index_sql:
+            op.execute(statement)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+    tables = _tables()
+    renamed = [
+        name for name in tables
+        if name in existing and 'id' not in {column['name'] for column in inspector.get_columns(name)}
+    ]
+    for name in renamed:
+        op.rename_table(name, f'legacy_{name}')
+    if renamed and bind.dialect.name == 'sqlite':
+        _repoint_foreign_keys(bind, renamed)
+    for name, columns in tables.items():
+        if name not in existing or name in renamed:
+            op.create_table(name, *columns)
+    for name, table, columns, unique in INDEXES:
+        op.create_index(name, table, columns, unique=unique, if_not_exists=True)
+    for name in renamed:
+        if name in COPY_ROWS:
+            op.execute(COPY_ROWS[name])
+
+
+def downgrade() -> None:
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+    # Tables without a legacy counterpart (tasks) are left in place
+    for name in reversed(list(_tables())):
+        if f'legacy_{name}' in existing:
+            op.drop_table(name)
+            op.rename_table(f'legacy_{name}', name)
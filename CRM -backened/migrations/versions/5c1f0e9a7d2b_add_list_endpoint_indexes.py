@@ -0,0 +1,42 @@
+"""Add list endpoint indexes
+
+Revision ID: 5c1f0e9a7d2b
+Revises: 4f6b0a2c9e17
+Create Date: 2026-10-18 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c1f0e9a7d2b'
+down_revision: Union[str, None] = '4f6b0a2c9e17'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns) matching the filter + ORDER BY of each list endpoint
+INDEXES = [
+    ('ix_leads_created_at_id', 'leads', ['created_at', 'id']),
+    ('ix_leads_status_created_at', 'leads', ['status', 'created_at', 'id']),
+    ('ix_leads_owner_created_at', 'leads', ['owner_id', 'created_at', 'id']),
+    ('ix_leads_agent_created_at', 'leads', ['sales_agent_id', 'created_at', 'id']),
+    ('ix_tasks_due_date_id', 'tasks', ['due_date', 'id']),
+    ('ix_tasks_status_due_date', 'tasks', ['status', 'due_date', 'id']),
+    ('ix_tasks_assignee_due_date', 'tasks', ['assigned_to_id', 'due_date', 'id']),
+    ('ix_tasks_priority_due_date', 'tasks', ['priority', 'due_date', 'id']),
+    ('ix_lead_followups_lead_date', 'lead_followups', ['lead_id', 'followup_date']),
+    ('ix_users_role', 'users', ['role']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
@@ -0,0 +1,83 @@
+"""Make lead_activity ids AUTOINCREMENT so archived ids are never reused
+
+Revision ID: 6e1c9a2f4b85
+Revises: b3e9f4a06d72
+Create Date: 2026-10-19 11:15:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e1c9a2f4b85'
+down_revision: Union[str, None] = 'b3e9f4a06d72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+TEMP = '_rebuild_lead_activity'
+COLUMNS = 'lead_id, event, field, old_value, new_value, changed_by, created_at'
+INDEXES = [
+    ('ix_lead_activity_lead_created', ['lead_id', 'created_at', 'id']),
+    ('ix_lead_activity_created', ['created_at', 'id']),
+]
+
+
+def _columns():
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('lead_id', sa.Integer(), nullable=False),
+        sa.Column('event', sa.String(), nullable=False),
+        sa.Column('field', sa.String(), nullable=False),
+        sa.Column('old_value', sa.Text(), nullable=True),
+        sa.Column('new_value', sa.Text(), nullable=True),
+        sa.Column('changed_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    ]
+
+
+def _autoincrement(bind) -> bool:
+    create_sql = bind.execute(
+        sa.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'lead_activity'")
+    ).scalar()
+    return 'AUTOINCREMENT' in create_sql.upper()
+
+
+def _rebuild(autoincrement: bool) -> None:
+    op.create_table(TEMP, *_columns(), sqlite_autoincrement=autoincrement)
+    if autoincrement:
+        # Start past every id handed out so far, archived ones included
+        op.execute(
+            f"INSERT INTO sqlite_sequence (name, seq) SELECT '{TEMP}', COALESCE(MAX(id), 0) FROM "
+            "(SELECT id FROM lead_activity UNION ALL SELECT id FROM lead_activity_archive)"
+        )
+    op.execute(f'INSERT INTO {TEMP} (id, {COLUMNS}) SELECT id, {COLUMNS} FROM lead_activity '
+               'WHERE id NOT IN (SELECT id FROM lead_activity_archive)')
+    # Rows that already reused an archived id would block every later
+    # archive run; they take fresh ids instead
+    op.execute(f'INSERT INTO {TEMP} ({COLUMNS}) SELECT {COLUMNS} FROM lead_activity '
+               'WHERE id IN (SELECT id FROM lead_activity_archive) ORDER BY created_at, id')
+    for name, _ in INDEXES:
+        op.drop_index(name, table_name='lead_activity', if_exists=True)
+    op.drop_table('lead_activity')
+    op.rename_table(TEMP, 'lead_activity')
+    for name, columns in INDEXES:
+        op.create_index(name, 'lead_activity', columns, unique=False, if_not_exists=True)
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or _autoincrement(bind):
+        return
+    _rebuild(True)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'sqlite' or not _autoincrement(bind):
+        return
+    _rebuild(False)
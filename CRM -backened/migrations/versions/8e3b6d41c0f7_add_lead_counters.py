@@ -0,0 +1,44 @@
+"""Add lead_counters
+
+Revision ID: 8e3b6d41c0f7
+Revises: 5c1f0e9a7d2b
+Create Date: 2026-10-18 11:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3b6d41c0f7'
+down_revision: Union[str, None] = '5c1f0e9a7d2b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Already there (and maintained) when create_tables() built the database
+    if sa.inspect(op.get_bind()).has_table('lead_counters'):
+        return
+    op.create_table('lead_counters',
+    sa.Column('dimension', sa.String(), nullable=False),
+    sa.Column('dimension_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('lead_count', sa.Integer(), nullable=False),
+    sa.Column('total_value', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('dimension', 'dimension_id', 'status')
+    )
+    # Backfill from existing leads (same as `python manage.py rebuild-stats`)
+    for dimension, column in (('all', None), ('sales_agent', 'COALESCE(sales_agent_id, 0)'), ('owner', 'COALESCE(owner_id, 0)')):
+        group_by = "COALESCE(status, '')" if column is None else f"{column}, COALESCE(status, '')"
+        op.execute(
+            "INSERT INTO lead_counters (dimension, dimension_id, status, lead_count, total_value) "
+            f"SELECT '{dimension}', {column or 0}, COALESCE(status, ''), COUNT(id), COALESCE(SUM(value), 0.0) "
+            f"FROM leads GROUP BY {group_by}"
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('lead_counters')
@@ -0,0 +1,135 @@
+"""Add lead scores
+
+Revision ID: a7d3e1b94c58
+Revises: f2a8c5d17e63
+Create Date: 2026-10-18 23:40:00.000000
+
+"""
+import math
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7d3e1b94c58'
+down_revision: Union[str, None] = 'f2a8c5d17e63'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = [
+    ('ix_leads_score_id', 'leads', ['score', 'id']),
+    ('ix_leads_status_score', 'leads', ['status', 'score', 'id']),
+    ('ix_leads_owner_score', 'leads', ['owner_id', 'score', 'id']),
+    ('ix_leads_agent_score', 'leads', ['sales_agent_id', 'score', 'id']),
+    ('ix_tasks_related_lead_status', 'tasks', ['related_lead_id', 'status']),
+]
+BATCH_SIZE = 50000
+
+# The default scorer as of this revision (scoring.py), frozen so later
+# scorer changes do not alter what this backfill writes; a custom
+# CRM_LEAD_SCORER takes over with `python manage.py rescore-leads`
+WEIGHTS = {
+    'stage': 0.25, 'value': 0.25, 'source': 0.10, 'contact': 0.10,
+    'engagement': 0.10, 'recency': 0.10, 'planned': 0.05, 'fresh': 0.05,
+}
+STAGE_WEIGHTS = {'new': 0.2, 'contacted': 0.4, 'qualified': 0.6, 'proposal': 0.8, 'negotiation': 0.9}
+SOURCE_WEIGHTS = {'referral': 1.0, 'event': 0.8, 'website': 0.6, 'social_media': 0.5, 'cold_call': 0.3}
+CLOSED_STATUSES = ('closed_won', 'closed_lost')
+UNKNOWN_STAGE_WEIGHT = 0.2
+OTHER_SOURCE_WEIGHT = 0.4
+VALUE_SCALE = 100000.0
+RECENCY_DAYS = 14.0
+FRESH_DAYS = 90.0
+ENGAGEMENT_FOLLOWUPS = 3.0
+CONTACT_FIELDS = ('email', 'phone', 'company', 'job_title')
+ACTIVE_TASK_STATUSES = ('pending', 'in_progress')
+
+leads = sa.table(
+    'leads', sa.column('id', sa.Integer), sa.column('status', sa.String), sa.column('value', sa.Float),
+    sa.column('source', sa.String), *[sa.column(field, sa.String) for field in CONTACT_FIELDS],
+    sa.column('created_at', sa.DateTime), sa.column('score', sa.Float),
+)
+followups = sa.table(
+    'lead_followups', sa.column('lead_id', sa.Integer), sa.column('followup_date', sa.DateTime),
+    sa.column('completed', sa.Boolean),
+)
+tasks = sa.table('tasks', sa.column('related_lead_id', sa.Integer), sa.column('status', sa.String))
+
+
+def _days(delta):
+    return delta.total_seconds() / 86400
+
+
+def _score(lead, lead_followups, open_tasks, now):
+    if lead['status'] in CLOSED_STATUSES:
+        return 0.0
+    completed = [date for date, done in lead_followups if done]
+    upcoming = sum(1 for date, done in lead_followups if not done and date >= now)
+    parts = {
+        'stage': STAGE_WEIGHTS.get(lead['status'], UNKNOWN_STAGE_WEIGHT),
+        'value': min(max(math.log1p(max(lead['value'] or 0.0, 0.0)) / math.log1p(VALUE_SCALE), 0.0), 1.0),
+        'source': SOURCE_WEIGHTS.get((lead['source'] or '').lower(), OTHER_SOURCE_WEIGHT),
+        'contact': sum(bool(lead[field]) for field in CONTACT_FIELDS) / len(CONTACT_FIELDS),
+        'engagement': 1.0 - math.exp(-len(completed) / ENGAGEMENT_FOLLOWUPS),
+        'recency': math.exp(-max(_days(now - max(completed)), 0.0) / RECENCY_DAYS) if completed else 0.0,
+        'planned': 1.0 if upcoming + open_tasks > 0 else 0.0,
+        'fresh': math.exp(-max(_days(now - (lead['created_at'] or now)), 0.0) / FRESH_DAYS),
+    }
+    total = sum(WEIGHTS[name] * part for name, part in parts.items())
+    # Clipped to 0-100 and stored to one decimal
+    return round(min(max(100.0 * total, 0.0), 100.0) * 10) / 10
+
+
+def _backfill_scores(bind):
+    now = datetime.utcnow()
+    set_score = leads.update().where(leads.c.id == sa.bindparam('lead_id')).values(score=sa.bindparam('new_score'))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(leads.c.id, leads.c.status, leads.c.value, leads.c.source,
+                      *[leads.c[field] for field in CONTACT_FIELDS], leads.c.created_at)
+            .where(leads.c.id > last_id).order_by(leads.c.id).limit(BATCH_SIZE)
+        ).mappings().all()
+        if not rows:
+            return
+        first, last_id = rows[0]['id'], rows[-1]['id']
+        lead_followups = {}
+        for lead_id, date, done in bind.execute(
+            sa.select(followups.c.lead_id, followups.c.followup_date, followups.c.completed)
+            .where(followups.c.lead_id.between(first, last_id))
+        ):
+            lead_followups.setdefault(lead_id, []).append((date, done is True))
+        open_tasks = dict(bind.execute(
+            sa.select(tasks.c.related_lead_id, sa.func.count())
+            .where(tasks.c.related_lead_id.between(first, last_id), tasks.c.status.in_(ACTIVE_TASK_STATUSES))
+            .group_by(tasks.c.related_lead_id)
+        ).all())
+        bind.execute(set_score, [
+            {'lead_id': row['id'],
+             'new_score': _score(row, lead_followups.get(row['id'], ()), open_tasks.get(row['id'], 0), now)}
+            for row in rows
+        ])
+
+
+def upgrade() -> None:
+    # Already there (and maintained) when create_tables() built the database
+    if 'score' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('leads')}:
+        return
+    op.add_column('leads', sa.Column('score', sa.Float(), nullable=True))
+    # Backfill before indexing; the task index serves the backfill too
+    op.create_index('ix_tasks_related_lead_status', 'tasks', ['related_lead_id', 'status'],
+                    unique=False, if_not_exists=True)
+    _backfill_scores(op.get_bind())
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+    # Plain ALTER TABLE (SQLite 3.35+): a batch table rebuild would drop the leads_fts triggers
+    op.execute('ALTER TABLE leads DROP COLUMN score')
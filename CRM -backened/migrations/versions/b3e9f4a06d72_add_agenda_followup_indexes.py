@@ -0,0 +1,75 @@
+"""Index open followups by lead owner and sales agent for /agenda
+
+Revision ID: b3e9f4a06d72
+Revises: a7d3e1b94c58
+Create Date: 2026-10-19 09:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e9f4a06d72'
+down_revision: Union[str, None] = 'a7d3e1b94c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+FROM_LEAD = (
+    "UPDATE lead_followups SET owner_id = (SELECT owner_id FROM leads WHERE id = new.lead_id), "
+    "sales_agent_id = (SELECT sales_agent_id FROM leads WHERE id = new.lead_id) WHERE id = new.id; "
+)
+TRIGGERS = {
+    'lead_followups_lead_ai': f"AFTER INSERT ON lead_followups BEGIN {FROM_LEAD}END",
+    'lead_followups_lead_au': f"AFTER UPDATE OF lead_id ON lead_followups BEGIN {FROM_LEAD}END",
+    'leads_followups_au': (
+        "AFTER UPDATE OF owner_id, sales_agent_id ON leads BEGIN "
+        "UPDATE lead_followups SET owner_id = new.owner_id, sales_agent_id = new.sales_agent_id "
+        "WHERE lead_id = new.id; END"
+    ),
+}
+INDEXES = [
+    ('ix_lead_followups_open_owner_date', ['owner_id', 'followup_date', 'id']),
+    ('ix_lead_followups_open_agent_date', ['sales_agent_id', 'followup_date', 'id']),
+]
+
+
+def _open_index(name, columns):
+    op.create_index(
+        name, 'lead_followups', columns, unique=False,
+        sqlite_where=sa.text('completed = 0'), postgresql_where=sa.text('completed = false'),
+        if_not_exists=True,
+    )
+
+
+def upgrade() -> None:
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('lead_followups')}
+    for column in ('owner_id', 'sales_agent_id'):
+        if column not in columns:
+            op.add_column('lead_followups', sa.Column(column, sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE lead_followups SET "
+        "owner_id = (SELECT owner_id FROM leads WHERE leads.id = lead_followups.lead_id), "
+        "sales_agent_id = (SELECT sales_agent_id FROM leads WHERE leads.id = lead_followups.lead_id)"
+    )
+    if op.get_bind().dialect.name == 'sqlite':
+        for name, body in TRIGGERS.items():
+            op.execute(f"CREATE TRIGGER IF NOT EXISTS {name} {body}")
+    for name, index_columns in INDEXES:
+        _open_index(name, index_columns)
+    # Superseded: the agenda no longer reads followups lead by lead
+    op.drop_index('ix_lead_followups_open_lead_date', table_name='lead_followups', if_exists=True)
+
+
+def downgrade() -> None:
+    _open_index('ix_lead_followups_open_lead_date', ['lead_id', 'followup_date'])
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name='lead_followups', if_exists=True)
+    for name in reversed(list(TRIGGERS)):
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    # Plain ALTER TABLE (SQLite 3.35+), as in the other column drops
+    op.execute('ALTER TABLE lead_followups DROP COLUMN sales_agent_id')
+    op.execute('ALTER TABLE lead_followups DROP COLUMN owner_id')
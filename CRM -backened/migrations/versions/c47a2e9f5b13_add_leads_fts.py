@@ -0,0 +1,51 @@
+"""Add leads_fts full-text index
+
+Revision ID: c47a2e9f5b13
+Revises: 8e3b6d41c0f7
+Create Date: 2026-10-18 12:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a2e9f5b13'
+down_revision: Union[str, None] = '8e3b6d41c0f7'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+COLUMNS = 'first_name, last_name, email, company, job_title, notes'
+NEW_VALUES = 'new.first_name, new.last_name, new.email, new.company, new.job_title, new.notes'
+OLD_VALUES = 'old.first_name, old.last_name, old.email, old.company, old.job_title, old.notes'
+
+
+def upgrade() -> None:
+    op.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5({COLUMNS}, "
+        "content='leads', content_rowid='id', tokenize='unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        f"CREATE TRIGGER IF NOT EXISTS leads_fts_ai AFTER INSERT ON leads BEGIN "
+        f"INSERT INTO leads_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END"
+    )
+    op.execute(
+        f"CREATE TRIGGER IF NOT EXISTS leads_fts_ad AFTER DELETE ON leads BEGIN "
+        f"INSERT INTO leads_fts(leads_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); END"
+    )
+    op.execute(
+        f"CREATE TRIGGER IF NOT EXISTS leads_fts_au AFTER UPDATE OF {COLUMNS} ON leads BEGIN "
+        f"INSERT INTO leads_fts(leads_fts, rowid, {COLUMNS}) VALUES ('delete', old.id, {OLD_VALUES}); "
+        f"INSERT INTO leads_fts(rowid, {COLUMNS}) VALUES (new.id, {NEW_VALUES}); END"
+    )
+    # Index the leads that already exist
+    op.execute("INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS leads_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS leads_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS leads_fts_ai")
+    op.execute("DROP TABLE IF EXISTS leads_fts")
@@ -0,0 +1,50 @@
+"""Add lead_activity log and archive tables
+
+Revision ID: d81f3a6c2b90
+Revises: 9b2e4c7d1f36
+Create Date: 2026-10-18 18:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd81f3a6c2b90'
+down_revision: Union[str, None] = '9b2e4c7d1f36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _columns():
+    return [
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('lead_id', sa.Integer(), nullable=False),
+        sa.Column('event', sa.String(), nullable=False),
+        sa.Column('field', sa.String(), nullable=False),
+        sa.Column('old_value', sa.Text(), nullable=True),
+        sa.Column('new_value', sa.Text(), nullable=True),
+        sa.Column('changed_by', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+    ]
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('lead_activity'):
+        return
+    op.create_table('lead_activity', *_columns())
+    op.create_index('ix_lead_activity_lead_created', 'lead_activity', ['lead_id', 'created_at', 'id'], unique=False, if_not_exists=True)
+    op.create_index('ix_lead_activity_created', 'lead_activity', ['created_at', 'id'], unique=False, if_not_exists=True)
+    op.create_table('lead_activity_archive', *_columns())
+    op.create_index('ix_lead_activity_archive_lead_created', 'lead_activity_archive', ['lead_id', 'created_at', 'id'], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lead_activity_archive_lead_created', table_name='lead_activity_archive', if_exists=True)
+    op.drop_table('lead_activity_archive')
+    op.drop_index('ix_lead_activity_created', table_name='lead_activity', if_exists=True)
+    op.drop_index('ix_lead_activity_lead_created', table_name='lead_activity', if_exists=True)
+    op.drop_table('lead_activity')
@@ -0,0 +1,70 @@
+"""Add agent_rollups
+
+Revision ID: e5c0b7a94d21
+Revises: d81f3a6c2b90
+Create Date: 2026-10-18 19:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c0b7a94d21'
+down_revision: Union[str, None] = 'd81f3a6c2b90'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+BUCKETS = {
+    'sqlite': {'day': "date({0})", 'month': "strftime('%Y-%m-01', {0})"},
+    'postgresql': {'day': "date_trunc('day', {0})::date", 'month': "date_trunc('month', {0})::date"},
+}
+
+
+LATEST_CLOSE = (
+    "(SELECT MAX(a.created_at) FROM {0} a WHERE a.lead_id = leads.id "
+    "AND a.event = 'status_changed' AND a.new_value = leads.status)"
+)
+CLOSED_AT = "COALESCE({0}, {1}, leads.created_at)".format(
+    LATEST_CLOSE.format('lead_activity'), LATEST_CLOSE.format('lead_activity_archive')
+)
+
+
+def upgrade() -> None:
+    # Already there (and maintained) when create_tables() built the database
+    if sa.inspect(op.get_bind()).has_table('agent_rollups'):
+        return
+    op.create_table('agent_rollups',
+    sa.Column('sales_agent_id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.String(), nullable=False),
+    sa.Column('bucket', sa.Date(), nullable=False),
+    sa.Column('won_count', sa.Integer(), nullable=False),
+    sa.Column('won_value', sa.Float(), nullable=False),
+    sa.Column('lost_count', sa.Integer(), nullable=False),
+    sa.Column('lost_value', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('sales_agent_id', 'period', 'bucket')
+    )
+    op.create_index('ix_agent_rollups_period_bucket', 'agent_rollups', ['period', 'bucket', 'sales_agent_id'], unique=False, if_not_exists=True)
+    # Backfill from closed leads, each dated by the status_changed row that
+    # closed it, else created_at (same as `python manage.py rebuild-rollups`)
+    buckets = BUCKETS.get(op.get_bind().dialect.name, BUCKETS['sqlite'])
+    for period in ('day', 'month'):
+        bucket = buckets[period].format(CLOSED_AT)
+        op.execute(
+            "INSERT INTO agent_rollups (sales_agent_id, period, bucket, won_count, won_value, lost_count, lost_value) "
+            f"SELECT sales_agent_id, '{period}', {bucket}, "
+            "SUM(CASE WHEN status = 'closed_won' THEN 1 ELSE 0 END), "
+            "COALESCE(SUM(CASE WHEN status = 'closed_won' THEN value END), 0.0), "
+            "SUM(CASE WHEN status = 'closed_lost' THEN 1 ELSE 0 END), "
+            "COALESCE(SUM(CASE WHEN status = 'closed_lost' THEN value END), 0.0) "
+            "FROM leads WHERE status IN ('closed_won', 'closed_lost') AND sales_agent_id IS NOT NULL "
+            f"GROUP BY sales_agent_id, {bucket}"
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_agent_rollups_period_bucket', table_name='agent_rollups', if_exists=True)
+    op.drop_table('agent_rollups')
@@ -0,0 +1,97 @@
+"""Add lead duplicate-matching keys
+
+Revision ID: f2a8c5d17e63
+Revises: e5c0b7a94d21
+Create Date: 2026-10-18 22:10:00.000000
+
+"""
+import re
+import unicodedata
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a8c5d17e63'
+down_revision: Union[str, None] = 'e5c0b7a94d21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+KEY_COLUMNS = ['email_key', 'phone_key', 'name_key', 'company_key']
+INDEXES = [
+    ('ix_leads_email_key', ['email_key']),
+    ('ix_leads_phone_key', ['phone_key']),
+    ('ix_leads_name_company_key', ['name_key', 'company_key']),
+]
+BATCH_SIZE = 10000
+
+# Key normalization as of this revision (dedup.py), frozen here so later
+# changes to dedup.py do not alter what this backfill writes; a changed
+# normalization ships with its own migration or `manage.py rebuild-match-keys`
+MATCH_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'company')
+DOTLESS_EMAIL_DOMAINS = {'gmail.com': 'gmail.com', 'googlemail.com': 'gmail.com'}
+COMPANY_SUFFIXES = {
+    'inc', 'incorporated', 'llc', 'llp', 'ltd', 'limited', 'corp', 'corporation', 'co', 'company',
+    'plc', 'gmbh', 'ag', 'sa', 'bv', 'pty',
+}
+PHONE_DIGITS = 10
+MIN_PHONE_DIGITS = 7
+
+
+def _words(text):
+    text = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode().lower()
+    return re.findall(r'[a-z0-9]+', text)
+
+
+def _match_keys(row):
+    local, _, domain = (row['email'] or '').strip().lower().rpartition('@')
+    local = local.split('+', 1)[0]
+    if domain in DOTLESS_EMAIL_DOMAINS:
+        local, domain = local.replace('.', ''), DOTLESS_EMAIL_DOMAINS[domain]
+    digits = re.sub(r'\D', '', row['phone'] or '')
+    company = _words(row['company'])
+    while company and company[-1] in COMPANY_SUFFIXES:
+        company.pop()
+    return {
+        'email_key': f'{local}@{domain}' if local and domain else None,
+        'phone_key': digits[-PHONE_DIGITS:] if len(digits) >= MIN_PHONE_DIGITS else None,
+        'name_key': ' '.join(sorted(_words(row['first_name']) + _words(row['last_name']))) or None,
+        'company_key': ' '.join(company),
+    }
+
+
+def upgrade() -> None:
+    # Already there (and maintained) when create_tables() built the database
+    if 'email_key' in {column['name'] for column in sa.inspect(op.get_bind()).get_columns('leads')}:
+        return
+    for column in KEY_COLUMNS:
+        op.add_column('leads', sa.Column(column, sa.String(), nullable=True))
+    # Backfill in Python: the normalization has no portable SQL equivalent
+    bind = op.get_bind()
+    leads = sa.table('leads', sa.column('id'), *[sa.column(name) for name in MATCH_FIELDS + tuple(KEY_COLUMNS)])
+    set_keys = leads.update().where(leads.c.id == sa.bindparam('lead_id')).values(
+        {column: sa.bindparam(column) for column in KEY_COLUMNS}
+    )
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(leads.c.id, *[leads.c[name] for name in MATCH_FIELDS])
+            .where(leads.c.id > last_id).order_by(leads.c.id).limit(BATCH_SIZE)
+        ).mappings().all()
+        if not rows:
+            break
+        bind.execute(set_keys, [dict(_match_keys(row), lead_id=row['id']) for row in rows])
+        last_id = rows[-1]['id']
+    for name, columns in INDEXES:
+        op.create_index(name, 'leads', columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name='leads', if_exists=True)
+    # Plain ALTER TABLE (SQLite 3.35+): a batch table rebuild would drop the leads_fts triggers
+    for column in reversed(KEY_COLUMNS):
+        op.execute(f'ALTER TABLE leads DROP COLUMN {column}')
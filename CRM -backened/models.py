@@ -1,20 +1,98 @@
 # models.py
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, DateTime, Text, Boolean, Float
+from sqlalchemy import create_engine, event, inspect, text, DDL, Column, Integer, String, ForeignKey, Date, DateTime, Text, Boolean, Float, Index, PrimaryKeyConstraint
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
+import os
+import config
 
 # Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./crm.db"  # Changed filename for clarity
+SQLALCHEMY_DATABASE_URL = config.DATABASE_URL
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-)
+def engine_options(url, is_async=False):
+    """create_engine keyword arguments for ``url`` from config."""
+    url = make_url(url)
+    options = {}
+    if url.get_backend_name() == "sqlite":
+        if not is_async:
+            options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            return options
+    options.update(
+        pool_size=config.DB_POOL_SIZE,
+        max_overflow=config.DB_MAX_OVERFLOW,
+        pool_recycle=config.DB_POOL_RECYCLE,
+        pool_pre_ping=config.DB_POOL_PRE_PING,
+    )
+    return options
+
+def sqlite_pragma_listener(pragmas):
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+    return set_sqlite_pragmas
+
+def make_engine(url, pragmas=None, **kwargs):
+    """Engine with pool settings from config and, for SQLite, per-connection PRAGMAs."""
+    options = engine_options(url)
+    options.update(kwargs)
+    new_engine = create_engine(url, **options)
+    if new_engine.dialect.name == "sqlite":
+        event.listen(new_engine, "connect", sqlite_pragma_listener(
+            config.SQLITE_PRAGMAS if pragmas is None else pragmas
+        ))
+    return new_engine
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Read replicas (CRM_READ_REPLICA_URLS); see replicas.py for routing
+replica_engines = [make_engine(url) for url in config.READ_REPLICA_URLS]
+ReplicaSessionLocals = [
+    sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    for replica_engine in replica_engines
+]
+
+# Async engines for CRM_DB_MODE=async (the primary, then one per replica),
+# created on first use so the sync path never needs an async driver (aiosqlite) installed
+AsyncSessionLocal = None
+AsyncReplicaSessionLocals = []
+
+def make_async_sessionmaker(url):
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+    async_engine = create_async_engine(url, **engine_options(url, is_async=True))
+    if async_engine.dialect.name == "sqlite":
+        event.listen(async_engine.sync_engine, "connect", sqlite_pragma_listener(config.SQLITE_PRAGMAS))
+    # Handlers return ORM objects that are serialized after the session is done with them
+    return async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def get_async_sessionmakers():
+    """``(primary, [replicas])`` async session factories, in READ_REPLICA_URLS order."""
+    global AsyncSessionLocal, AsyncReplicaSessionLocals
+    if AsyncSessionLocal is None:
+        AsyncReplicaSessionLocals = [make_async_sessionmaker(url) for url in config.ASYNC_READ_REPLICA_URLS]
+        AsyncSessionLocal = make_async_sessionmaker(config.ASYNC_DATABASE_URL)
+    return AsyncSessionLocal, AsyncReplicaSessionLocals
+
 def create_tables():
-    Base.metadata.create_all(bind=engine)
+    """Create an empty database from the models and stamp it with the latest
+    migration, or upgrade an existing one (alembic upgrade head)."""
+    from alembic import command
+    from alembic.config import Config
+
+    alembic_cfg = Config()
+    alembic_cfg.set_main_option("script_location", os.path.join(os.path.dirname(os.path.abspath(__file__)), "migrations"))
+    with engine.begin() as connection:
+        alembic_cfg.attributes["connection"] = connection
+        if inspect(connection).get_table_names():
+            command.upgrade(alembic_cfg, "head")
+        else:
+            Base.metadata.create_all(bind=connection)
+            command.stamp(alembic_cfg, "head")
 
 # Models
 class User(Base):
@@ -25,7 +103,7 @@ class User(Base):
     username = Column(String, unique=True, index=True)
     full_name = Column(String)
     password_hash = Column(String, nullable=False)
-    role = Column(String, default="customer")
+    role = Column(String, default="customer", index=True)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -86,6 +164,13 @@ class Lead(Base):
     notes = Column(Text)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Normalized duplicate-matching keys, maintained by dedup.py
+    email_key = Column(String)
+    phone_key = Column(String)
+    name_key = Column(String)
+    company_key = Column(String)
+    # 0-100 priority, maintained by scoring.py
+    score = Column(Float)
     
     # Foreign keys
     owner_id = Column(Integer, ForeignKey("users.id"))
@@ -96,6 +181,90 @@ class Lead(Base):
     sales_agent = relationship("SalesAgent", back_populates="leads")
     followups = relationship("LeadFollowup", back_populates="lead")
 
+    __table_args__ = (
+        # Keyset paging order for GET /leads/, optionally narrowed by one filter
+        Index("ix_leads_created_at_id", "created_at", "id"),
+        Index("ix_leads_status_created_at", "status", "created_at", "id"),
+        Index("ix_leads_owner_created_at", "owner_id", "created_at", "id"),
+        Index("ix_leads_agent_created_at", "sales_agent_id", "created_at", "id"),
+        # Same, for GET /leads/?sort_by=score
+        Index("ix_leads_score_id", "score", "id"),
+        Index("ix_leads_status_score", "status", "score", "id"),
+        Index("ix_leads_owner_score", "owner_id", "score", "id"),
+        Index("ix_leads_agent_score", "sales_agent_id", "score", "id"),
+        # Duplicate detection blocks: leads sharing one of these are compared
+        Index("ix_leads_email_key", "email_key"),
+        Index("ix_leads_phone_key", "phone_key"),
+        Index("ix_leads_name_company_key", "name_key", "company_key"),
+    )
+
+# Full-text index over leads (SQLite FTS5, external content). Triggers keep it
+# in sync with every insert/update/delete, including bulk and Core writes.
+LEAD_SEARCH_COLUMNS = ["first_name", "last_name", "email", "company", "job_title", "notes"]
+
+def _lead_search_ddl():
+    columns = ", ".join(LEAD_SEARCH_COLUMNS)
+    new_values = ", ".join(f"new.{c}" for c in LEAD_SEARCH_COLUMNS)
+    old_values = ", ".join(f"old.{c}" for c in LEAD_SEARCH_COLUMNS)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5({columns}, "
+        "content='leads', content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+        f"CREATE TRIGGER IF NOT EXISTS leads_fts_ai AFTER INSERT ON leads BEGIN "
+        f"INSERT INTO leads_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS leads_fts_ad AFTER DELETE ON leads BEGIN "
+        f"INSERT INTO leads_fts(leads_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS leads_fts_au AFTER UPDATE OF {columns} ON leads BEGIN "
+        f"INSERT INTO leads_fts(leads_fts, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO leads_fts(rowid, {columns}) VALUES (new.id, {new_values}); END",
+    ]
+
+LEAD_SEARCH_DDL = _lead_search_ddl()
+
+for _statement in LEAD_SEARCH_DDL:
+    event.listen(Lead.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+class LeadCounter(Base):
+    """Materialized lead counts and value sums, updated in the same
+    transaction as every lead write (see stats.record_lead_changes).
+
+    ``dimension`` is "all", "sales_agent" or "owner"; ``dimension_id`` is the
+    agent/owner id, or 0 for the "all" row and for unassigned leads.
+    """
+    __tablename__ = "lead_counters"
+
+    dimension = Column(String, nullable=False)
+    dimension_id = Column(Integer, nullable=False, default=0)
+    status = Column(String, nullable=False)
+    lead_count = Column(Integer, nullable=False, default=0)
+    total_value = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("dimension", "dimension_id", "status"),
+    )
+
+class AgentRollup(Base):
+    """Closed-lead totals per sales agent and day/month, kept in step with
+    lead writes by a job (see performance.update_rollups).
+
+    A lead counts in the bucket of the day it was closed; reopening,
+    revaluing or reassigning a closed lead adjusts that same bucket.
+    """
+    __tablename__ = "agent_rollups"
+
+    sales_agent_id = Column(Integer, nullable=False)
+    period = Column(String, nullable=False)  # day or month
+    bucket = Column(Date, nullable=False)  # the day, or the first day of the month
+    won_count = Column(Integer, nullable=False, default=0)
+    won_value = Column(Float, nullable=False, default=0.0)
+    lost_count = Column(Integer, nullable=False, default=0)
+    lost_value = Column(Float, nullable=False, default=0.0)
+
+    __table_args__ = (
+        PrimaryKeyConstraint("sales_agent_id", "period", "bucket"),
+        # Leaderboard: every agent's rows for a range of buckets
+        Index("ix_agent_rollups_period_bucket", "period", "bucket", "sales_agent_id"),
+    )
+
 class LeadFollowup(Base):
     __tablename__ = "lead_followups"
     
@@ -106,10 +275,73 @@ class LeadFollowup(Base):
     status = Column(String, default="scheduled")
     completed = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # The lead's owner and sales agent, copied by triggers (LEAD_FOLLOWUP_DDL)
+    owner_id = Column(Integer)
+    sales_agent_id = Column(Integer)
     
     # Relationships
     lead = relationship("Lead", back_populates="followups")
 
+    __table_args__ = (
+        Index("ix_lead_followups_lead_date", "lead_id", "followup_date"),
+        # /agenda: one user's open followups in date order, as owner or as
+        # sales agent. Open only, so completed history does not grow them.
+        Index("ix_lead_followups_open_owner_date", "owner_id", "followup_date", "id",
+              sqlite_where=text("completed = 0"), postgresql_where=text("completed = false")),
+        Index("ix_lead_followups_open_agent_date", "sales_agent_id", "followup_date", "id",
+              sqlite_where=text("completed = 0"), postgresql_where=text("completed = false")),
+    )
+
+# Keep lead_followups.owner_id / sales_agent_id equal to the lead's, whichever
+# path writes them (ORM, Core bulk updates, merges moving followups)
+_FOLLOWUP_FROM_LEAD = (
+    "UPDATE lead_followups SET owner_id = (SELECT owner_id FROM leads WHERE id = new.lead_id), "
+    "sales_agent_id = (SELECT sales_agent_id FROM leads WHERE id = new.lead_id) WHERE id = new.id; "
+)
+LEAD_FOLLOWUP_DDL = [
+    f"CREATE TRIGGER IF NOT EXISTS lead_followups_lead_ai AFTER INSERT ON lead_followups BEGIN "
+    f"{_FOLLOWUP_FROM_LEAD}END",
+    f"CREATE TRIGGER IF NOT EXISTS lead_followups_lead_au AFTER UPDATE OF lead_id ON lead_followups BEGIN "
+    f"{_FOLLOWUP_FROM_LEAD}END",
+    "CREATE TRIGGER IF NOT EXISTS leads_followups_au AFTER UPDATE OF owner_id, sales_agent_id ON leads BEGIN "
+    "UPDATE lead_followups SET owner_id = new.owner_id, sales_agent_id = new.sales_agent_id "
+    "WHERE lead_id = new.id; END",
+]
+
+for _statement in LEAD_FOLLOWUP_DDL:
+    event.listen(LeadFollowup.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+class LeadActivityColumns:
+    """Append-only lead change log: one row per changed field per update."""
+    id = Column(Integer, primary_key=True)
+    lead_id = Column(Integer, nullable=False)
+    event = Column(String, nullable=False)  # status_changed, field_changed, merged or merged_status_changed
+    field = Column(String, nullable=False)
+    old_value = Column(Text)
+    new_value = Column(Text)
+    changed_by = Column(Integer)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+
+class LeadActivity(LeadActivityColumns, Base):
+    __tablename__ = "lead_activity"
+
+    __table_args__ = (
+        # Newest-first paging per lead, and the archive cutoff scan
+        Index("ix_lead_activity_lead_created", "lead_id", "created_at", "id"),
+        Index("ix_lead_activity_created", "created_at", "id"),
+        # Never reuse an id: archive() copies rows with their ids, and a plain
+        # INTEGER PRIMARY KEY restarts from 1 once the hot table is emptied
+        {"sqlite_autoincrement": True},
+    )
+
+class LeadActivityArchive(LeadActivityColumns, Base):
+    """Rows moved out of lead_activity by ``manage.py archive-activity``, ids kept."""
+    __tablename__ = "lead_activity_archive"
+
+    __table_args__ = (
+        Index("ix_lead_activity_archive_lead_created", "lead_id", "created_at", "id"),
+    )
+
 class Task(Base):
     __tablename__ = "tasks"
     
@@ -127,4 +359,40 @@ class Task(Base):
     related_lead_id = Column(Integer, ForeignKey("leads.id"), nullable=True)
     
     # Relationships
-    assigned_to = relationship("User", back_populates="tasks")
\ No newline at end of file
+    assigned_to = relationship("User", back_populates="tasks")
+
+    __table_args__ = (
+        # Keyset paging order for GET /tasks/, optionally narrowed by one filter
+        Index("ix_tasks_due_date_id", "due_date", "id"),
+        Index("ix_tasks_status_due_date", "status", "due_date", "id"),
+        Index("ix_tasks_assignee_due_date", "assigned_to_id", "due_date", "id"),
+        Index("ix_tasks_priority_due_date", "priority", "due_date", "id"),
+        # Open tasks per lead, for lead scoring
+        Index("ix_tasks_related_lead_status", "related_lead_id", "status"),
+    )
+
+
+class Job(Base):
+    """Outbox row for a post-commit side effect, written in the same
+    transaction as the change that caused it; see jobs.py."""
+    __tablename__ = "jobs"
+
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)  # registered handler name
+    event = Column(String, nullable=False)
+    payload = Column(Text, nullable=False, default="{}")  # JSON
+    status = Column(String, nullable=False, default="pending")  # pending, running, done, dead
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=5)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String)
+    locked_at = Column(DateTime)
+    last_error = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    __table_args__ = (
+        # Claim order for workers, and the lease/retention sweeps
+        Index("ix_jobs_status_run_after", "status", "run_after", "id"),
+        Index("ix_jobs_locked_by", "locked_by"),
+    )
@@ -0,0 +1,106 @@
+# pagination.py
+import base64
+import json
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_, tuple_
+
+# Response header carrying the cursor for the next page
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(sort_value: Any, row_id: int) -> str:
+    """Pack the sort key and id of the last row on a page into an opaque token."""
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    raw = json.dumps([sort_value, row_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def unpack_cursor(cursor: str) -> Tuple[Any, int]:
+    """``(sort_value, row_id)`` from a token, with the sort value as JSON
+    left it; for callers that encode a compound sort key."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(row_id, int) or isinstance(row_id, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, row_id
+
+
+def decode_cursor(cursor: str, datetime_key: bool = True) -> Tuple[Any, int]:
+    sort_value, row_id = unpack_cursor(cursor)
+    if sort_value is None:
+        return None, row_id
+    if datetime_key:
+        try:
+            return datetime.fromisoformat(sort_value), row_id
+        except (ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Anything else would reach the driver as a bind parameter it cannot take
+    if not isinstance(sort_value, (int, float, str)) or isinstance(sort_value, bool):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return sort_value, row_id
+
+
+def _nullable(sort_column) -> bool:
+    # Columns say so; labels and other expressions are assumed to allow NULL
+    return getattr(sort_column, "nullable", True)
+
+
+def keyset_condition(sort_column, id_column, last_value, last_id: int, descending: bool = False):
+    """Filter selecting the rows that come after (last_value, last_id) in
+    ``ORDER BY sort_column, id_column`` (both ASC or both DESC).
+
+    Uses a row-value comparison so SQLite can seek straight into the
+    (sort_column, id) index instead of walking the skipped rows.
+    """
+    if last_value is None:
+        # SQLite sorts NULLs first ascending and last descending
+        if descending:
+            return and_(sort_column.is_(None), id_column < last_id)
+        return or_(sort_column.isnot(None), and_(sort_column.is_(None), id_column > last_id))
+    if descending:
+        before = tuple_(sort_column, id_column) < tuple_(last_value, last_id)
+        # NULL sort keys (a lead whose score is still pending) come after every value
+        return or_(sort_column.is_(None), before) if _nullable(sort_column) else before
+    return tuple_(sort_column, id_column) > tuple_(last_value, last_id)
+
+
+def paginate(query, sort_column, id_column, limit: int, skip: int = 0,
+             cursor: Optional[str] = None, descending: bool = False, datetime_key: bool = True):
+    """Apply keyset paging when a cursor is given, offset paging otherwise.
+
+    Returns ``(rows, next_cursor)``; ``next_cursor`` is None on the last page.
+    Pass ``datetime_key=False`` when ``sort_column`` is not a DateTime.
+    """
+    if descending:
+        query = query.order_by(sort_column.desc(), id_column.desc())
+    else:
+        query = query.order_by(sort_column, id_column)
+
+    rows = None
+    if cursor:
+        last_value, last_id = decode_cursor(cursor, datetime_key)
+        if descending and last_value is not None and _nullable(sort_column):
+            # keyset_condition's OR would cost the index seek: run its halves
+            # in order instead, the NULL sort keys only topping up a short page
+            rows = query.filter(tuple_(sort_column, id_column) < tuple_(last_value, last_id)).limit(limit).all()
+            if len(rows) < limit:
+                rows += query.filter(sort_column.is_(None)).limit(limit - len(rows)).all()
+        else:
+            query = query.filter(keyset_condition(sort_column, id_column, last_value, last_id, descending))
+    elif skip:
+        query = query.offset(skip)
+
+    if rows is None:
+        rows = query.limit(limit).all()
+    next_cursor = None
+    if limit and len(rows) == limit:
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, sort_column.key), getattr(last, id_column.key))
+    return rows, next_cursor
@@ -0,0 +1,220 @@
+# performance.py
+import calendar
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.orm import Session
+
+import activity
+import jobs
+import models
+import schemas
+import stats
+
+# agent_rollups bucket sizes
+ROLLUP_PERIODS = ("day", "month")
+SORT_KEYS = ("won_value", "attainment", "win_rate", "commission", "pipeline_value")
+# Longest range one request may cover, in buckets
+MAX_BUCKETS = 400
+
+
+def check_period(period: str) -> str:
+    if period not in ROLLUP_PERIODS:
+        raise HTTPException(status_code=400, detail=f"period must be one of {', '.join(ROLLUP_PERIODS)}")
+    return period
+
+
+def rollup_bucket(period: str, at: date) -> date:
+    """The agent_rollups bucket holding ``at`` (a date or datetime)."""
+    day = at.date() if isinstance(at, datetime) else at
+    return day if period == "day" else day.replace(day=1)
+
+
+def rollup_deltas(closes: Iterable[list]) -> dict:
+    """Fold stats.close_changes rows into agent_rollups deltas, keyed by
+    (sales_agent_id, period, bucket), each close in the bucket of its own
+    close date: undoing or revaluing a close adjusts the bucket it was
+    booked in, not the one of the later write."""
+    rows = {}
+    for sign, lead_status, agent_id, value, closed_at in closes:
+        prefix = "won" if lead_status == "closed_won" else "lost"
+        closed_on = datetime.fromisoformat(closed_at).date()
+        for period in ROLLUP_PERIODS:
+            bucket = rollup_bucket(period, closed_on)
+            row = rows.setdefault((agent_id, period, bucket), {
+                "sales_agent_id": agent_id, "period": period, "bucket": bucket,
+                "won_count": 0, "won_value": 0.0, "lost_count": 0, "lost_value": 0.0,
+            })
+            row[f"{prefix}_count"] += sign
+            row[f"{prefix}_value"] += sign * value
+    return {key: row for key, row in rows.items() if row["won_count"] or row["won_value"]
+            or row["lost_count"] or row["lost_value"]}
+
+
+def apply_rollup_deltas(db: Session, deltas: dict):
+    """Add rollup_deltas output to agent_rollups inside the caller's transaction."""
+    if not deltas:
+        return
+    table = models.AgentRollup.__table__
+    stmt = stats.insert_for(db)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["sales_agent_id", "period", "bucket"],
+        set_={
+            name: table.c[name] + stmt.excluded[name]
+            for name in ("won_count", "won_value", "lost_count", "lost_value")
+        },
+    )
+    db.execute(stmt, list(deltas.values()))
+
+
+@jobs.subscribe(jobs.LEAD_CLOSES_CHANGED)
+def update_rollups(db: Session, event: str, payload: dict):
+    apply_rollup_deltas(db, rollup_deltas(payload["closes"]))
+
+
+def _bucket_expression(db: Session, period: str, column):
+    if db.get_bind().dialect.name == "postgresql":
+        return func.date_trunc(period, column).cast(models.AgentRollup.bucket.type)
+    return func.date(column) if period == "day" else func.strftime("%Y-%m-01", column)
+
+
+def rebuild_agent_rollups(db: Session):
+    """Recompute agent_rollups from closed leads, dating each close by the
+    status_changed row that closed the lead (created_at for leads created
+    closed), as update_rollups does. The caller commits."""
+    table = models.AgentRollup.__table__
+    lead = models.Lead
+    db.execute(delete(table))
+    won = lead.status == "closed_won"
+    for period in ROLLUP_PERIODS:
+        bucket = _bucket_expression(db, period, activity.status_since(lead))
+        query = select(
+            lead.sales_agent_id,
+            literal(period),
+            bucket,
+            func.count(lead.id).filter(won),
+            func.coalesce(func.sum(lead.value).filter(won), 0.0),
+            func.count(lead.id).filter(~won),
+            func.coalesce(func.sum(lead.value).filter(~won), 0.0),
+        ).where(lead.status.in_(stats.CLOSED_STATUSES), lead.sales_agent_id.isnot(None)).group_by(lead.sales_agent_id, bucket)
+        db.execute(table.insert().from_select(
+            ["sales_agent_id", "period", "bucket", "won_count", "won_value", "lost_count", "lost_value"], query
+        ))
+
+
+def _next_bucket(period: str, bucket: date) -> date:
+    if period == "day":
+        return bucket + timedelta(days=1)
+    return (bucket.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def bucket_range(period: str, start: Optional[date], end: Optional[date]) -> List[date]:
+    """Every bucket from ``start`` to ``end`` inclusive (default: the current one)."""
+    # Buckets are UTC days, like the rollups
+    today = datetime.utcnow().date()
+    first = rollup_bucket(period, start or today)
+    last = rollup_bucket(period, end or start or today)
+    if last < first:
+        raise HTTPException(status_code=400, detail="to must not be before from")
+    buckets = [first]
+    while buckets[-1] < last:
+        if len(buckets) >= MAX_BUCKETS:
+            raise HTTPException(status_code=400, detail=f"Range covers more than {MAX_BUCKETS} {period} buckets")
+        buckets.append(_next_bucket(period, buckets[-1]))
+    return buckets
+
+
+def bucket_quota(period: str, bucket: date, monthly_quota: float) -> float:
+    # quota is monthly; a day gets its share of its month
+    if period == "day":
+        return monthly_quota / calendar.monthrange(bucket.year, bucket.month)[1]
+    return monthly_quota
+
+
+def _figures(won_count: int, won_value: float, lost_count: int, lost_value: float,
+             quota: float, commission_rate: float) -> dict:
+    closed = won_count + lost_count
+    return {
+        "won_count": won_count,
+        "won_value": round(won_value, 2),
+        "lost_count": lost_count,
+        "lost_value": round(lost_value, 2),
+        "win_rate": round(won_count / closed, 4) if closed > 0 else None,
+        "quota": round(quota, 2),
+        "attainment": round(won_value / quota, 4) if quota > 0 else None,
+        "commission": round(won_value * commission_rate, 2),
+    }
+
+
+def pipeline(db: Session, agent_id: Optional[int] = None) -> Dict[int, Tuple[int, float]]:
+    """Open lead count and value per agent, from lead_counters."""
+    counter = models.LeadCounter
+    query = select(counter.dimension_id, func.sum(counter.lead_count), func.sum(counter.total_value)).where(
+        counter.dimension == "sales_agent", counter.status.notin_(stats.CLOSED_STATUSES)
+    ).group_by(counter.dimension_id)
+    if agent_id is not None:
+        query = query.where(counter.dimension_id == agent_id)
+    return {row[0]: (row[1] or 0, row[2] or 0.0) for row in db.execute(query)}
+
+
+def _rollup_sums(db: Session, period: str, buckets: List[date], agent_id: Optional[int] = None, by_bucket=False):
+    rollup = models.AgentRollup
+    keys = [rollup.sales_agent_id] + ([rollup.bucket] if by_bucket else [])
+    query = select(
+        *keys, func.sum(rollup.won_count), func.sum(rollup.won_value),
+        func.sum(rollup.lost_count), func.sum(rollup.lost_value),
+    ).where(rollup.period == period, rollup.bucket >= buckets[0], rollup.bucket <= buckets[-1]).group_by(*keys)
+    if agent_id is not None:
+        query = query.where(rollup.sales_agent_id == agent_id)
+    return db.execute(query).all()
+
+
+def agent_performance(db: Session, agent: models.SalesAgent, period: str,
+                      start: Optional[date] = None, end: Optional[date] = None) -> schemas.AgentPerformance:
+    buckets = bucket_range(period, start, end)
+    quota, rate = agent.quota or 0.0, agent.commission_rate or 0.0
+    sums = {row[1]: row[2:] for row in _rollup_sums(db, period, buckets, agent.id, by_bucket=True)}
+    rows, totals = [], [0, 0.0, 0, 0.0]
+    for bucket in buckets:
+        won_count, won_value, lost_count, lost_value = sums.get(bucket, (0, 0.0, 0, 0.0))
+        rows.append(schemas.AgentPeriodPerformance(
+            bucket=bucket, **_figures(won_count, won_value, lost_count, lost_value, bucket_quota(period, bucket, quota), rate)
+        ))
+        for i, amount in enumerate((won_count, won_value, lost_count, lost_value)):
+            totals[i] += amount
+    total_quota = quota * sum(bucket_quota(period, bucket, 1.0) for bucket in buckets)
+    open_leads, pipeline_value = pipeline(db, agent.id).get(agent.id, (0, 0.0))
+    return schemas.AgentPerformance(
+        sales_agent_id=agent.id, period=period, start=buckets[0], end=buckets[-1],
+        commission_rate=rate, open_leads=open_leads, pipeline_value=round(pipeline_value, 2),
+        totals=schemas.AgentPeriodPerformance(bucket=buckets[0], **_figures(*totals, total_quota, rate)),
+        buckets=rows,
+    )
+
+
+def leaderboard(db: Session, period: str, start: Optional[date] = None, end: Optional[date] = None,
+                sort_by: str = "won_value", limit: int = 10) -> List[schemas.LeaderboardEntry]:
+    """Agents ranked by ``sort_by`` over the range; reads one rollup row per
+    agent and bucket plus lead_counters, never leads."""
+    if sort_by not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {', '.join(SORT_KEYS)}")
+    buckets = bucket_range(period, start, end)
+    sums = {row[0]: row[1:] for row in _rollup_sums(db, period, buckets)}
+    pipelines = pipeline(db)
+    # Monthly quotas covered by the range
+    months = sum(bucket_quota(period, bucket, 1.0) for bucket in buckets)
+    entries = []
+    for agent_id, quota, rate in db.execute(
+        select(models.SalesAgent.id, models.SalesAgent.quota, models.SalesAgent.commission_rate)
+    ):
+        total_quota = (quota or 0.0) * months
+        open_leads, pipeline_value = pipelines.get(agent_id, (0, 0.0))
+        entries.append(dict(
+            sales_agent_id=agent_id, open_leads=open_leads, pipeline_value=round(pipeline_value, 2),
+            **_figures(*sums.get(agent_id, (0, 0.0, 0, 0.0)), total_quota, rate or 0.0),
+        ))
+    # None (no quota / nothing closed) ranks last; ties by agent id
+    entries.sort(key=lambda e: (e[sort_by] is None, -(e[sort_by] or 0), e["sales_agent_id"]))
+    return [schemas.LeaderboardEntry(rank=rank, **entry) for rank, entry in enumerate(entries[:limit], 1)]
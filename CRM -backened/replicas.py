@@ -0,0 +1,90 @@
+# replicas.py
+import itertools
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from fastapi import Request
+from sqlalchemy.engine import make_url
+
+import config
+import models
+
+# Send this header (any value but "0"/"false") to force a read from the primary
+READ_PRIMARY_HEADER = "X-Read-Primary"
+# Set on responses to writes; reads carrying it go to the primary until it expires
+READ_PRIMARY_COOKIE = "crm_read_primary_until"
+
+_WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+_replica_cycle = itertools.cycle(range(len(models.ReplicaSessionLocals)))
+_cycle_lock = threading.Lock()
+
+
+def _endpoint_name(request: Request) -> str:
+    endpoint = request.scope.get("endpoint")
+    return getattr(endpoint, "__name__", "")
+
+
+def wants_primary(request: Request) -> bool:
+    header = request.headers.get(READ_PRIMARY_HEADER)
+    if header is not None and header.lower() not in ("0", "false", "no"):
+        return True
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def replica_index(request: Request) -> Optional[int]:
+    """The replica this request reads from (round-robin) for routes listed in
+    config.REPLICA_ROUTES, or None for the primary, also when the client
+    asked for read-your-writes."""
+    if (
+        not models.ReplicaSessionLocals
+        or _endpoint_name(request) not in config.REPLICA_ROUTES
+        or wants_primary(request)
+    ):
+        return None
+    with _cycle_lock:
+        index = next(_replica_cycle)
+    request.state.read_replica = index
+    return index
+
+
+def session_factory(request: Request):
+    """Session factory for this request, per replica_index."""
+    index = replica_index(request)
+    return models.SessionLocal if index is None else models.ReplicaSessionLocals[index]
+
+
+def read_from_replica(request: Request) -> bool:
+    """Whether this request's session came from a replica (see session_factory)."""
+    return getattr(request.state, "read_replica", None) is not None
+
+
+async def read_your_writes_middleware(request: Request, call_next):
+    response = await call_next(request)
+    if request.method in _WRITE_METHODS and response.status_code < 400:
+        until = time.time() + config.READ_YOUR_WRITES_WINDOW
+        response.set_cookie(
+            READ_PRIMARY_COOKIE, f"{until:.3f}",
+            max_age=max(1, int(config.READ_YOUR_WRITES_WINDOW)), httponly=True, samesite="lax",
+        )
+    return response
+
+
+def sync_sqlite_replicas():
+    """Copy the primary SQLite database over each file-based replica.
+
+    Stands in for real replication when running locally: replicas are
+    consistent snapshots as of the call and lag until the next one.
+    """
+    primary = make_url(config.DATABASE_URL).database
+    with sqlite3.connect(primary) as source:
+        for url in config.READ_REPLICA_URLS:
+            target = sqlite3.connect(make_url(url).database)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
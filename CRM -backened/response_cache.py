@@ -0,0 +1,149 @@
+# response_cache.py
+import hashlib
+from email.utils import formatdate
+from itertools import chain
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from starlette.routing import Match
+from sqlalchemy.orm import Session
+
+import auth
+import cache
+import config
+import models
+import replicas
+
+CACHE_STATUS_HEADER = "X-Cache"
+
+# Tables whose writes change each cached path's response; paths not listed
+# here depend on every table
+ROUTE_TABLES = {
+    # ?expand= pulls in users, sales agents and followups
+    "/leads/": ("leads", "users", "sales_agents", "lead_followups"),
+    "/users/": ("users",),
+    "/sales-agents/": ("sales_agents",),
+    "/dashboard/stats": ("leads", "lead_counters", "users", "tasks"),
+}
+
+# Session.info key collecting the tables written in the open transaction
+_CHANGED = "response_cache_tables"
+# Response headers that are recomputed rather than replayed from the cache
+_VOLATILE_HEADERS = {"content-length", "set-cookie", "etag", "last-modified", "cache-control"}
+
+backend = cache.make_backend()
+
+
+def _changed_tables(db: Session) -> set:
+    return db.info.setdefault(_CHANGED, set())
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(db: Session, flush_context):
+    changed = _changed_tables(db)
+    for obj in chain(db.new, db.dirty, db.deleted):
+        table = getattr(obj, "__table__", None)
+        if table is not None:
+            changed.add(table.name)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(state):
+    # Core INSERT/UPDATE/DELETE run through the session (bulk import, bulk update, counters)
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None:
+            _changed_tables(state.session).add(table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(db: Session):
+    tables = db.info.pop(_CHANGED, None)
+    if tables:
+        backend.bump(tables)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(db: Session):
+    db.info.pop(_CHANGED, None)
+
+
+def validators(request: Request, tables) -> tuple:
+    """``(etag, last_modified)`` for a GET, from the request and table versions alone."""
+    versions = backend.versions(tables)
+    token = ",".join(f"{table}:{version}:{modified:.6f}" for table, (version, modified) in sorted(versions.items()))
+    query = urlencode(sorted(request.query_params.multi_items()))
+    digest = hashlib.sha1(f"{request.url.path}?{query}|{token}".encode()).hexdigest()[:24]
+    return f'W/"{digest}"', max(modified for _, modified in versions.values())
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    # ETag only: If-Modified-Since has whole-second resolution, so a write in
+    # the same second as the client's copy would wrongly revalidate as 304
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    # Weak comparison: W/"x" matches "x"
+    tags = {tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")}
+    return "*" in tags or etag.replace("W/", "", 1) in tags
+
+
+def _match_route(request: Request):
+    """Put the matched route in the scope, as the router would, so responses
+    answered here (hits, 304s) are labelled by route in metrics."""
+    for route in request.app.router.routes:
+        match, child_scope = route.matches(request.scope)
+        if match == Match.FULL:
+            request.scope.update(child_scope)
+            return
+
+
+async def response_cache_middleware(request: Request, call_next):
+    """Serve the GET paths in config.RESPONSE_CACHE_TTLS from the cache.
+
+    ETags derive from the path, query and the versions of the tables the
+    path reads, so a revalidation that ends in 304 and a cache hit both skip
+    the database and serialization entirely.
+    """
+    ttl = config.RESPONSE_CACHE_TTLS.get(request.url.path)
+    if request.method != "GET" or ttl is None:
+        return await call_next(request)
+    _match_route(request)
+    # Cached bodies skip the route's auth dependency; let the route reject the request
+    if config.AUTH_REQUIRED or "authorization" in request.headers:
+        user = await auth.request_user(request)
+        if user is None or not auth.is_staff(user):
+            return await call_next(request)
+
+    tables = ROUTE_TABLES.get(request.url.path, tuple(models.Base.metadata.tables))
+    etag, last_modified = validators(request, tables)
+    cache_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(last_modified, usegmt=True),
+        "Cache-Control": "private, no-cache",
+    }
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=cache_headers)
+
+    key = f"response:{etag}"
+    if "no-cache" not in request.headers.get("cache-control", ""):
+        cached = backend.get(key)
+        if cached is not None:
+            headers, body = cached
+            return Response(body, headers={**headers, **cache_headers, CACHE_STATUS_HEADER: "hit"})
+
+    response = await call_next(request)
+    if response.status_code != 200:
+        return response
+    if replicas.read_from_replica(request):
+        # The replica may lag the table versions behind the ETag: neither
+        # cache the body nor hand out validators for it
+        response.headers[CACHE_STATUS_HEADER] = "replica"
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    if len(body) <= config.CACHE_MAX_BODY_BYTES:
+        headers = {name: value for name, value in response.headers.items() if name not in _VOLATILE_HEADERS}
+        backend.set(key, (headers, body), ttl)
+    headers = {name: value for name, value in response.headers.items() if name != "content-length"}
+    return Response(body, headers={**headers, **cache_headers, CACHE_STATUS_HEADER: "miss"})
@@ -0,0 +1,202 @@
+# routing.py
+import heapq
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+import config
+import models
+import stats
+
+ROUND_ROBIN = "round_robin"
+# Fewest open (not closed) leads
+LEAST_OPEN_LEADS = "least_open_leads"
+# Lowest open pipeline value relative to SalesAgent.quota
+LEAST_PIPELINE = "least_pipeline"
+STRATEGIES = (ROUND_ROBIN, LEAST_OPEN_LEADS, LEAST_PIPELINE)
+# Keep whatever sales_agent_id the client sent
+NONE = "none"
+
+# Session.info key for agents reserved in the open transaction
+_RESERVED = "routing_reserved"
+
+
+class AgentLoadIndex:
+    """In-memory open-lead count and pipeline value per sales agent.
+
+    Loaded from lead_counters (O(agents x statuses) rows) and then kept up to
+    date from the counter deltas of committed writes, so picking an agent
+    never runs a COUNT. Agents picked inside an open transaction are reserved
+    straight away, so a bulk batch spreads out instead of piling onto
+    whoever was least loaded at the start. The whole index is reloaded every
+    CRM_LEAD_ROUTING_REFRESH seconds to pick up writes from other processes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.loaded_at = None
+        self.open_count: Dict[int, int] = {}
+        self.open_value: Dict[int, float] = {}
+        self.quota: Dict[int, float] = {}
+        self.agents: List[int] = []
+        self.teams: Dict[int, List[int]] = {}
+        self._agent_teams: Dict[int, List[int]] = defaultdict(list)
+        # Reservations not yet committed or rolled back, re-added on reload
+        self._pending: Dict[int, List[float]] = defaultdict(lambda: [0, 0.0])
+        self._heaps: Dict[tuple, list] = {}
+        self._next: Dict[Optional[int], int] = defaultdict(int)
+
+    def load(self, db: Session):
+        agents = db.execute(select(models.SalesAgent.id, models.SalesAgent.quota)).all()
+        members = db.execute(select(
+            models.SalesTeamAssignment.head_of_sales_id, models.SalesTeamAssignment.sales_agent_id
+        )).all()
+        counters = db.execute(
+            select(models.LeadCounter.dimension_id, models.LeadCounter.lead_count, models.LeadCounter.total_value)
+            .where(models.LeadCounter.dimension == "sales_agent",
+                   models.LeadCounter.status.notin_(stats.CLOSED_STATUSES))
+        ).all()
+        with self._lock:
+            self.quota = {agent_id: quota or 0.0 for agent_id, quota in agents}
+            self.agents = sorted(self.quota)
+            self.open_count = dict.fromkeys(self.quota, 0)
+            self.open_value = dict.fromkeys(self.quota, 0.0)
+            for agent_id, count, value in counters:
+                if agent_id in self.quota:
+                    self.open_count[agent_id] += count
+                    self.open_value[agent_id] += value
+            for agent_id, (count, value) in self._pending.items():
+                if agent_id in self.quota:
+                    self.open_count[agent_id] += count
+                    self.open_value[agent_id] += value
+            self.teams = defaultdict(list)
+            self._agent_teams = defaultdict(list)
+            for team_id, agent_id in sorted(members):
+                if agent_id in self.quota:
+                    self.teams[team_id].append(agent_id)
+                    self._agent_teams[agent_id].append(team_id)
+            self._heaps = {}
+            self.loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self.loaded_at = None
+
+    def is_stale(self) -> bool:
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > config.LEAD_ROUTING_REFRESH
+
+    def _members(self, team_id: Optional[int]) -> List[int]:
+        if team_id is None:
+            return self.agents
+        return self.teams.get(team_id, [])
+
+    def _key(self, strategy: str, agent_id: int) -> tuple:
+        if strategy == LEAST_PIPELINE:
+            # Agents without a quota are compared on raw open value
+            quota = self.quota[agent_id] or 1.0
+            return (self.open_value[agent_id] / quota, self.open_count[agent_id], agent_id)
+        return (self.open_count[agent_id], self.open_value[agent_id], agent_id)
+
+    def _touch(self, agent_id: int):
+        # Lazy-deletion heaps: push the agent's new key, stale entries are dropped on pick
+        scopes = {None, *self._agent_teams.get(agent_id, ())}
+        for (strategy, team_id), heap in self._heaps.items():
+            if team_id in scopes:
+                heapq.heappush(heap, self._key(strategy, agent_id))
+
+    def _adjust(self, agent_id: int, count: int, value: float):
+        if agent_id not in self.quota:
+            return
+        self.open_count[agent_id] += count
+        self.open_value[agent_id] += value
+        self._touch(agent_id)
+
+    def pick(self, strategy: str, team_id: Optional[int] = None) -> Optional[int]:
+        with self._lock:
+            members = self._members(team_id)
+            if not members:
+                return None
+            if strategy == ROUND_ROBIN:
+                position = self._next[team_id]
+                self._next[team_id] = position + 1
+                return members[position % len(members)]
+
+            heap = self._heaps.get((strategy, team_id))
+            if heap is None:
+                heap = [self._key(strategy, agent_id) for agent_id in members]
+                heapq.heapify(heap)
+                self._heaps[(strategy, team_id)] = heap
+            while heap[0] != self._key(strategy, heap[0][-1]):
+                heapq.heappop(heap)
+            return heap[0][-1]
+
+    def reserve(self, agent_id: int, value: float):
+        with self._lock:
+            pending = self._pending[agent_id]
+            pending[0] += 1
+            pending[1] += value
+            self._adjust(agent_id, 1, value)
+
+    def release(self, agent_id: int, value: float):
+        with self._lock:
+            pending = self._pending[agent_id]
+            pending[0] -= 1
+            pending[1] -= value
+            if not pending[0]:
+                del self._pending[agent_id]
+            self._adjust(agent_id, -1, -value)
+
+    def apply_deltas(self, deltas: dict):
+        """Fold committed stats.counter_deltas output into the index."""
+        with self._lock:
+            for (dimension, agent_id, lead_status), (count, value) in deltas.items():
+                if dimension == "sales_agent" and lead_status not in stats.CLOSED_STATUSES:
+                    self._adjust(agent_id, count, value)
+
+
+load_index = AgentLoadIndex()
+
+
+def check_strategy(strategy: Optional[str]) -> str:
+    strategy = strategy or config.LEAD_ROUTING_STRATEGY
+    if strategy != NONE and strategy not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Unknown routing strategy: {strategy}")
+    return strategy
+
+
+def assign(db: Session, value: Optional[float], strategy: str, team_id: Optional[int] = None) -> Optional[int]:
+    """Pick a sales agent for a new lead and reserve it until ``db`` commits.
+
+    Returns None when routing is off or there is no eligible agent.
+    """
+    if strategy == NONE:
+        return None
+    if load_index.is_stale():
+        load_index.load(db)
+    agent_id = load_index.pick(strategy, team_id)
+    if agent_id is not None:
+        value = value or 0.0
+        load_index.reserve(agent_id, value)
+        db.info.setdefault(_RESERVED, []).append((agent_id, value))
+    return agent_id
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(db: Session):
+    # The committed counter deltas now include every reserved lead that was inserted
+    for agent_id, value in db.info.pop(_RESERVED, ()):
+        load_index.release(agent_id, value)
+    for deltas in db.info.pop(stats.PENDING_DELTAS, ()):
+        load_index.apply_deltas(deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(db: Session):
+    for agent_id, value in db.info.pop(_RESERVED, ()):
+        load_index.release(agent_id, value)
+    db.info.pop(stats.PENDING_DELTAS, None)
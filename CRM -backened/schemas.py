@@ -1,7 +1,7 @@
 # schemas.py
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
 
 # Enums
@@ -51,6 +51,17 @@ class UserResponse(UserBase):
     class Config:
         orm_mode = True
 
+# Auth Schemas
+class LoginRequest(BaseModel):
+    username: str  # username or email
+    password: str
+
+class Token(BaseModel):
+    access_token: str
+    token_type: str = "bearer"
+    expires_in: int  # seconds
+    user: UserResponse
+
 # Lead Schemas
 class LeadBase(BaseModel):
     first_name: str
@@ -84,10 +95,69 @@ class LeadResponse(LeadBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    score: Optional[float] = None  # 0-100, see scoring.py
     
     class Config:
         orm_mode = True
 
+# Bulk Lead Schemas
+class BulkRowError(BaseModel):
+    row: int
+    errors: List[str]
+
+class BulkImportResponse(BaseModel):
+    received: int
+    inserted: int
+    failed: int
+    errors: List[BulkRowError] = []
+    # Rows inserted anyway that may duplicate a lead (CRM_DEDUP_REJECT off)
+    warnings: List[BulkRowError] = []
+
+class LeadBulkFilter(BaseModel):
+    status: Optional[str] = None
+    owner_id: Optional[int] = None
+    sales_agent_id: Optional[int] = None
+
+class LeadBulkUpdate(BaseModel):
+    # Target leads by id, by filter, or both (ids that also match the filter)
+    ids: Optional[List[int]] = None
+    filter: Optional[LeadBulkFilter] = None
+    patch: LeadUpdate
+
+class BulkUpdateResponse(BaseModel):
+    updated: int
+    unmatched_ids: List[int] = []
+
+# Duplicate Lead Schemas
+class DuplicateMatch(BaseModel):
+    lead_id: int
+    score: float  # 0-1, see dedup.score
+    matched_on: List[str]  # blocks shared: email, phone, name
+
+class DuplicateLead(BaseModel):
+    id: int
+    first_name: str
+    last_name: str
+    email: Optional[str] = None
+    phone: Optional[str] = None
+    company: Optional[str] = None
+
+class DuplicateGroup(BaseModel):
+    lead_ids: List[int]  # ascending; the first is the suggested merge primary
+    score: float  # best pairwise score in the group
+    matched_on: List[str]
+    leads: List[DuplicateLead]
+
+class LeadMerge(BaseModel):
+    primary_id: int
+    duplicate_ids: List[int]
+
+class LeadMergeResponse(BaseModel):
+    lead: LeadResponse
+    merged_ids: List[int]
+    followups_moved: int
+    tasks_moved: int
+
 # Task Schemas
 class TaskBase(BaseModel):
     title: str
@@ -109,6 +179,16 @@ class TaskUpdate(BaseModel):
     priority: Optional[str] = None
     assigned_to_id: Optional[int] = None
 
+class TaskBulkFilter(BaseModel):
+    status: Optional[str] = None
+    assigned_to_id: Optional[int] = None
+    priority: Optional[str] = None
+
+class TaskBulkUpdate(BaseModel):
+    ids: Optional[List[int]] = None
+    filter: Optional[TaskBulkFilter] = None
+    patch: TaskUpdate
+
 class TaskResponse(TaskBase):
     id: int
     created_at: datetime
@@ -151,4 +231,108 @@ class LeadFollowupResponse(LeadFollowupBase):
     created_at: datetime
     
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# Sales Agent Performance Schemas
+class AgentPeriodPerformance(BaseModel):
+    bucket: date  # the day, or the first day of the month
+    won_count: int
+    won_value: float
+    lost_count: int
+    lost_value: float
+    win_rate: Optional[float] = None  # won / closed; None when nothing closed
+    quota: float  # the monthly quota, pro-rated for days
+    attainment: Optional[float] = None  # won_value / quota; None without a quota
+    commission: float  # won_value * commission_rate
+
+class AgentPerformance(BaseModel):
+    sales_agent_id: int
+    period: str
+    start: date
+    end: date
+    commission_rate: float
+    open_leads: int
+    pipeline_value: float
+    totals: AgentPeriodPerformance
+    buckets: List[AgentPeriodPerformance]
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    sales_agent_id: int
+    won_count: int
+    won_value: float
+    lost_count: int
+    lost_value: float
+    win_rate: Optional[float] = None
+    quota: float
+    attainment: Optional[float] = None
+    commission: float
+    open_leads: int
+    pipeline_value: float
+
+# Analytics Schemas
+class FunnelStage(BaseModel):
+    stage: str
+    count: int  # leads currently at this stage
+    value: float
+    reached: int  # leads at this stage or a later one
+    conversion_rate: Optional[float] = None  # reached / previous stage's reached
+
+class Funnel(BaseModel):
+    start: date
+    end: date
+    total_leads: int
+    stages: List[FunnelStage]
+    lost_count: int
+    lost_value: float
+    win_rate: Optional[float] = None
+
+class TimeseriesBucket(BaseModel):
+    bucket: date
+    created: int
+    created_value: float
+    won: int
+    won_value: float
+    lost: int
+    lost_value: float
+    pipeline_value: float  # open lead value at the end of the bucket
+
+class Timeseries(BaseModel):
+    period: str
+    start: date
+    end: date
+    buckets: List[TimeseriesBucket]
+
+# Lead Activity Schemas
+class LeadActivityResponse(BaseModel):
+    id: int
+    lead_id: int
+    event: str
+    field: str
+    old_value: Optional[str] = None
+    new_value: Optional[str] = None
+    changed_by: Optional[int] = None
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+# Agenda Schemas
+class AgendaItem(BaseModel):
+    kind: str  # "followup" or "task"
+    id: int
+    due_at: datetime
+    title: str
+    status: Optional[str] = None
+    priority: Optional[str] = None
+    notes: Optional[str] = None
+    lead_id: Optional[int] = None
+
+# Expanded Lead Schemas (GET /leads/?expand=...)
+class SalesAgentExpandedResponse(SalesAgentResponse):
+    user: Optional[UserResponse] = None
+
+class LeadExpandedResponse(LeadResponse):
+    owner: Optional[UserResponse] = None
+    sales_agent: Optional[SalesAgentExpandedResponse] = None
+    followups: Optional[List[LeadFollowupResponse]] = None
@@ -0,0 +1,387 @@
+# scoring.py
+"""Lead scoring: a 0-100 priority per lead, stored in the indexed leads.score.
+
+A scorer turns feature arrays (one element per lead, see FEATURES) into
+scores in a single vectorized call, so scoring a batch of 50k leads costs
+about as much Python as scoring one. The default is a weighted sum of
+pipeline stage, value, source, contact details, followup history and open
+work; CRM_LEAD_SCORER swaps in another, registered with ``@scorer(name)``
+or given as "module:function".
+
+Scores are kept current on every write. New leads are scored from their own
+fields as they are inserted (ORM inserts through the mapper event below,
+Core inserts through score_rows). Leads whose scored fields, followups or
+tasks change in a transaction are collected on the session and published
+as one job when it commits (see touch), so the write does not wait for the
+feature queries and the scores follow once a worker runs it. Parts of the default
+score depend on the clock (lead age, days since the last completed
+followup), so ``python manage.py rescore-leads`` should also run on a
+schedule; it rescores every lead in id-ordered batches and writes only the
+scores that changed.
+"""
+import importlib
+from datetime import datetime
+from itertools import chain
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import and_, bindparam, case, event, extract, func, inspect, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+import analytics
+import config
+import jobs
+import models
+import stats
+
+# Feature arrays handed to a scorer, all of one length:
+#   status               analytics.STATUS_CODES code, -1 for anything else
+#   value                lead value, 0 when unset
+#   source               index into SOURCES, -1 for anything else
+#   contact              email, phone, company and job title on file (0-4)
+#   age_days             days since the lead was created
+#   followups            followups on record
+#   followups_completed  completed followups
+#   days_since_followup  days since the latest completed followup, inf if none
+#   upcoming_followups   open followups due from now on
+#   open_tasks           pending or in-progress tasks for the lead
+FEATURES = (
+    "status", "value", "source", "contact", "age_days", "followups", "followups_completed",
+    "days_since_followup", "upcoming_followups", "open_tasks",
+)
+SOURCES = ("referral", "event", "website", "social_media", "cold_call", "other")
+CONTACT_FIELDS = ("email", "phone", "company", "job_title")
+# Lead fields the score reads; changing one of them rescores the lead
+LEAD_FIELDS = ("status", "value", "source", "created_at") + CONTACT_FIELDS
+# Task fields the score reads (besides which lead the task is for)
+TASK_FIELDS = ("status",)
+
+# Default scorer weights; they sum to 1 and the score is 100 x the weighted sum
+WEIGHTS = {
+    "stage": 0.25, "value": 0.25, "source": 0.10, "contact": 0.10,
+    "engagement": 0.10, "recency": 0.10, "planned": 0.05, "fresh": 0.05,
+}
+# Open stages; closed leads (won or lost) need no attention and score 0
+STAGE_WEIGHTS = {"new": 0.2, "contacted": 0.4, "qualified": 0.6, "proposal": 0.8, "negotiation": 0.9}
+SOURCE_WEIGHTS = {"referral": 1.0, "event": 0.8, "website": 0.6, "social_media": 0.5, "cold_call": 0.3}
+# Unknown statuses count as new; other and missing sources get this weight
+UNKNOWN_STAGE_WEIGHT = 0.2
+OTHER_SOURCE_WEIGHT = 0.4
+# Value scores on a log scale, maxed out from VALUE_SCALE up
+VALUE_SCALE = 100_000.0
+# Days over which recency and freshness fall to 1/e
+RECENCY_DAYS = 14.0
+FRESH_DAYS = 90.0
+# Completed followups for engagement to reach 1 - 1/e
+ENGAGEMENT_FOLLOWUPS = 3.0
+
+# Stored precision. Finer steps would mostly record the clock-driven drift
+# of every open lead, turning each scheduled rescore into a full rewrite
+SCORE_DECIMALS = 1
+# Leads per IN list when rescoring by id
+IN_CHUNK_SIZE = 1000
+# Stand-in for "no completed followup" in the fetched arrays, which cannot hold NULL
+_NO_FOLLOWUP = -1e9
+# Session.info key: ids of leads to rescore before the open transaction commits
+_PENDING = "leads_to_rescore"
+# (dialect, by id range) -> feature queries, see _statements
+_STATEMENTS: Dict[tuple, tuple] = {}
+
+STATUS_CODES = analytics.STATUS_CODES
+SOURCE_CODES = {source: code for code, source in enumerate(SOURCES)}
+_CLOSED_CODES = [STATUS_CODES[status] for status in stats.CLOSED_STATUSES]
+# Indexed by code; the extra last element is what code -1 picks up
+_STAGE_LOOKUP = np.array([STAGE_WEIGHTS.get(status, 0.0) for status in STATUS_CODES] + [UNKNOWN_STAGE_WEIGHT])
+_SOURCE_LOOKUP = np.array([SOURCE_WEIGHTS.get(source, OTHER_SOURCE_WEIGHT) for source in SOURCES]
+                          + [OTHER_SOURCE_WEIGHT])
+
+# name -> callable(features) -> array of 0-100 scores
+SCORERS: Dict[str, Callable[[Dict[str, np.ndarray]], np.ndarray]] = {}
+
+
+def scorer(name: str):
+    """Register ``fn(features) -> scores`` under ``name`` for CRM_LEAD_SCORER.
+
+    ``features`` maps each of FEATURES to a NumPy array; the scorer returns
+    one score per element, 0-100 (values outside are clipped). Switching
+    scorers leaves stored scores as they were until ``manage.py rescore-leads``.
+    """
+    def register(fn: Callable) -> Callable:
+        SCORERS[name] = fn
+        return fn
+    return register
+
+
+def get_scorer(name: Optional[str] = None) -> Callable:
+    name = name or config.LEAD_SCORER
+    if name not in SCORERS and ":" in name:
+        module, _, attr = name.partition(":")
+        SCORERS[name] = getattr(importlib.import_module(module), attr)
+    try:
+        return SCORERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown lead scorer: {name}") from None
+
+
+@scorer("default")
+def default_scorer(features: Dict[str, np.ndarray]) -> np.ndarray:
+    status = features["status"]
+    parts = {
+        "stage": _STAGE_LOOKUP[status],
+        "value": np.clip(np.log1p(np.maximum(features["value"], 0.0)) / np.log1p(VALUE_SCALE), 0.0, 1.0),
+        "source": _SOURCE_LOOKUP[features["source"]],
+        "contact": features["contact"] / len(CONTACT_FIELDS),
+        "engagement": 1.0 - np.exp(-features["followups_completed"] / ENGAGEMENT_FOLLOWUPS),
+        "recency": np.exp(-features["days_since_followup"] / RECENCY_DAYS),
+        "planned": (features["upcoming_followups"] + features["open_tasks"] > 0).astype(np.float64),
+        "fresh": np.exp(-np.maximum(features["age_days"], 0.0) / FRESH_DAYS),
+    }
+    total = sum(WEIGHTS[name] * part for name, part in parts.items())
+    return np.where(np.isin(status, _CLOSED_CODES), 0.0, 100.0 * total)
+
+
+def compute(features: Dict[str, np.ndarray]) -> np.ndarray:
+    """Scores from the configured scorer, clipped to 0-100 and rounded to SCORE_DECIMALS."""
+    scores = np.asarray(get_scorer()(features), dtype=np.float64)
+    return np.round(np.clip(scores, 0.0, 100.0), SCORE_DECIMALS)
+
+
+def _epoch_days(dialect: str, column):
+    """Fractional days since 1970-01-01 UTC, computed by the database."""
+    if dialect == "postgresql":
+        return extract("epoch", column) / 86400.0
+    return func.julianday(column) - 2440587.5
+
+
+def _day_number(at: datetime) -> float:
+    return (at - datetime(1970, 1, 1)).total_seconds() / 86400
+
+
+def score_rows(rows: Iterable[Mapping], now: Optional[datetime] = None) -> np.ndarray:
+    """Scores for leads that are not in the database yet (so have no
+    followups or tasks), given as mappings with LEAD_FIELDS; created_at may
+    be missing or None, meaning now."""
+    rows = list(rows)
+    now = now or datetime.utcnow()
+    count = len(rows)
+    features = {
+        "status": np.array([STATUS_CODES.get(row["status"], -1) for row in rows], dtype=np.int64),
+        "value": np.array([row["value"] or 0.0 for row in rows], dtype=np.float64),
+        "source": np.array([SOURCE_CODES.get((row["source"] or "").lower(), -1) for row in rows], dtype=np.int64),
+        "contact": np.array([sum(bool(row[field]) for field in CONTACT_FIELDS) for row in rows], dtype=np.int64),
+        "age_days": np.array([(now - (row.get("created_at") or now)).total_seconds() / 86400 for row in rows]),
+        "days_since_followup": np.full(count, np.inf),
+    }
+    for name in ("followups", "followups_completed", "upcoming_followups", "open_tasks"):
+        features[name] = np.zeros(count, dtype=np.int64)
+    return compute(features)
+
+
+def _fetch(db: Session, query, params: dict, width: int) -> np.ndarray:
+    # Core execution flattened into a float buffer, as in analytics.load_columns
+    rows = db.connection().execute(query, params).all()
+    return np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=len(rows) * width).reshape(-1, width)
+
+
+def _align(ids: np.ndarray, table: np.ndarray, columns: int) -> List[np.ndarray]:
+    """Spread per-lead aggregate rows (lead id first) onto ``ids``; leads
+    without a row get 0."""
+    out = [np.zeros(len(ids)) for _ in range(columns)]
+    if not len(table) or not len(ids):
+        return out
+    positions = np.minimum(np.searchsorted(ids, table[:, 0]), len(ids) - 1)
+    found = ids[positions] == table[:, 0]
+    for n in range(columns):
+        out[n][positions[found]] = table[found, n + 1]
+    return out
+
+
+def _statements(dialect: str, by_range: bool) -> tuple:
+    """The three feature queries, built once per dialect and mode; the ids,
+    clock and batch limit are bound at execution."""
+    key = (dialect, by_range)
+    if key in _STATEMENTS:
+        return _STATEMENTS[key]
+    lead, followup, task = models.Lead, models.LeadFollowup, models.Task
+    # By range: leads after an id, and the followups/tasks of the id range they cover
+    if by_range:
+        lead_filter = lead.id > bindparam("after")
+    else:
+        lead_filter = lead.id.in_(bindparam("ids", expanding=True))
+
+    def related(column):
+        if by_range:
+            return column.between(bindparam("first"), bindparam("last"))
+        return column.in_(bindparam("ids", expanding=True))
+
+    on_file = [case((func.coalesce(getattr(lead, field), "") != "", 1), else_=0) for field in CONTACT_FIELDS]
+    leads = select(
+        lead.id,
+        func.coalesce(lead.score, -1.0),
+        case(*[(lead.status == name, code) for name, code in STATUS_CODES.items()], else_=-1),
+        func.coalesce(lead.value, 0.0),
+        case(*[(func.lower(lead.source) == name, code) for name, code in SOURCE_CODES.items()], else_=-1),
+        on_file[0] + on_file[1] + on_file[2] + on_file[3],
+        func.coalesce(_epoch_days(dialect, lead.created_at), bindparam("now_days")),
+    ).where(lead_filter).order_by(lead.id)
+    if by_range:
+        leads = leads.limit(bindparam("limit"))
+    done = followup.completed.is_(True)
+    followups = select(
+        followup.lead_id,
+        func.count(),
+        func.sum(case((done, 1), else_=0)),
+        func.coalesce(func.max(case((done, _epoch_days(dialect, followup.followup_date)))), _NO_FOLLOWUP),
+        func.sum(case((and_(~done, followup.followup_date >= bindparam("now")), 1), else_=0)),
+    ).where(related(followup.lead_id)).group_by(followup.lead_id)
+    tasks = select(task.related_lead_id, func.count()).where(
+        related(task.related_lead_id), task.status.in_(stats.ACTIVE_TASK_STATUSES)
+    ).group_by(task.related_lead_id)
+    _STATEMENTS[key] = (leads, followups, tasks)
+    return _STATEMENTS[key]
+
+
+def _score_batch(db: Session, now: datetime, ids: Optional[List[int]] = None, after: int = 0,
+                 limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """(ids, new scores, stored scores) of the leads in ``ids``, or else of
+    the first ``limit`` leads after id ``after``, in id order. Followup and
+    task aggregates are one grouped query each (by id list, or over the id
+    range of the batch), served by their lead_id indexes."""
+    by_range = ids is None
+    leads_query, followups_query, tasks_query = _statements(db.get_bind().dialect.name, by_range)
+    now_days = _day_number(now)
+    params = {"after": after, "limit": limit} if by_range else {"ids": ids}
+    leads = _fetch(db, leads_query, dict(params, now_days=now_days), 7)
+    lead_ids = leads[:, 0].astype(np.int64)
+    if not len(lead_ids):
+        return lead_ids, np.empty(0), np.empty(0)
+    if by_range:
+        params = {"first": int(lead_ids[0]), "last": int(lead_ids[-1])}
+    followups = _fetch(db, followups_query, dict(params, now=now), 5)
+    tasks = _fetch(db, tasks_query, params, 2)
+
+    count, completed, last_done, upcoming = _align(lead_ids, followups, 4)
+    (open_tasks,) = _align(lead_ids, tasks, 1)
+    last_done[count == 0] = _NO_FOLLOWUP
+    features = {
+        "status": leads[:, 2].astype(np.int64),
+        "value": leads[:, 3],
+        "source": leads[:, 4].astype(np.int64),
+        "contact": leads[:, 5].astype(np.int64),
+        "age_days": now_days - leads[:, 6],
+        "followups": count.astype(np.int64),
+        "followups_completed": completed.astype(np.int64),
+        "days_since_followup": np.where(last_done <= _NO_FOLLOWUP, np.inf, np.maximum(now_days - last_done, 0.0)),
+        "upcoming_followups": upcoming.astype(np.int64),
+        "open_tasks": open_tasks.astype(np.int64),
+    }
+    return lead_ids, compute(features), leads[:, 1]
+
+
+def _write_scores(db: Session, ids: np.ndarray, scores: np.ndarray):
+    if not len(ids):
+        return
+    table = models.Lead.__table__
+    stmt = update(table).where(table.c.id == bindparam("lead_id")).values(
+        # A derived column, not a lead change: keep updated_at (closes are dated by it) as it was
+        score=bindparam("new_score"), updated_at=table.c.updated_at,
+    )
+    db.execute(stmt, [{"lead_id": lead_id, "new_score": score} for lead_id, score in zip(ids.tolist(), scores.tolist())])
+
+
+def rescore(db: Session, lead_ids: Iterable[int], now: Optional[datetime] = None) -> int:
+    """Rescore ``lead_ids`` in the caller's transaction. Returns scores changed.
+
+    Leads of the session's identity map get the new score too, so objects
+    already loaded (and responses built from them) are not stale.
+    """
+    lead_ids = sorted({lead_id for lead_id in lead_ids if lead_id is not None})
+    now = now or datetime.utcnow()
+    changed = 0
+    for start in range(0, len(lead_ids), IN_CHUNK_SIZE):
+        ids, scores, stored = _score_batch(db, now, ids=lead_ids[start:start + IN_CHUNK_SIZE])
+        mask = scores != stored
+        _write_scores(db, ids[mask], scores[mask])
+        changed += int(mask.sum())
+        for lead_id, score in zip(ids[mask].tolist(), scores[mask].tolist()):
+            loaded = db.identity_map.get(identity_key(models.Lead, lead_id))
+            if loaded is not None:
+                set_committed_value(loaded, "score", score)
+    return changed
+
+
+def rescore_all(db: Session, batch_size: Optional[int] = None,
+                now: Optional[datetime] = None) -> Tuple[int, int]:
+    """Rescore every lead in id order, one transaction per batch.
+    Returns (leads scored, scores changed)."""
+    batch_size = batch_size or config.LEAD_SCORE_BATCH_SIZE
+    now = now or datetime.utcnow()
+    scored, changed, last_id = 0, 0, 0
+    while True:
+        ids, scores, stored = _score_batch(db, now, after=last_id, limit=batch_size)
+        if not len(ids):
+            return scored, changed
+        mask = scores != stored
+        _write_scores(db, ids[mask], scores[mask])
+        db.commit()
+        scored += len(ids)
+        changed += int(mask.sum())
+        last_id = int(ids[-1])
+
+
+def touch(db: Session, lead_ids: Iterable[Optional[int]]):
+    """Rescore ``lead_ids`` once ``db`` commits; for changes made with Core
+    statements, which the session cannot see."""
+    db.info.setdefault(_PENDING, set()).update(lead_id for lead_id in lead_ids if lead_id is not None)
+
+
+@jobs.subscribe(jobs.LEAD_SCORES_STALE)
+def rescore_leads(db: Session, event: str, payload: dict):
+    rescore(db, payload["lead_ids"])
+
+
+@event.listens_for(models.Lead, "before_insert")
+def _score_new_lead(mapper, connection, target):
+    target.score = float(score_rows([{field: getattr(target, field) for field in LEAD_FIELDS}])[0])
+
+
+def _changed(target, fields: Iterable[str]) -> bool:
+    state = inspect(target)
+    return any(state.attrs[field].history.has_changes() for field in fields)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(db: Session, flush_context):
+    # new / dirty / deleted still hold what this flush wrote
+    lead_ids = set()
+    dirty = db.dirty
+    for target in chain(db.new, dirty, db.deleted):
+        if isinstance(target, models.Lead):
+            # New leads were scored on insert; deleted ones need no score
+            if target in dirty and _changed(target, LEAD_FIELDS):
+                lead_ids.add(target.id)
+        elif isinstance(target, models.LeadFollowup):
+            lead_ids.add(target.lead_id)
+        elif isinstance(target, models.Task):
+            if target in dirty and not _changed(target, TASK_FIELDS + ("related_lead_id",)):
+                continue
+            lead_ids.add(target.related_lead_id)
+            lead_ids.update(inspect(target).attrs.related_lead_id.history.deleted or ())
+    if lead_ids:
+        touch(db, lead_ids)
+
+
+@event.listens_for(Session, "before_commit")
+def _publish_pending(db: Session):
+    # Flush first so after_flush has collected everything this transaction touched
+    db.flush()
+    pending = sorted(db.info.pop(_PENDING, ()))
+    for start in range(0, len(pending), IN_CHUNK_SIZE):
+        jobs.publish(db, jobs.LEAD_SCORES_STALE, {"lead_ids": pending[start:start + IN_CHUNK_SIZE]})
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(db: Session):
+    db.info.pop(_PENDING, None)
@@ -0,0 +1,67 @@
+# search.py
+import re
+from typing import List, Optional, Tuple
+
+from sqlalchemy import Integer, column, func, literal_column, table, text
+from sqlalchemy.orm import Session
+
+import models
+import pagination
+
+leads_fts = table("leads_fts", column("rowid", Integer))
+
+# Column weights for bm25, in LEAD_SEARCH_COLUMNS order: names and email
+# matter more than a word buried in the notes
+BM25_WEIGHTS = {"first_name": 5.0, "last_name": 5.0, "email": 4.0, "company": 3.0, "job_title": 2.0, "notes": 1.0}
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def match_expression(q: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 query: every word must match as a prefix.
+
+    Quoting each token keeps user input from being parsed as FTS5 syntax.
+    """
+    tokens = _TOKEN.findall(q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def rank_expression():
+    """bm25 score (lower is better) with the column weights above."""
+    weights = [BM25_WEIGHTS[c] for c in models.LEAD_SEARCH_COLUMNS]
+    return func.bm25(literal_column("leads_fts"), *weights)
+
+
+def search_leads(db: Session, q: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[models.Lead], Optional[str]]:
+    """Leads matching ``q`` ordered by bm25 relevance (best first), keyset paged
+    on (rank, id). Returns ``(leads, next_cursor)``."""
+    match = match_expression(q)
+    if match is None:
+        return [], None
+
+    rank = rank_expression()
+    query = (
+        db.query(models.Lead, rank)
+        .join(leads_fts, leads_fts.c.rowid == models.Lead.id)
+        .filter(text("leads_fts MATCH :match")).params(match=match)
+    )
+    if cursor:
+        last_rank, last_id = pagination.decode_cursor(cursor, datetime_key=False)
+        query = query.filter(pagination.keyset_condition(rank, models.Lead.id, last_rank, last_id))
+    rows = query.order_by(rank, models.Lead.id).limit(limit).all()
+
+    next_cursor = None
+    if limit and len(rows) == limit:
+        last_lead, last_rank = rows[-1]
+        next_cursor = pagination.encode_cursor(last_rank, last_lead.id)
+    return [lead for lead, _ in rows], next_cursor
+
+
+def rebuild_index(db: Session):
+    """Create the FTS table and triggers if missing, then reindex every lead. The caller commits."""
+    for statement in models.LEAD_SEARCH_DDL:
+        db.execute(text(statement))
+    db.execute(text("INSERT INTO leads_fts(leads_fts) VALUES ('rebuild')"))
+    db.execute(text("INSERT INTO leads_fts(leads_fts) VALUES ('optimize')"))
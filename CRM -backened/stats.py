@@ -0,0 +1,266 @@
+# stats.py
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import activity
+import config
+import jobs
+import models
+from cache import TTLCache
+
+CLOSED_STATUSES = ("closed_won", "closed_lost")
+ACTIVE_TASK_STATUSES = ("pending", "in_progress")
+
+# lead_counters dimensions and the Lead column each one groups by
+DIMENSIONS = {
+    "all": None,
+    "sales_agent": models.Lead.sales_agent_id,
+    "owner": models.Lead.owner_id,
+}
+
+# Session.info key collecting the deltas written in the open transaction; the
+# routing load index consumes them once the transaction commits
+PENDING_DELTAS = "lead_counter_deltas"
+
+_dashboard_cache = TTLCache(ttl=config.DASHBOARD_STATS_TTL)
+
+
+class LeadSnapshot(NamedTuple):
+    status: Optional[str]
+    sales_agent_id: Optional[int]
+    owner_id: Optional[int]
+    value: float
+    # When a closed lead was closed; agent_rollups buckets it by this
+    closed_at: Optional[datetime] = None
+
+
+def lead_snapshot(lead: models.Lead) -> LeadSnapshot:
+    """The fields of a lead that feed lead_counters; take one before and after a write."""
+    return LeadSnapshot(lead.status, lead.sales_agent_id, lead.owner_id, lead.value or 0.0)
+
+
+def lead_snapshots(db: Session, leads: Iterable) -> Dict[int, LeadSnapshot]:
+    """Snapshots of ``leads`` (Lead objects or rows with the same columns) by
+    id, the closed ones dated from lead_activity. Take them before the write
+    touches the leads or their activity."""
+    snapshots = {lead.id: lead_snapshot(lead) for lead in leads}
+    closed = {lead_id: snapshot.status for lead_id, snapshot in snapshots.items()
+              if snapshot.status in CLOSED_STATUSES}
+    for lead_id, closed_at in activity.close_dates(db, closed).items():
+        snapshots[lead_id] = snapshots[lead_id]._replace(closed_at=closed_at)
+    return snapshots
+
+
+def counter_deltas(changes: Iterable[Tuple[Optional[LeadSnapshot], Optional[LeadSnapshot]]]) -> dict:
+    """Fold (before, after) snapshot pairs into per-row count/value deltas.
+
+    ``before`` is None for an insert, ``after`` is None for a delete.
+    """
+    deltas = defaultdict(lambda: [0, 0.0])
+    for before, after in changes:
+        for snapshot, sign in ((before, -1), (after, 1)):
+            if snapshot is None:
+                continue
+            # NULL is not allowed in the primary key: unassigned -> 0, no status -> ""
+            lead_status = snapshot.status or ""
+            for key in (
+                ("all", 0, lead_status),
+                ("sales_agent", snapshot.sales_agent_id or 0, lead_status),
+                ("owner", snapshot.owner_id or 0, lead_status),
+            ):
+                deltas[key][0] += sign
+                deltas[key][1] += sign * (snapshot.value or 0.0)
+    return {key: delta for key, delta in deltas.items() if delta[0] or delta[1]}
+
+
+def _dated(before: Optional[LeadSnapshot], after: Optional[LeadSnapshot], at: datetime) -> Optional[LeadSnapshot]:
+    # A lead closed by this write is closed at ``at``; one that stays closed keeps its date
+    if after is None or after.status not in CLOSED_STATUSES:
+        return after
+    if before is not None and before.status == after.status:
+        return after._replace(closed_at=before.closed_at or at)
+    return after._replace(closed_at=at)
+
+
+def close_changes(changes: Iterable[Tuple[Optional[LeadSnapshot], Optional[LeadSnapshot]]],
+                  at: datetime) -> List[list]:
+    """``[sign, status, sales_agent_id, value, closed_at]`` for each closed
+    snapshot among the pairs, -1 for the before side and 1 for the after
+    side; what agent_rollups folds in (see performance.update_rollups).
+    Undated snapshots count as closed at ``at``."""
+    rows = []
+    for before, after in changes:
+        for snapshot, sign in ((before, -1), (after, 1)):
+            if snapshot is None or snapshot.status not in CLOSED_STATUSES or not snapshot.sales_agent_id:
+                continue
+            closed_at = snapshot.closed_at or at
+            rows.append([sign, snapshot.status, snapshot.sales_agent_id, snapshot.value or 0.0, closed_at.isoformat()])
+    return rows
+
+
+def insert_for(db: Session):
+    """The dialect's INSERT construct, for ON CONFLICT upserts."""
+    dialect = db.get_bind().dialect.name
+    return postgresql.insert if dialect == "postgresql" else sqlite.insert
+
+
+def record_lead_changes(db: Session, changes: Iterable[Tuple[Optional[LeadSnapshot], Optional[LeadSnapshot]]],
+                        at: Optional[datetime] = None):
+    """Apply (before, after) snapshot pairs to lead_counters inside the
+    caller's transaction and queue their agent_rollups update with it. Leads
+    it closes are dated ``at`` (default now); pass the time of its activity rows.
+
+    lead_counters commits with the write, so dashboard stats and the routing
+    load index never lag it; agent_rollups is updated when a worker runs the
+    job (performance.update_rollups).
+    """
+    at = at or datetime.utcnow()
+    dated = ((before, _dated(before, after, at)) for before, after in changes)
+    changes = [(before, after) for before, after in dated if before != after]
+    deltas = counter_deltas(changes)
+    if deltas:
+        upsert_counters(db, deltas)
+        db.info.setdefault(PENDING_DELTAS, []).append(deltas)
+    closes = close_changes(changes, at)
+    if closes:
+        jobs.publish(db, jobs.LEAD_CLOSES_CHANGED, {"closes": closes})
+
+
+def record_lead_change(db: Session, before: Optional[LeadSnapshot], after: Optional[LeadSnapshot],
+                       at: Optional[datetime] = None):
+    record_lead_changes(db, [(before, after)], at)
+
+
+def upsert_counters(db: Session, deltas: dict):
+    """Add deltas to lead_counters inside the caller's transaction."""
+    table = models.LeadCounter.__table__
+    stmt = insert_for(db)(table)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["dimension", "dimension_id", "status"],
+        set_={
+            "lead_count": table.c.lead_count + stmt.excluded.lead_count,
+            "total_value": table.c.total_value + stmt.excluded.total_value,
+        },
+    )
+    db.execute(stmt, [
+        {
+            "dimension": dimension,
+            "dimension_id": dimension_id,
+            "status": lead_status,
+            "lead_count": count,
+            "total_value": value,
+        }
+        for (dimension, dimension_id, lead_status), (count, value) in deltas.items()
+    ])
+
+
+def _live_aggregate_selects():
+    """(dimension, select) pairs computing lead_counters rows from leads."""
+    selects = []
+    for dimension, column in DIMENSIONS.items():
+        lead_status = func.coalesce(models.Lead.status, "")
+        if column is None:
+            dimension_id, group_by = literal(0), [lead_status]
+        else:
+            dimension_id = func.coalesce(column, 0)
+            group_by = [dimension_id, lead_status]
+        selects.append((dimension, select(
+            literal(dimension),
+            dimension_id,
+            lead_status,
+            func.count(models.Lead.id),
+            func.coalesce(func.sum(models.Lead.value), 0.0),
+        ).group_by(*group_by)))
+    return selects
+
+
+def rebuild_lead_counters(db: Session):
+    """Recompute lead_counters from scratch. The caller commits."""
+    table = models.LeadCounter.__table__
+    db.execute(delete(table))
+    for _, query in _live_aggregate_selects():
+        db.execute(table.insert().from_select(
+            ["dimension", "dimension_id", "status", "lead_count", "total_value"], query
+        ))
+
+
+def check_lead_counters(db: Session, tolerance: float = 0.01) -> list:
+    """Diff lead_counters against a live aggregate over leads.
+
+    Returns ``(dimension, dimension_id, status, stored, live)`` tuples for every
+    row that disagrees, where stored/live are ``(count, value)``; empty when consistent.
+    """
+    live = {}
+    for _, query in _live_aggregate_selects():
+        for dimension, dimension_id, lead_status, count, value in db.execute(query):
+            live[(dimension, dimension_id, lead_status)] = (count, value)
+
+    stored = {}
+    for row in db.query(models.LeadCounter):
+        if row.lead_count or abs(row.total_value) > tolerance:
+            stored[(row.dimension, row.dimension_id, row.status)] = (row.lead_count, row.total_value)
+
+    mismatches = []
+    for key in sorted(set(live) | set(stored), key=str):
+        stored_row = stored.get(key, (0, 0.0))
+        live_row = live.get(key, (0, 0.0))
+        if stored_row[0] != live_row[0] or abs(stored_row[1] - live_row[1]) > tolerance:
+            mismatches.append(key + (stored_row, live_row))
+    return mismatches
+
+
+def compute_dashboard_stats(db: Session) -> dict:
+    # O(#statuses) rows from the materialized counters instead of scanning leads
+    leads_by_status = {}
+    value_by_status = {}
+    rows = db.query(models.LeadCounter).filter(
+        models.LeadCounter.dimension == "all", models.LeadCounter.lead_count > 0
+    )
+    for row in rows:
+        lead_status = row.status or None
+        leads_by_status[lead_status] = row.lead_count
+        value_by_status[lead_status] = round(row.total_value, 2)
+
+    # Users and active tasks in a single round trip
+    total_users, active_tasks = db.execute(select(
+        select(func.count(models.User.id)).scalar_subquery(),
+        select(func.count(models.Task.id))
+        .where(models.Task.status.in_(ACTIVE_TASK_STATUSES)).scalar_subquery(),
+    )).one()
+
+    return build_stats(leads_by_status, value_by_status, total_users, active_tasks)
+
+
+def build_stats(leads_by_status: dict, value_by_status: dict, total_users: int, active_tasks: int) -> dict:
+    total_leads = sum(leads_by_status.values())
+    closed_won = leads_by_status.get("closed_won", 0)
+    conversion_rate = round((closed_won / total_leads * 100) if total_leads > 0 else 0, 2)
+    pipeline_value = sum(v for s, v in value_by_status.items() if s not in CLOSED_STATUSES)
+
+    return {
+        "total_leads": total_leads,
+        "new_leads": leads_by_status.get("new", 0),
+        "total_users": total_users,
+        "active_tasks": active_tasks,
+        "lead_conversion_rate": conversion_rate,
+        "leads_by_status": leads_by_status,
+        "value_by_status": value_by_status,
+        "pipeline_value": round(pipeline_value, 2),
+        "won_value": value_by_status.get("closed_won", 0.0),
+    }
+
+
+def get_dashboard_stats(db: Session, cache: bool = True) -> dict:
+    """Cached dashboard stats; computed from ``db`` on a miss, and only
+    stored when ``cache`` (false for a possibly lagging replica session)."""
+    return _dashboard_cache.get_or_compute("dashboard", lambda: compute_dashboard_stats(db), store=cache)
+
+
+def invalidate_dashboard_stats():
+    """Call after committing any lead, task or user write."""
+    _dashboard_cache.invalidate()
@@ -0,0 +1,17 @@
+# tests/conftest.py
+"""Run with ``python -m pytest tests`` from the backend directory.
+
+Each test module seeds its own SQLite database under pytest's tmp_path;
+the app's default engine points at a scratch file so no test touches
+crm.db, and the job workers are never started.
+"""
+import os
+import sys
+import tempfile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+# Read by config.py on import, so set before any test imports the app
+os.environ["CRM_DATABASE_URL"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "crm.db")
+os.environ["CRM_AUTH_REQUIRED"] = "false"
+os.environ["CRM_JOBS_WORKERS"] = "0"
@@ -0,0 +1,27 @@
+# tests/jobs_worker.py
+"""Worker process for test_jobs.py, importable as ``jobs_worker`` both
+there and in the subprocess it starts, so the handler name matches."""
+import time
+
+from sqlalchemy import text
+from sqlalchemy.orm import sessionmaker
+
+import jobs
+import models
+
+EVENT = "test.effect"
+
+
+@jobs.subscribe(EVENT)
+def record_effect(db, event, payload):
+    db.execute(text("INSERT INTO job_effects (n) VALUES (:n)"), {"n": payload["n"]})
+    # Slow enough that a kill lands inside a batch
+    time.sleep(0.01)
+
+
+def run(url):
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=models.make_engine(url))
+    queue = jobs.JobQueue(session_factory=session_factory, workers=1, batch_size=25, poll_interval=0.05)
+    queue.start()
+    while queue.running:
+        time.sleep(0.1)
@@ -0,0 +1,68 @@
+# tests/test_activity.py
+"""archive() keeps working after it empties lead_activity: ids handed out
+later never collide with the archived ones."""
+from datetime import datetime
+
+from sqlalchemy import create_engine, func, insert, select, text
+
+import activity
+import models
+from benchmarks import seed
+from test_migrations import upgrade
+
+
+def record_change(db, lead_id, at):
+    activity.record(db, activity.change_rows(lead_id, {"status": ["new", "contacted"]}, at=at))
+    db.commit()
+
+
+def counts(db):
+    return tuple(db.execute(select(func.count()).select_from(model)).scalar()
+                 for model in (models.LeadActivity, models.LeadActivityArchive))
+
+
+def test_archive_after_emptying_the_hot_table(tmp_path):
+    engine = seed.make_engine(str(tmp_path / "activity.db"))
+    db = seed.make_session(engine)
+    try:
+        record_change(db, 1, datetime(2024, 1, 1))
+        record_change(db, 2, datetime(2024, 1, 2))
+        assert activity.archive(db, before=datetime(2024, 2, 1)) == 2
+        assert counts(db) == (0, 2)
+
+        record_change(db, 3, datetime(2024, 3, 1))
+        assert activity.archive(db, before=datetime(2024, 4, 1)) == 1
+        assert counts(db) == (0, 3)
+    finally:
+        db.close()
+        engine.dispose()
+
+
+def test_upgrade_renumbers_reused_ids(tmp_path):
+    path = str(tmp_path / "migrated.db")
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as conn:
+        # lead_activity as d81f3a6c2b90 created it: a plain INTEGER PRIMARY KEY
+        # that already handed out id 1 again after an archive run
+        conn.execute(text("CREATE TABLE lead_activity (id INTEGER NOT NULL, lead_id INTEGER NOT NULL, "
+                          "event VARCHAR NOT NULL, field VARCHAR NOT NULL, old_value TEXT, new_value TEXT, "
+                          "changed_by INTEGER, created_at DATETIME NOT NULL, PRIMARY KEY (id))"))
+        models.LeadActivityArchive.__table__.create(conn)
+        row = {"lead_id": 1, "event": activity.STATUS_CHANGED, "field": "status", "created_at": datetime(2024, 1, 1)}
+        conn.execute(insert(models.LeadActivityArchive.__table__), [{"id": 1, **row}, {"id": 2, **row}])
+        conn.execute(insert(models.LeadActivity.__table__), [{"id": 1, **row, "created_at": datetime(2024, 3, 1)}])
+    engine.dispose()
+    upgrade(path)
+
+    engine = models.make_engine(f"sqlite:///{path}")
+    db = seed.make_session(engine)
+    try:
+        assert db.execute(select(models.LeadActivity.id)).scalars().all() == [3]
+        record_change(db, 2, datetime(2024, 3, 2))
+        assert activity.archive(db, before=datetime(2024, 4, 1)) == 2
+        assert counts(db) == (0, 4)
+        record_change(db, 3, datetime(2024, 5, 1))
+        assert db.execute(select(models.LeadActivity.id)).scalars().all() == [5]
+    finally:
+        db.close()
+        engine.dispose()
@@ -0,0 +1,67 @@
+# tests/test_async_db.py
+"""CRM_DB_MODE=async: installed routes are async def and query through the
+aiosqlite engine, with the handler's own primary/replica choice."""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event, insert, text
+
+import app
+import async_db
+import models
+import schemas
+
+
+@pytest.fixture
+def client():
+    models.Base.metadata.create_all(models.engine)
+    with models.engine.begin() as conn:
+        conn.execute(text("DELETE FROM users"))
+        conn.execute(insert(models.User.__table__), [{
+            "id": 1, "email": "async@example.com", "username": "async", "full_name": "Async",
+            "password_hash": "x", "role": "admin", "is_active": True,
+        }])
+
+    api = FastAPI()
+    api.get("/users/{user_id}", response_model=schemas.UserResponse)(app.read_user)
+    api.post("/tasks/", response_model=schemas.TaskResponse)(app.create_task)
+    async_db.install(api, [app.read_user, app.create_task],
+                     {app.get_db: async_db.get_async_db, app.get_read_db: async_db.get_async_read_db})
+
+    async_engine = models.get_async_sessionmakers()[0].kw["bind"]
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", capture)
+    with TestClient(api) as test_client:
+        yield test_client, statements
+        test_client.portal.call(async_engine.dispose)
+    event.remove(async_engine.sync_engine, "before_cursor_execute", capture)
+    models.AsyncSessionLocal = None
+
+
+def test_routes_are_async(client):
+    test_client, _ = client
+    endpoints = [route.endpoint for route in test_client.app.routes if getattr(route, "name", "") in
+                 ("read_user", "create_task")]
+    assert len(endpoints) == 2 and all(asyncio.iscoroutinefunction(endpoint) for endpoint in endpoints)
+
+
+def test_queries_go_through_the_async_engine(client):
+    test_client, statements = client
+    assert models.get_async_sessionmakers()[0].kw["bind"].dialect.driver == "aiosqlite"
+
+    response = test_client.get("/users/1")
+    assert response.status_code == 200 and response.json()["email"] == "async@example.com"
+    assert any("FROM users" in statement for statement in statements)
+
+    response = test_client.post("/tasks/", json={"title": "Call back", "assigned_to_id": 1})
+    assert response.status_code == 200
+    with models.engine.connect() as conn:
+        assert conn.execute(text("SELECT title FROM tasks WHERE id = :id"), {"id": response.json()["id"]}).scalar() \
+            == "Call back"
+    assert any(statement.startswith("INSERT INTO tasks") for statement in statements)
@@ -0,0 +1,86 @@
+# tests/test_auth.py
+"""With CRM_AUTH_REQUIRED on, a customer who signs up through the public
+POST /users/ can log in but cannot reach the CRM routes, cached or not."""
+import os
+import subprocess
+import sys
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app
+import auth
+import config
+import models
+from benchmarks import seed
+
+PASSWORD = "correct horse"
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = seed.make_engine(str(tmp_path / "auth.db"))
+    db = seed.make_session(engine)
+    db.add(models.User(email="admin@example.com", username="admin", full_name="Admin",
+                       password_hash=auth.hash_password_sync(PASSWORD), role="admin"))
+    db.commit()
+    db.close()
+
+    def get_db():
+        session = seed.make_session(engine)
+        try:
+            yield session
+        finally:
+            session.close()
+
+    monkeypatch.setattr(config, "AUTH_REQUIRED", True)
+    monkeypatch.setattr(config, "AUTH_SECRET", "test-secret")
+    app.app.dependency_overrides[app.get_db] = get_db
+    app.app.dependency_overrides[app.get_read_db] = get_db
+    yield TestClient(app.app)
+    app.app.dependency_overrides.pop(app.get_db)
+    app.app.dependency_overrides.pop(app.get_read_db)
+    engine.dispose()
+
+
+def login(client, username):
+    response = client.post("/auth/login", json={"username": username, "password": PASSWORD})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+CRM_REQUESTS = [
+    ("get", "/leads/", {}),
+    ("get", "/users/", {}),
+    ("get", "/dashboard/stats", {}),
+    ("get", "/leads/export", {}),
+    ("patch", "/leads/bulk", {"json": {"ids": [1], "patch": {"status": "lost"}}}),
+]
+
+
+def test_customer_sign_up_does_not_open_the_crm(client):
+    response = client.post("/users/", json={"email": "c@example.com", "username": "customer",
+                                            "full_name": "Customer", "password": PASSWORD, "role": "customer"})
+    assert response.status_code == 200
+    customer, admin = login(client, "customer"), login(client, "admin")
+    # Warm the response cache as staff first: a hit must not bypass the role check
+    assert client.get("/users/", headers=admin).status_code == 200
+    for method, path, kwargs in CRM_REQUESTS:
+        assert getattr(client, method)(path, headers=customer, **kwargs).status_code == 403, path
+        assert getattr(client, method)(path, **kwargs).status_code == 401, path
+
+
+def test_anonymous_sign_up_is_customer_only(client):
+    response = client.post("/users/", json={"email": "a@example.com", "username": "agent",
+                                            "full_name": "Agent", "password": PASSWORD, "role": "sales_agent"})
+    assert response.status_code == 403
+
+
+def test_starts_without_auth_settings():
+    # conftest sets CRM_AUTH_REQUIRED itself; check the shipped defaults in a clean interpreter
+    env = {name: value for name, value in os.environ.items() if not name.startswith("CRM_AUTH_")}
+    output = subprocess.run(
+        [sys.executable, "-c", "import auth, config; auth.check_secret(); print(config.AUTH_REQUIRED)"],
+        cwd=os.path.dirname(os.path.abspath(config.__file__)), env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    assert output.strip() == "False"
@@ -0,0 +1,94 @@
+# tests/test_bulk_import.py
+"""POST /leads/bulk batches commit as a whole: the leads, their counters and
+their jobs land together or not at all, savepoints notwithstanding; possible
+duplicates are reported whether or not they are rejected."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+import app
+import bulk
+import config
+import jobs
+import models
+import performance  # subscribes update_rollups to the close jobs
+from benchmarks import seed
+
+
+def lead(n, **fields):
+    return {"first_name": f"Lead{n}", "last_name": "Import", "email": f"lead{n}@example.com",
+            "status": "closed_won", "value": 10.0, "sales_agent_id": 1, **fields}
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = seed.make_engine(str(tmp_path / "bulk.db"))
+    seed.seed_users(engine, 1)
+    seed.seed_sales_agents(engine, 1)
+    yield engine
+    engine.dispose()
+
+
+def table_counts(engine):
+    with engine.connect() as conn:
+        return {table: conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+                for table in ("leads", "lead_counters", "jobs")}
+
+
+def test_batch_commits_with_its_jobs(engine):
+    db = seed.make_session(engine)
+    try:
+        importer = bulk.LeadImporter(db, allow_duplicates=True)
+        importer.add_batch([(1, lead(1)), (2, lead(2, status="bogus"))])
+    finally:
+        db.close()
+    counts = table_counts(engine)
+    assert importer.inserted == 1 and [error.row for error in importer.errors] == [2]
+    assert counts["leads"] == 1 and counts["lead_counters"] and counts["jobs"]
+
+
+def test_failed_job_insert_keeps_no_leads(engine, monkeypatch):
+    def broken_publish(db, event, payload):
+        # A jobs row that cannot be written: the commit fails after the lead inserts
+        db.add(models.Job(kind=None, event=event, payload="{}"))
+
+    monkeypatch.setattr(jobs, "publish", broken_publish)
+    db = seed.make_session(engine)
+    try:
+        with pytest.raises(IntegrityError):
+            bulk.LeadImporter(db, allow_duplicates=True).add_batch([(1, lead(1)), (2, lead(2))])
+        db.rollback()
+    finally:
+        db.close()
+    assert table_counts(engine) == {"leads": 0, "lead_counters": 0, "jobs": 0}
+
+
+def test_default_import_warns_about_duplicates(engine, monkeypatch):
+    def get_db():
+        db = seed.make_session(engine)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    assert not config.DEDUP_REJECT
+    monkeypatch.setitem(app.app.dependency_overrides, app.get_db, get_db)
+    client = TestClient(app.app)
+    assert client.post("/leads/", json=lead(1), params={"allow_duplicates": True}).status_code == 200
+
+    # Row 1 matches the existing lead, row 3 the earlier row 2
+    response = client.post("/leads/bulk", json=[lead(1), lead(2), lead(2), lead(4)])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["inserted"], body["failed"]) == (4, 0)
+    assert [(warning["row"], warning["errors"][0].split(" (")[0]) for warning in body["warnings"]] == [
+        (1, "possible duplicate of lead 1"), (3, "possible duplicate of row 2"),
+    ]
+
+    response = client.post("/leads/bulk", json=[lead(1)], params={"allow_duplicates": True})
+    assert response.json()["warnings"] == []
+
+    monkeypatch.setattr(config, "DEDUP_REJECT", True)
+    body = client.post("/leads/bulk", json=[lead(4), lead(5)]).json()
+    assert (body["inserted"], [error["row"] for error in body["errors"]], body["warnings"]) == (1, [1], [])
@@ -0,0 +1,88 @@
+# tests/test_dashboard_stats.py
+"""The /dashboard/stats cache never keeps numbers older than the last
+invalidation: not from a compute that overlapped a write, and not from a
+lagging replica."""
+import pytest
+from fastapi import Request
+from fastapi.testclient import TestClient
+
+import app
+import config
+import replicas
+import stats
+from benchmarks import seed
+
+LEAD = {"first_name": "Ada", "last_name": "Lovelace", "status": "new", "value": 100.0, "sales_agent_id": 1}
+
+
+def sessions(engine):
+    db = seed.make_session(engine)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@pytest.fixture
+def engines(tmp_path):
+    primary = seed.make_engine(str(tmp_path / "primary.db"))
+    # A replica that has not caught up with any lead yet
+    replica = seed.make_engine(str(tmp_path / "replica.db"))
+    for engine in (primary, replica):
+        seed.seed_users(engine, 1)
+        seed.seed_sales_agents(engine, 1)
+
+    def get_db():
+        yield from sessions(primary)
+
+    def get_read_db(request: Request):
+        if replicas.wants_primary(request):
+            yield from sessions(primary)
+            return
+        request.state.read_replica = 0
+        yield from sessions(replica)
+
+    cache_ttls = dict(config.RESPONSE_CACHE_TTLS)
+    config.RESPONSE_CACHE_TTLS.clear()
+    app.app.dependency_overrides[app.get_db] = get_db
+    app.app.dependency_overrides[app.get_read_db] = get_read_db
+    stats.invalidate_dashboard_stats()
+    yield primary, replica
+    app.app.dependency_overrides.pop(app.get_db)
+    app.app.dependency_overrides.pop(app.get_read_db)
+    config.RESPONSE_CACHE_TTLS.update(cache_ttls)
+    stats.invalidate_dashboard_stats()
+    primary.dispose()
+    replica.dispose()
+
+
+def total_leads(client, primary=False):
+    headers = {replicas.READ_PRIMARY_HEADER: "1"} if primary else {}
+    return client.get("/dashboard/stats", headers=headers).json()["total_leads"]
+
+
+def test_replica_reads_are_not_cached(engines):
+    client = TestClient(app.app)
+    assert client.post("/leads/", json=LEAD, params={"allow_duplicates": True}).status_code == 200
+
+    assert total_leads(client) == 0
+    # The writer reads its own write from the primary, not the replica's numbers
+    assert total_leads(client, primary=True) == 1
+    assert total_leads(client) == 1
+
+
+def test_write_during_compute_is_not_lost(engines, monkeypatch):
+    primary, _ = engines
+    compute = stats.compute_dashboard_stats
+
+    def overlapping_write(db):
+        before = compute(db)
+        # A lead commits and invalidates while this compute is still running
+        TestClient(app.app).post("/leads/", json=LEAD, params={"allow_duplicates": True})
+        return before
+
+    monkeypatch.setattr(stats, "compute_dashboard_stats", overlapping_write)
+    client = TestClient(app.app)
+    assert total_leads(client, primary=True) == 0
+    monkeypatch.setattr(stats, "compute_dashboard_stats", compute)
+    assert total_leads(client, primary=True) == 1
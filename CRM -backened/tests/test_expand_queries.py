@@ -0,0 +1,81 @@
+# tests/test_expand_queries.py
+"""?expand= loads a page's relations in a fixed number of queries, not
+one per lead, and returns what the per-lead endpoints would."""
+import json
+import math
+
+import pytest
+from fastapi import HTTPException, Response
+from sqlalchemy import event
+
+import app
+import expansions
+from benchmarks import seed
+
+EXPAND = "owner,sales_agent,followups"
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = seed.make_engine(str(tmp_path_factory.mktemp("expand") / "expand.db"))
+    seed.seed_users(engine, 50)
+    seed.seed_sales_agents(engine, 50)
+    seed.seed_leads(engine, 2000, users=50, agents=50)
+    seed.seed_followups(engine, 2000)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def queries(engine):
+    """SQL statements run on ``engine`` during the test."""
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(engine, "before_cursor_execute", count)
+
+
+@pytest.mark.parametrize("limit", [10, 100, 1000])
+def test_expanded_page_query_count(engine, queries, limit):
+    db = seed.make_session(engine)
+    response = app.read_leads(response=Response(), limit=limit, expand=EXPAND, db=db)
+    db.close()
+    assert len(json.loads(response.body)) == limit
+    # The page with its joined owner and agent, then one followups query per IN chunk
+    assert len(queries) <= 1 + math.ceil(limit / expansions.SELECTIN_CHUNK_SIZE)
+
+
+def test_expanded_lead_query_count(engine, queries):
+    db = seed.make_session(engine)
+    app.read_lead(lead_id=1, expand=EXPAND, db=db)
+    db.close()
+    assert len(queries) == 2
+
+
+def test_expanded_page_matches_per_lead_endpoints(engine):
+    db = seed.make_session(engine)
+    page = json.loads(app.read_leads(response=Response(), limit=50, expand=EXPAND, db=db).body)
+    for lead in page:
+        followups = app.get_lead_followups(lead_id=lead["id"], db=db)
+        assert [followup["id"] for followup in lead["followups"]] == [followup.id for followup in followups]
+        assert (lead["owner"] or {}).get("id") == lead["owner_id"]
+        assert (lead["sales_agent"] or {}).get("id") == lead["sales_agent_id"]
+    db.close()
+
+
+def test_unexpanded_relations_are_left_out(engine):
+    db = seed.make_session(engine)
+    lead = json.loads(app.read_leads(response=Response(), limit=1, expand="owner", db=db).body)[0]
+    db.close()
+    assert "owner" in lead
+    assert "sales_agent" not in lead and "followups" not in lead
+
+
+def test_unknown_expansion_is_rejected():
+    with pytest.raises(HTTPException) as raised:
+        expansions.parse_expand("owner,tasks")
+    assert raised.value.status_code == 400
@@ -0,0 +1,92 @@
+# tests/test_fast_json.py
+"""Golden-output test for config.FAST_JSON_ROUTES: every list request,
+through the full FastAPI stack, gives byte-identical bodies and cursors on
+the ORM + response_model path and on the column-tuple + orjson path."""
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+import app
+import config
+import models
+from benchmarks import seed
+
+ROUTES = ("read_leads", "read_tasks", "read_users")
+
+REQUESTS = [
+    ("/leads/", {}),
+    ("/leads/", {"limit": 1000}),
+    ("/leads/", {"status": "new", "limit": 50}),
+    ("/leads/", {"owner_id": 3, "skip": 10, "limit": 20}),
+    ("/leads/", {"sales_agent_id": 2, "limit": 7, "cursor": "WyIyMDI1LTAxLTAxVDAwOjAwOjAwIiwxMDBd"}),
+    ("/leads/", {"sort_by": "score", "limit": 50}),
+    ("/tasks/", {}),
+    ("/tasks/", {"limit": 1000}),
+    ("/tasks/", {"priority": "high", "status": "pending", "limit": 25}),
+    ("/tasks/", {"assigned_to_id": 4, "limit": 9, "cursor": "WyIyMDI2LTAxLTAxVDAwOjAwOjAwIiw1MF0"}),
+    ("/users/", {}),
+    ("/users/", {"role": "customer", "skip": 2, "limit": 5}),
+]
+
+
+def seed_edge_cases(engine):
+    """Rows with NULLs, non-ASCII text and whole-second timestamps."""
+    whole_second = datetime(2030, 1, 1, 12, 0, 0)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Lead.__table__), [
+            {"first_name": "Zoë", "last_name": "Ñúñez 李", "email": None, "phone": None, "status": "new",
+             "value": None, "notes": 'quote " and \\ backslash\nnewline', "created_at": whole_second,
+             "updated_at": None},
+            {"first_name": "Max", "last_name": "Value", "email": "max@example.com", "phone": "+1",
+             "status": "proposal", "value": 1234567.891, "notes": None, "created_at": whole_second,
+             "updated_at": whole_second},
+        ])
+        conn.execute(insert(models.Task.__table__), [
+            {"title": "No due date ✓", "status": "pending", "priority": "high", "due_date": None,
+             "created_at": whole_second, "updated_at": None},
+        ])
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    engine = seed.make_engine(str(tmp_path_factory.mktemp("fast_json") / "fast_json.db"))
+    seed.seed_users(engine, 30, roles=("sales_agent", "customer", "admin"))
+    seed.seed_sales_agents(engine, 10)
+    seed.seed_leads(engine, 3000, users=30, agents=10)
+    seed.seed_tasks(engine, 3000, users=30, leads=3000)
+    seed_edge_cases(engine)
+
+    def get_read_db():
+        db = seed.make_session(engine)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    fast_routes, cache_ttls = set(config.FAST_JSON_ROUTES), dict(config.RESPONSE_CACHE_TTLS)
+    app.app.dependency_overrides[app.get_read_db] = get_read_db
+    # Compare freshly rendered responses, not cached ones
+    config.RESPONSE_CACHE_TTLS.clear()
+    yield TestClient(app.app)
+    app.app.dependency_overrides.pop(app.get_read_db)
+    config.FAST_JSON_ROUTES.clear()
+    config.FAST_JSON_ROUTES.update(fast_routes)
+    config.RESPONSE_CACHE_TTLS.update(cache_ttls)
+    engine.dispose()
+
+
+def fetch(client, path, params):
+    response = client.get(path, params=params)
+    return response.status_code, response.content, response.headers.get("x-next-cursor")
+
+
+@pytest.mark.parametrize("path, params", REQUESTS)
+def test_fast_path_matches_orm_path(client, path, params):
+    config.FAST_JSON_ROUTES.clear()
+    golden = fetch(client, path, params)
+    config.FAST_JSON_ROUTES.update(ROUTES)
+    fast = fetch(client, path, params)
+    assert golden[0] == 200
+    assert fast == golden
@@ -0,0 +1,162 @@
+# tests/test_jobs.py
+"""The jobs outbox: jobs commit with the write, failures retry and then
+dead-letter, a worker killed mid-batch loses or repeats no job, and one
+that outlives its lease commits nothing."""
+import os
+import signal
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import text, update
+
+import config
+import jobs
+import models
+from benchmarks import seed
+from jobs_worker import EVENT
+
+TESTS = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(TESTS)
+FAILING = "test.failing"
+
+
+@jobs.subscribe(FAILING)
+def fail(db, event, payload):
+    raise RuntimeError("handler failed")
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    engine = seed.make_engine(path)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE job_effects (n INTEGER NOT NULL)"))
+    yield engine, path
+    engine.dispose()
+
+
+def counts(engine):
+    with engine.connect() as conn:
+        by_status = dict(conn.execute(text("SELECT status, COUNT(*) FROM jobs GROUP BY status")).all())
+        effects = conn.execute(text("SELECT COUNT(*), COUNT(DISTINCT n) FROM job_effects")).one()
+    return by_status, tuple(effects)
+
+
+def wait_for(predicate, timeout=60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def publish(engine, event, count):
+    db = seed.make_session(engine)
+    for n in range(count):
+        jobs.publish(db, event, {"n": n})
+    return db
+
+
+def test_jobs_commit_with_the_write(database):
+    engine, _ = database
+    db = publish(engine, EVENT, 3)
+    db.rollback()
+    db.close()
+    assert counts(engine)[0] == {}
+    db = publish(engine, EVENT, 3)
+    db.commit()
+    db.close()
+    assert counts(engine)[0] == {jobs.PENDING: 3}
+
+
+def test_failing_job_retries_then_dead_letters(database, monkeypatch):
+    engine, _ = database
+    monkeypatch.setattr(config, "JOBS_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(config, "JOBS_BACKOFF_BASE", 0.0)
+    db = publish(engine, FAILING, 1)
+    db.commit()
+    db.close()
+    queue = jobs.JobQueue(session_factory=lambda: seed.make_session(engine), workers=0)
+    for _ in range(3):
+        assert queue.run_once("test") == 1
+    assert queue.run_once("test") == 0
+
+    db = seed.make_session(engine)
+    job = db.query(models.Job).one()
+    assert (job.status, job.attempts) == (jobs.DEAD, 3)
+    assert "handler failed" in job.last_error
+    assert jobs.requeue_dead(db) == 1
+    db.refresh(job)
+    assert (job.status, job.attempts) == (jobs.PENDING, 0)
+    db.close()
+
+
+def test_worker_past_its_lease_commits_nothing(database):
+    engine, _ = database
+    db = publish(engine, EVENT, 1)
+    db.commit()
+    slow = seed.make_session(engine)
+    [job] = jobs.claim(slow, "slow", 1)
+
+    # The lease runs out; the sweep hands the job to another worker, which runs it
+    db.execute(update(models.Job).values(locked_at=datetime.utcnow() - timedelta(seconds=60)))
+    db.commit()
+    assert jobs.sweep(db, lease_seconds=30) == 1
+    queue = jobs.JobQueue(session_factory=lambda: seed.make_session(engine), workers=0)
+    assert queue.run_once("fast") == 1
+
+    # The first worker finishes late: its effect is rolled back with the done mark
+    jobs.execute(slow, job)
+    slow.close()
+    db.close()
+    assert counts(engine) == ({jobs.DONE: 1}, (1, 1))
+
+
+def spawn_worker(path):
+    env = dict(
+        os.environ, CRM_JOBS_LEASE_SECONDS="1", CRM_JOBS_WORKERS="0",
+        PYTHONPATH=os.pathsep.join([BACKEND, TESTS, os.environ.get("PYTHONPATH", "")]),
+    )
+    return subprocess.Popen(
+        [sys.executable, "-c", f"import jobs_worker; jobs_worker.run({'sqlite:///' + path!r})"], cwd=TESTS, env=env,
+    )
+
+
+def test_worker_killed_mid_batch_loses_no_job(database):
+    engine, path = database
+    total = 300
+    db = publish(engine, EVENT, total)
+    db.commit()
+    db.close()
+
+    def mid_batch():
+        by_status = counts(engine)[0]
+        return by_status.get(jobs.DONE, 0) >= total // 5 and by_status.get(jobs.RUNNING, 0) > 0
+
+    def settled():
+        by_status = counts(engine)[0]
+        return by_status.get(jobs.DONE, 0) + by_status.get(jobs.DEAD, 0) >= total
+
+    first = spawn_worker(path)
+    # Kill once some jobs are done and a claimed batch is still in flight
+    in_flight = wait_for(mid_batch)
+    os.kill(first.pid, signal.SIGKILL)
+    first.wait()
+    assert in_flight
+    assert counts(engine)[0].get(jobs.RUNNING)
+
+    # The second worker picks the batch up once the dead worker's lease expires
+    second = spawn_worker(path)
+    try:
+        assert wait_for(settled)
+    finally:
+        second.terminate()
+        second.wait()
+    by_status, (effects, distinct) = counts(engine)
+    assert by_status == {jobs.DONE: total}
+    assert distinct == total
+    assert effects == total
@@ -0,0 +1,64 @@
+# tests/test_lead_counters.py
+"""lead_counters commits with the lead write itself: dashboard stats are
+current with no job worker running, and only the rollups go through the
+outbox."""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import text
+
+import app
+import config
+import stats
+from benchmarks import seed
+
+LEAD = {"first_name": "Ada", "last_name": "Lovelace", "status": "new", "value": 100.0, "sales_agent_id": 1}
+
+
+@pytest.fixture
+def database(tmp_path):
+    engine = seed.make_engine(str(tmp_path / "counters.db"))
+    seed.seed_users(engine, 1)
+    seed.seed_sales_agents(engine, 1)
+
+    def get_db():
+        db = seed.make_session(engine)
+        try:
+            yield db
+        finally:
+            db.close()
+
+    cache_ttls = dict(config.RESPONSE_CACHE_TTLS)
+    config.RESPONSE_CACHE_TTLS.clear()
+    app.app.dependency_overrides[app.get_db] = get_db
+    app.app.dependency_overrides[app.get_read_db] = get_db
+    stats.invalidate_dashboard_stats()
+    yield engine
+    app.app.dependency_overrides.pop(app.get_db)
+    app.app.dependency_overrides.pop(app.get_read_db)
+    config.RESPONSE_CACHE_TTLS.update(cache_ttls)
+    stats.invalidate_dashboard_stats()
+    engine.dispose()
+
+
+def queued(engine):
+    with engine.connect() as conn:
+        return sorted(conn.execute(text("SELECT kind FROM jobs WHERE status = 'pending'")).scalars())
+
+
+def test_counters_commit_with_the_write(database):
+    client = TestClient(app.app)
+    lead_id = client.post("/leads/", json=LEAD, params={"allow_duplicates": True}).json()["id"]
+    assert client.get("/dashboard/stats").json()["leads_by_status"] == {"new": 1}
+    assert "stats.update_counters" not in queued(database)
+
+    client.put(f"/leads/{lead_id}", json={"status": "closed_won"})
+    body = client.get("/dashboard/stats").json()
+    assert body["leads_by_status"] == {"closed_won": 1}
+    assert body["won_value"] == 100.0
+    # The close is booked into agent_rollups by a job
+    assert queued(database).count("performance.update_rollups") == 1
+    db = seed.make_session(database)
+    try:
+        assert stats.check_lead_counters(db) == []
+    finally:
+        db.close()
@@ -0,0 +1,99 @@
+# tests/test_merge.py
+"""Merging leads keeps each close dated by the lead's own history: a
+duplicate's status changes come along for the record but never move the
+primary's close into another agent_rollups bucket."""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+import activity
+import dedup
+import jobs
+import models
+import performance
+import stats
+from benchmarks import seed
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = seed.make_engine(str(tmp_path / "merge.db"))
+    seed.seed_users(engine, 1)
+    seed.seed_sales_agents(engine, 1)
+    yield engine
+    engine.dispose()
+
+
+def add_lead(db, name):
+    lead = models.Lead(first_name=name, last_name="Merge", status="new", value=100.0, sales_agent_id=1,
+                       created_at=datetime(2024, 1, 1))
+    db.add(lead)
+    stats.record_lead_change(db, None, stats.lead_snapshot(lead), at=lead.created_at)
+    db.commit()
+    return lead.id
+
+
+def set_status(db, lead_id, status, at):
+    # What PUT /leads/{id} does, at a chosen time
+    lead = db.get(models.Lead, lead_id)
+    before = stats.lead_snapshots(db, [lead])[lead_id]
+    changes = {"status": [lead.status, status]}
+    lead.status = status
+    stats.record_lead_change(db, before, stats.lead_snapshot(lead), at=at)
+    activity.record(db, activity.change_rows(lead_id, changes, at=at))
+    db.commit()
+
+
+def run_jobs(engine):
+    while jobs.JobQueue(lambda: seed.make_session(engine), workers=0, batch_size=100).run_once("test"):
+        pass
+
+
+def rollups(db):
+    """Non-zero agent_rollups rows, and the same rows recomputed from scratch."""
+    def rows():
+        table = models.AgentRollup.__table__
+        return sorted(
+            (row.period, row.bucket.isoformat(), row.won_count, row.won_value)
+            for row in db.execute(select(table)).all()
+            if row.won_count or row.won_value or row.lost_count or row.lost_value
+        )
+    db.rollback()
+    incremental = rows()
+    performance.rebuild_agent_rollups(db)
+    rebuilt = rows()
+    db.rollback()
+    return incremental, rebuilt
+
+
+@pytest.mark.parametrize("primary_closed_at", [
+    # A closed duplicate merged into an open primary that closes later
+    datetime(2024, 6, 1),
+    # The primary closed before the duplicate did
+    datetime(2024, 3, 1),
+])
+def test_merge_keeps_the_primary_close_date(engine, primary_closed_at):
+    db = seed.make_session(engine)
+    try:
+        primary, duplicate = add_lead(db, "Primary"), add_lead(db, "Duplicate")
+        if primary_closed_at < datetime(2024, 5, 10):
+            set_status(db, primary, "closed_won", primary_closed_at)
+        set_status(db, duplicate, "closed_won", datetime(2024, 5, 10))
+        dedup.merge_leads(db, primary, [duplicate])
+        db.commit()
+        if primary_closed_at > datetime(2024, 5, 10):
+            set_status(db, primary, "closed_won", primary_closed_at)
+
+        assert activity.close_dates(db, {primary: "closed_won"}) == {primary: primary_closed_at}
+        run_jobs(engine)
+        day = primary_closed_at.date()
+        expected = [("day", day.isoformat(), 1, 100.0), ("month", day.replace(day=1).isoformat(), 1, 100.0)]
+        assert rollups(db) == (expected, expected)
+
+        # Reopening takes the close back out of the bucket it was booked in
+        set_status(db, primary, "contacted", datetime(2024, 7, 1))
+        run_jobs(engine)
+        assert rollups(db) == ([], [])
+    finally:
+        db.close()
@@ -0,0 +1,62 @@
+# tests/test_migrations.py
+"""``alembic upgrade head`` brings every starting point to the schema
+models.py creates: an empty database and the two shipped ones."""
+import os
+import shutil
+import sqlite3
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine
+
+import models
+
+BACKEND = os.path.dirname(os.path.abspath(models.__file__))
+
+
+def upgrade(path):
+    cfg = Config()
+    cfg.set_main_option("script_location", os.path.join(BACKEND, "migrations"))
+    engine = create_engine(f"sqlite:///{path}")
+    with engine.begin() as connection:
+        cfg.attributes["connection"] = connection
+        command.upgrade(cfg, "head")
+    engine.dispose()
+
+
+def describe(path, table):
+    """Columns, indexes and foreign keys of ``table`` as SQLite reports them."""
+    conn = sqlite3.connect(path)
+    try:
+        columns = sorted((row[1], row[2].upper(), row[3], row[5])
+                         for row in conn.execute(f"PRAGMA table_info('{table}')"))
+        indexes = sorted(
+            (row[1], row[2], tuple(column[2] for column in conn.execute(f"PRAGMA index_info('{row[1]}')")))
+            for row in conn.execute(f"PRAGMA index_list('{table}')")
+            if not row[1].startswith("sqlite_autoindex")
+        )
+        foreign_keys = sorted((row[2], row[3], row[4]) for row in conn.execute(f"PRAGMA foreign_key_list('{table}')"))
+    finally:
+        conn.close()
+    return columns, indexes, foreign_keys
+
+
+@pytest.fixture(scope="module")
+def reference(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("reference") / "models.db")
+    engine = create_engine(f"sqlite:///{path}")
+    models.Base.metadata.create_all(engine)
+    engine.dispose()
+    return path
+
+
+@pytest.mark.parametrize("source", [None, "crm.db", "crmapp.db"])
+def test_upgrade_matches_models(tmp_path, reference, source):
+    path = str(tmp_path / "migrated.db")
+    if source:
+        # A copy: the shipped databases stay as they are
+        shutil.copy(os.path.join(BACKEND, source), path)
+    upgrade(path)
+    for table in models.Base.metadata.tables:
+        assert describe(path, table) == describe(reference, table), table
@@ -0,0 +1,59 @@
+# tests/test_pagination.py
+"""Cursor tokens: well-formed ones round-trip, anything else is a 400 rather
+than reaching SQLite as an unbindable parameter."""
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+import app
+import pagination
+
+
+def token(value) -> str:
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode().rstrip("=")
+
+
+@pytest.mark.parametrize("sort_value, datetime_key", [
+    (datetime(2025, 1, 1, 12, 30), True),
+    (None, True),
+    (50.0, False),
+    (7, False),
+    (None, False),
+    ("-1.5", False),
+])
+def test_cursor_round_trips(sort_value, datetime_key):
+    assert pagination.decode_cursor(pagination.encode_cursor(sort_value, 100), datetime_key) == (sort_value, 100)
+
+
+@pytest.mark.parametrize("cursor, datetime_key", [
+    ("not base64!", False),
+    (token([1, 2, 3]), False),
+    (token([[1], 2]), False),
+    (token([{"a": 1}, 2]), False),
+    (token([True, 2]), False),
+    (token([1.5, "2"]), False),
+    (token([1.5, 2.5]), False),
+    (token([1.5, None]), False),
+    (token(["yesterday", 2]), True),
+    (token([[1], 2]), True),
+])
+def test_malformed_cursor_is_rejected(cursor, datetime_key):
+    with pytest.raises(HTTPException) as raised:
+        pagination.decode_cursor(cursor, datetime_key)
+    assert raised.value.status_code == 400
+
+
+@pytest.mark.parametrize("path, params", [
+    ("/leads/", {"sort_by": "score", "cursor": "W1sxXSwyXQ"}),
+    ("/leads/", {"cursor": "W1sxXSwyXQ"}),
+    ("/tasks/", {"cursor": token(["2025-01-01T00:00:00", [2]])}),
+    ("/agenda", {"user_id": 1, "cursor": token([[1], 2])}),
+])
+def test_endpoints_answer_400(path, params):
+    response = TestClient(app.app).get(path, params=params)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
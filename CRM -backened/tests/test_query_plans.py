@@ -0,0 +1,122 @@
+# tests/test_query_plans.py
+"""EXPLAIN QUERY PLAN on the SQL each list endpoint emits: none may fall
+back to a full table scan or a temp-table sort."""
+from datetime import datetime
+
+import pytest
+from fastapi import Response
+from sqlalchemy import event, text
+
+import app
+import dedup
+import pagination
+import scoring
+from benchmarks import seed
+
+CURSOR = "WyIyMDI1LTAxLTAxVDAwOjAwOjAwIiwxMDBd"  # ["2025-01-01T00:00:00",100]
+SINCE = datetime(2020, 1, 1)
+AGENDA_CURSOR = pagination.encode_cursor(["2025-01-01T00:00:00", "followup"], 100)
+SCORE_CURSOR = pagination.encode_cursor(50.0, 100)
+NEW_LEAD = {"first_name": "First7", "last_name": "Last7", "email": "lead7@example7.com",
+            "phone": "+15550000007", "company": "Company 7"}
+
+# (label, call(db)) for every filter combination the list endpoints accept
+CALLS = [
+    ("leads", lambda db: app.read_leads(response=Response(), db=db)),
+    ("leads?cursor", lambda db: app.read_leads(response=Response(), cursor=CURSOR, db=db)),
+    ("leads?status", lambda db: app.read_leads(response=Response(), status="new", db=db)),
+    ("leads?status&cursor", lambda db: app.read_leads(response=Response(), status="new", cursor=CURSOR, db=db)),
+    ("leads?owner_id", lambda db: app.read_leads(response=Response(), owner_id=1, db=db)),
+    ("leads?sales_agent_id", lambda db: app.read_leads(response=Response(), sales_agent_id=1, db=db)),
+    ("leads?sort_by=score", lambda db: app.read_leads(response=Response(), sort_by="score", db=db)),
+    ("leads?sort_by=score&cursor", lambda db: app.read_leads(
+        response=Response(), sort_by="score", cursor=SCORE_CURSOR, db=db)),
+    ("leads?status&sort_by=score", lambda db: app.read_leads(
+        response=Response(), status="new", sort_by="score", db=db)),
+    ("leads?owner_id&sort_by=score", lambda db: app.read_leads(
+        response=Response(), owner_id=1, sort_by="score", db=db)),
+    ("leads?sales_agent_id&sort_by=score", lambda db: app.read_leads(
+        response=Response(), sales_agent_id=1, sort_by="score", db=db)),
+    ("tasks", lambda db: app.read_tasks(response=Response(), db=db)),
+    ("tasks?cursor", lambda db: app.read_tasks(response=Response(), cursor=CURSOR, db=db)),
+    ("tasks?status", lambda db: app.read_tasks(response=Response(), status="pending", db=db)),
+    ("tasks?assigned_to_id", lambda db: app.read_tasks(response=Response(), assigned_to_id=1, db=db)),
+    ("tasks?priority", lambda db: app.read_tasks(response=Response(), priority="high", db=db)),
+    ("users?role", lambda db: app.read_users(role="sales_agent", db=db)),
+    ("leads/{id}/followups", lambda db: app.get_lead_followups(lead_id=1, db=db)),
+    ("leads/{id}/activity", lambda db: app.read_lead_activity(lead_id=1, response=Response(), db=db)),
+    ("leads/{id}/activity?cursor", lambda db: app.read_lead_activity(
+        lead_id=1, response=Response(), cursor=CURSOR, db=db)),
+    ("agenda", lambda db: app.read_agenda(response=Response(), user_id=1, from_=None, to=None, db=db)),
+    ("agenda?from", lambda db: app.read_agenda(response=Response(), user_id=1, from_=SINCE, to=None, db=db)),
+    ("agenda?to&cursor", lambda db: app.read_agenda(
+        response=Response(), user_id=1, from_=SINCE, to=datetime(2030, 1, 1), cursor=AGENDA_CURSOR, db=db)),
+    ("duplicate check", lambda db: dedup.find_duplicates(db, NEW_LEAD)),
+    ("duplicate check, batch", lambda db: dedup.find_batch_duplicates(db, [
+        dict(lead, **dedup.match_keys(lead)) for lead in (NEW_LEAD, dict(NEW_LEAD, first_name="First8"))])),
+    ("leads/duplicates", lambda db: (dedup.invalidate_duplicate_groups(), app.read_duplicate_leads(
+        response=Response(), min_score=None, limit=100, cursor=None, db=db))),
+    ("rescore leads by id", lambda db: scoring.rescore(db, [7, 8, 9])),
+    ("rescore-leads batch", lambda db: scoring._score_batch(db, datetime.utcnow(), after=100, limit=500)),
+]
+
+
+def bad_plan_lines(plan):
+    bad = []
+    for row in plan:
+        detail = row[-1]
+        # The VALUES list of a row-value IN, not a table
+        if detail.startswith("SCAN ") and detail.endswith(("CONSTANT ROW", "CONSTANT ROWS")):
+            continue
+        # "SCAN leads USING INDEX ..." walks an index in order; a bare "SCAN leads" does not
+        if (detail.startswith("SCAN ") and " USING " not in detail) or "TEMP B-TREE" in detail:
+            bad.append(detail)
+    return bad
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = seed.make_engine(str(tmp_path_factory.mktemp("plans") / "plans.db"))
+    seed.seed_users(engine, 40, roles=("sales_agent", "customer", "admin", "head_of_sales"))
+    seed.seed_sales_agents(engine, 10)
+    seed.seed_leads(engine, 2000, users=10, agents=10)
+    seed.seed_tasks(engine, 2000, users=10, leads=2000)
+    seed.seed_followups(engine, 2000)
+    db = seed.make_session(engine)
+    dedup.rebuild_match_keys(db)
+    scoring.rescore_all(db)
+    db.close()
+    with engine.begin() as conn:
+        # Most followups are history, as in production
+        conn.execute(text("UPDATE lead_followups SET completed = 1, status = 'completed' WHERE id % 4 != 0"))
+        conn.execute(text("ANALYZE"))
+    yield engine
+    engine.dispose()
+
+
+@pytest.mark.parametrize("label, call", CALLS, ids=[label for label, _ in CALLS])
+def test_query_plan_uses_indexes(engine, label, call):
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    db = seed.make_session(engine)
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        call(db)
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    assert captured
+    plans = {
+        statement: db.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).fetchall()
+        for statement, parameters in captured
+    }
+    db.close()
+    bad = {statement: bad_plan_lines(plan) for statement, plan in plans.items() if bad_plan_lines(plan)}
+    assert not bad, bad
+    if "cursor" in label:
+        # A keyset page seeks into its index rather than walking the rows before the cursor
+        first_plan = next(iter(plans.values()))
+        assert first_plan[0][-1].startswith("SEARCH "), first_plan